@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Query
+
+from app.services.artifact_service import ArtifactService
+from app.utils.response_utils import success_response
+from app.schemas.response import ApiResponse
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_model=ApiResponse[dict])
+def get_artifact_metrics():
+    """产物回收指标：累计回收的文件数和字节数（按策略）、上一次回收的时间和耗时、各类产物占用、磁盘剩余空间"""
+    return success_response(data=ArtifactService.get_instance().metrics())
+
+
+@router.post("/sweep", response_model=ApiResponse[dict])
+def sweep_artifacts(dry_run: bool = Query(True, description="只统计可回收的文件，不删除")):
+    """立即执行一次产物回收，默认试运行"""
+    report = ArtifactService.get_instance().sweep(dry_run=dry_run)
+    if report is None:
+        return success_response(message="上一次回收仍在进行")
+    return success_response(data=report, message="回收完成" if not dry_run else "试运行完成")
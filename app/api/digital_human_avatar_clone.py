@@ -0,0 +1,158 @@
+"""
+数字人克隆：提交训练任务的接口只挂载在 worker 角色，下载、预处理、训练和欢迎视频渲染都在 worker 的调度器中执行，
+api 角色不导入训练模块、不创建调度器
+"""
+import shutil
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from datetime import datetime
+import os
+from pathlib import Path
+import logging
+from app.services.task_service import TaskService
+from app.services.progress_service import report_progress
+from app.services.ultralight_service import UltralightService
+from ..config import get_settings
+from ..database import get_db, get_write_queue
+from ..models.digital_human_avatar import DigitalHumanAvatar
+from ..schemas.digital_human_avatar import DigitalHumanAvatarCreate
+from ..utils.response_utils import success_response, error_response
+from ..schemas.response import ApiResponse
+from ..utils import media_utils
+from ..utils.user_utils import get_user_id
+from .digital_human_avatars import validate_digital_human_avatar_data
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+@router.post("/", response_model=ApiResponse[dict])
+def create_digital_human_avatar(digital_human_avatar: DigitalHumanAvatarCreate, db: Session = Depends(get_db)):
+    """
+    创建新的数字人形象：请求内只做参数校验并写入记录，素材下载、大小校验和训练都在后台任务中执行，
+    立即返回任务ID，进度通过数字人状态查询
+    """
+    # 创建训练中的数字人数据
+    db_digital_human_avatar = DigitalHumanAvatar(**digital_human_avatar.model_dump())
+    try:
+        validate_digital_human_avatar_data(db_digital_human_avatar)
+        db_digital_human_avatar.created_at = datetime.now()
+        db_digital_human_avatar.status = 0
+        db_digital_human_avatar.status_msg = "克隆中"
+        db_digital_human_avatar.user_id = get_user_id()
+        db.add(db_digital_human_avatar)
+        db.commit()
+        db.refresh(db_digital_human_avatar)
+    except ValueError as ve:
+        return error_response(code=400, message=str(ve))
+
+    task_service = TaskService.get_instance()
+    task_id = f"create_avatar_{db_digital_human_avatar.id}"  # 确保 task_id 是字符串
+    task_name = f"创建数字人形象_{digital_human_avatar.name}"
+    task_func = lambda: create_avatar_task(db_digital_human_avatar)
+    task_service.execute_task_immediately(task_func=task_func, task_id=task_id, task_name=task_name)
+
+    return success_response(data={"task_id": task_id, "avatar_id": db_digital_human_avatar.id},
+                            message="数字人形象克隆已提交，正在后台处理")
+
+
+# 训练素材的大小上限
+AVATAR_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+
+def resolve_avatar_source(video_path: str) -> str:
+    """
+    解析训练素材并校验大小，在后台任务中执行，不下载素材
+
+    - 本服务的URL转为本地路径
+    - 对象存储中的素材（分片直传返回的 fileUrl）生成预签名读取URL，私有存储桶也能直接读取
+    - 其他URL原样返回，由训练预处理的 ffmpeg 流式读取
+
+    :param video_path: 素材路径或URL
+    :return: 供预处理解码的本地路径或URL
+    """
+    from app.services.download_service import DownloadService
+    from app.services.upload_service import object_key_from_url, generate_presigned_get_url, get_object_size
+
+    video_path = str(media_utils.convert_url_to_path(video_path))
+    if not video_path.startswith('http'):
+        source, file_size = video_path, os.path.getsize(video_path)
+    else:
+        key = object_key_from_url(video_path)
+        if key:
+            # 预处理期间需要一直可读，有效期留足余量
+            source, file_size = generate_presigned_get_url(key, expiration=6 * 3600), get_object_size(key)
+        else:
+            source, file_size = video_path, DownloadService.get_instance().content_length(video_path)
+    if file_size and file_size > AVATAR_MAX_BYTES:
+        raise ValueError("MP4文件大小不能超过1GB")
+    return source
+
+def create_avatar_task(db_digital_human_avatar: DigitalHumanAvatar):
+    try:
+        report_progress('prepare')
+        source = resolve_avatar_source(db_digital_human_avatar.video_path)
+
+        project_root = get_settings().project_root
+        clone_dir = project_root / 'data' / 'avatar'
+        clone_human_id = f"{db_digital_human_avatar.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        avatar_dir = clone_dir / clone_human_id
+        avatar_dir.mkdir(parents=True, exist_ok=True)
+
+        # 训练预处理直接从素材解码并重采样写入数字人目录（MOV 也在这一步转为 MP4），不再下载到 origin 目录后复制
+        target_video_path = Path(avatar_dir) / "source.mp4"
+        db_digital_human_avatar.video_path = str(target_video_path)
+        db_digital_human_avatar.human_id = clone_human_id
+
+        # 训练数字人模型（绿幕数字人在训练预处理时计算全部帧的alpha）
+        video_path = str(target_video_path)
+        ultralight_service = UltralightService()
+        report_progress('train')
+        best_checkpoint_path = ultralight_service.train(video_path, avatar_dir, 'hubert', True, source=source)
+
+        # 去除绿幕：由缓存的alpha导出透明视频和透明第一帧，非绿幕数字人使用原视频第一帧
+        no_green_video_path = avatar_dir / 'remove_green' / f"no_green.webm"
+        no_green_video_path.parent.mkdir(parents=True, exist_ok=True)
+        first_frame_path = avatar_dir / 'first_frame' / f"first_frame.png"
+        first_frame_path.parent.mkdir(parents=True, exist_ok=True)
+        if not ultralight_service.export_no_green(avatar_dir, no_green_video_path, first_frame_path):
+            no_green_video_path = None
+            media_utils.extract_video_frame(video_path, 1, first_frame_path)
+
+        # 第一帧的尺寸
+        width, height = media_utils.get_image_dimensions(str(first_frame_path))
+        db_digital_human_avatar.no_green_cover_image_width = width
+        db_digital_human_avatar.no_green_cover_image_height = height
+        db_digital_human_avatar.no_green_cover_image_path = str(first_frame_path)
+        db_digital_human_avatar.no_green_video_path = str(no_green_video_path) if no_green_video_path else None
+        logger.info(f"处理完成: 第一帧 {first_frame_path}, 尺寸 {width}x{height}, 无绿幕视频 {no_green_video_path}")
+
+
+        # 生成数字人视频
+        output_video_path = avatar_dir / 'welcome' / f"welcome.mp4"
+        output_video_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 数字人统一使用默认的声音
+        default_audio = project_root / 'resources' / 'audios' / 'default_audio.wav'
+        audio_path = avatar_dir / 'default_audio.wav'
+        shutil.copy2(default_audio, audio_path)
+        db_digital_human_avatar.audio_path = str(audio_path)
+        report_progress('welcome')
+        
+        ultralight_service.generate_video(str(audio_path), avatar_dir, best_checkpoint_path, str(output_video_path), 'hubert')
+
+        # 更新数字人形象数据
+        db_digital_human_avatar.welcome_audio_path = str(audio_path)    
+        db_digital_human_avatar.welcome_video_path = str(output_video_path)
+        db_digital_human_avatar.finished_at = datetime.now()
+        total_minutes = (db_digital_human_avatar.finished_at - db_digital_human_avatar.created_at).total_seconds() / 60
+        db_digital_human_avatar.status_msg = f"克隆完成，耗时{total_minutes:.2f}分钟"
+        logger.info(f"创建数字人形象任务完成，耗时 {total_minutes:.2f} 分钟")
+        db_digital_human_avatar.status = 1
+        get_write_queue().merge(db_digital_human_avatar)
+        logger.info(f"成功更新数字人形象: {db_digital_human_avatar.id}")
+        media_utils.delete_file(db_digital_human_avatar.video_path)
+    except Exception as e:
+        logger.error(f"创建数字人形象失败: {str(e)}")
+        db_digital_human_avatar.status = 2
+        db_digital_human_avatar.status_msg = f"创建失败: {str(e)}"
+        get_write_queue().merge(db_digital_human_avatar)
+        raise Exception(f"创建数字人形象失败: {str(e)}")
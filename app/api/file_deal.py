@@ -1,27 +1,30 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
 import os
+import logging
 
+from app.schemas.file_deal import MultipartInitiate, MultipartPartUrls, MultipartComplete, MultipartAbort
 from app.utils import media_utils
+from app.utils.response_utils import success_response
+from app.utils.static_utils import range_file_response
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 @router.get("/download")
-def download_file(url: str = Query(..., description="文件的HTTP地址")):
+def download_file(request: Request, url: str = Query(..., description="文件的HTTP地址")):
     # 使用 convert_url_to_path 方法将 URL 转换为系统内部路径
     file_path = media_utils.convert_url_to_path(url)
-    print(f"文件路径: {file_path}")
+    logger.debug(f"文件路径: {file_path}")
     # 检查文件是否存在
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    # 返回文件响应
-    return FileResponse(file_path, media_type='application/octet-stream', filename=os.path.basename(file_path))
+    # 返回文件响应，支持断点续传
+    return range_file_response(request, file_path, media_type='application/octet-stream', filename=os.path.basename(file_path))
 
 
 @router.get("/get_preSign_url")
 def get_presigned_url(filename: str = Query(..., description="文件名称")):
     from app.services.upload_service import generate_presigned_url
-    from app.utils.response_utils import success_response
     
     # 调用生成预签名URL的方法
     result = generate_presigned_url(filename)
@@ -33,3 +36,64 @@ def get_presigned_url(filename: str = Query(..., description="文件名称")):
         data=result,
         message="获取预签名URL成功"
     )
+
+
+@router.post("/multipart/initiate")
+def initiate_multipart_upload(body: MultipartInitiate):
+    """
+    发起分片直传：返回上传ID和全部分片的预签名URL，客户端并行 PUT 各分片后调用 complete，
+    中断后可通过 parts 查询已上传的分片继续上传
+    """
+    from app.services.upload_service import create_multipart_upload
+
+    result = create_multipart_upload(body.filename, body.file_size, body.part_size)
+    if not result:
+        raise HTTPException(status_code=500, detail="发起分片上传失败")
+    return success_response(data=result, message="发起分片上传成功")
+
+
+@router.post("/multipart/part_urls")
+def get_multipart_part_urls(body: MultipartPartUrls):
+    """为指定分片重新生成预签名URL（续传或URL过期时使用）"""
+    from app.services.upload_service import presign_upload_parts
+
+    try:
+        parts = presign_upload_parts(body.filename, body.upload_id, body.part_numbers)
+    except Exception as e:
+        logger.error(f"生成分片预签名URL时出错: {e}")
+        raise HTTPException(status_code=500, detail="生成分片预签名URL失败")
+    return success_response(data={"uploadId": body.upload_id, "parts": parts}, message="获取分片预签名URL成功")
+
+
+@router.get("/multipart/parts")
+def get_multipart_parts(filename: str = Query(..., description="文件名称"),
+                        upload_id: str = Query(..., description="分片上传ID")):
+    """查询已上传的分片，断点续传时跳过"""
+    from app.services.upload_service import list_uploaded_parts
+
+    parts = list_uploaded_parts(filename, upload_id)
+    if parts is None:
+        raise HTTPException(status_code=500, detail="查询已上传分片失败")
+    return success_response(data={"uploadId": upload_id, "parts": parts}, message="查询已上传分片成功")
+
+
+@router.post("/multipart/complete")
+def complete_multipart_upload(body: MultipartComplete):
+    """合并分片，返回的 fileUrl 可直接作为数字人训练素材的 video_path"""
+    from app.services.upload_service import complete_multipart_upload as complete_upload
+
+    parts = [part.model_dump() for part in body.parts] if body.parts else None
+    result = complete_upload(body.filename, body.upload_id, parts)
+    if not result:
+        raise HTTPException(status_code=500, detail="完成分片上传失败")
+    return success_response(data=result, message="分片上传完成")
+
+
+@router.post("/multipart/abort")
+def abort_multipart_upload(body: MultipartAbort):
+    """取消分片上传，释放已上传的分片"""
+    from app.services.upload_service import abort_multipart_upload as abort_upload
+
+    if not abort_upload(body.filename, body.upload_id):
+        raise HTTPException(status_code=500, detail="取消分片上传失败")
+    return success_response(message="已取消分片上传")
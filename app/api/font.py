@@ -1,18 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models.font import Font
 from ..schemas.font import Font as FontSchema, FontCreate, FontUpdate
 from ..utils.response_utils import success_response, error_response
 from ..schemas.response import ApiResponse, PaginatedResponse
+from ..utils.pagination_utils import paginate
 
 router = APIRouter()
 
 @router.get("/", response_model=ApiResponse[PaginatedResponse[FontSchema]])
-def list_fonts(page: int = 1, page_size: int = 10, db: Session = Depends(get_db)):
-    """获取字体列表，支持分页"""
+def list_fonts(page: int = 1, page_size: int = 10, cursor: Optional[str] = None, with_total: bool = True,
+               db: Session = Depends(get_db)):
+    """获取字体列表，支持页码分页和游标分页（按id升序）"""
     query = db.query(Font)
-    total = query.count()
-    skip = (page - 1) * page_size
-    fonts = query.offset(skip).limit(page_size).all()
-    return success_response(data=PaginatedResponse(items=fonts, total=total))
\ No newline at end of file
+    try:
+        fonts, total, next_cursor = paginate(query, Font.id, Font.id, page, page_size, cursor, with_total, descending=False)
+    except ValueError as e:
+        return error_response(code=400, message=str(e))
+    return success_response(data=PaginatedResponse(items=fonts, total=total, next_cursor=next_cursor))
\ No newline at end of file
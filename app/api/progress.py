@@ -0,0 +1,60 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.progress_service import ProgressService
+from app.utils.response_utils import success_response, error_response
+from app.utils.user_utils import get_user_id
+from app.schemas.response import ApiResponse
+
+router = APIRouter()
+
+# 无事件时发送心跳注释的间隔，避免代理断开空闲连接
+HEARTBEAT_SECONDS = 15
+FINISHED_STATUSES = {'succeeded', 'failed', 'cancelled'}
+
+
+@router.get("/stream")
+async def stream_progress(request: Request, job_id: Optional[str] = Query(None, description="任务ID，不传时推送当前用户的全部任务")):
+    """
+    以 Server-Sent Events 推送当前用户任务的进度：阶段切换、已完成数量/总数、预计剩余秒数
+    指定任务ID时，任务结束后自动关闭连接
+    """
+    progress = ProgressService.get_instance()
+    user_id = get_user_id()
+    if job_id and not progress.is_owner(job_id, user_id):
+        return JSONResponse(status_code=404, content=error_response(code=404, message="未找到任务进度").dict())
+    queue = progress.subscribe(user_id, job_id)
+
+    async def event_stream():
+        try:
+            # 建议客户端断线3秒后重连
+            yield "retry: 3000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if job_id and event['status'] in FINISHED_STATUSES:
+                    break
+        finally:
+            progress.unsubscribe(queue, job_id)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/{job_id}", response_model=ApiResponse[dict])
+def get_progress(job_id: str):
+    """获取任务的最新进度"""
+    event = ProgressService.get_instance().latest(job_id, get_user_id())
+    if not event:
+        return error_response(code=404, message="未找到任务进度")
+    return success_response(data=event)
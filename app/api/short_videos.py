@@ -1,7 +1,7 @@
 import traceback
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime, date
 
 from ..database import get_db
@@ -12,6 +12,7 @@ from ..utils import media_utils
 from ..utils.response_utils import success_response, error_response
 from ..schemas.response import ApiResponse, PaginatedResponse
 from ..utils.user_utils import get_user_id
+from ..utils.pagination_utils import paginate, search_filter
 
 router = APIRouter()
 
@@ -24,13 +25,15 @@ def list_short_videos(
     end_time: datetime = Query(None, description="生成时间结束"),
     video_type: str = Query(None, description="视频类型"),
     status: int = Query(None, description="状态 0-生成中，1-已生成，2-生成失败需要重试"),
+    cursor: Optional[str] = Query(None, description="游标，传入上一页返回的 next_cursor 时按游标分页，忽略页码"),
+    with_total: bool = Query(True, description="是否返回总数"),
     db: Session = Depends(get_db)
 ):
     """获取短视频列表"""
     query = db.query(ShortVideo).filter(ShortVideo.is_deleted == False, ShortVideo.user_id == get_user_id())
     
     if name:
-        query = query.filter(ShortVideo.title.ilike(f"%{name}%"))
+        query = search_filter(query, ShortVideo, 'title', name)
     if start_time:
         query = query.filter(ShortVideo.created_at >= start_time)
     if end_time:
@@ -40,16 +43,21 @@ def list_short_videos(
     if status is not None:
         query = query.filter(ShortVideo.status == status)
     
-    total = query.count()
-    skip = (page - 1) * page_size
-    short_videos = query.order_by(ShortVideo.created_at.desc()).offset(skip).limit(page_size).all()
+    try:
+        short_videos, total, next_cursor = paginate(query, ShortVideo.created_at, ShortVideo.id, page, page_size, cursor, with_total)
+    except ValueError as e:
+        return error_response(code=400, message=str(e))
 
     # 转换路径为URL
     for short_video in short_videos:
         short_video.video_cover = media_utils.convert_path_to_url(short_video.video_cover)
         short_video.video_url = media_utils.convert_path_to_url(short_video.video_url)
+        if short_video.renditions:
+            short_video.renditions = {name: media_utils.convert_path_to_url(path) for name, path in short_video.renditions.items()}
+        if short_video.thumbnails:
+            short_video.thumbnails = {width: media_utils.convert_path_to_url(path) for width, path in short_video.thumbnails.items()}
 
-    return success_response(data=PaginatedResponse(items=short_videos, total=total))
+    return success_response(data=PaginatedResponse(items=short_videos, total=total, next_cursor=next_cursor))
 
 
 @router.delete("/{short_video_id}", response_model=ApiResponse[ShortVideoSchema])
@@ -7,6 +7,7 @@ from ..models.task import Task
 from ..schemas.task import Task as TaskSchema, TaskCreate, TaskUpdate
 from ..utils.response_utils import success_response, error_response
 from ..schemas.response import ApiResponse, PaginatedResponse
+from ..utils.pagination_utils import paginate
 
 router = APIRouter()
 
@@ -19,6 +20,8 @@ def list_tasks(
     start_time: Optional[datetime] = Query(None, description="计划执行时间开始"),
     end_time: Optional[datetime] = Query(None, description="计划执行时间结束"),
     task_type: Optional[str] = Query(None, description="任务类型"),
+    cursor: Optional[str] = Query(None, description="游标，传入上一页返回的 next_cursor 时按游标分页，忽略页码"),
+    with_total: bool = Query(True, description="是否返回总数"),
     db: Session = Depends(get_db)
 ):
     """获取任务列表"""
@@ -35,11 +38,12 @@ def list_tasks(
     if task_type:
         query = query.filter(Task.type == task_type)
     
-    total = query.count()
-    skip = (page - 1) * page_size
-    tasks = query.offset(skip).limit(page_size).all()
+    try:
+        tasks, total, next_cursor = paginate(query, Task.start_time, Task.id, page, page_size, cursor, with_total)
+    except ValueError as e:
+        return error_response(code=400, message=str(e))
     
-    return success_response(data=PaginatedResponse(items=tasks, total=total))
+    return success_response(data=PaginatedResponse(items=tasks, total=total, next_cursor=next_cursor))
 
 
 @router.get("/{task_id}", response_model=ApiResponse[TaskSchema])
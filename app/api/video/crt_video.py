@@ -1,35 +1,68 @@
 import shutil
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from app.models.digital_human_avatar import DigitalHumanAvatar
 from app.schemas.short_video_detail import ShortVideoDetailBase
 from app.services.task_service import TaskService
 
-from app.database import get_db
+from app.config import get_settings
+from app.database import get_db, SessionLocal, get_write_queue
 from app.models.short_video import ShortVideo
 from app.services.ultralight_service import UltralightService
 from app.utils.response_utils import success_response, error_response
 from app.schemas.response import ApiResponse
 from app.models.short_video_detail import ShortVideoDetail
 from app.services.fishspeech_service import FishSpeechService
+from app.services.material_service import MaterialService
+from app.services.artifact_service import ArtifactService
+from app.services.progress_service import report_progress
+from app.services.publish_service import publish_outputs
 from pathlib import Path
 import os
 from app.services.transcription_service import TranscriptionService
-from app.utils import media_utils, gpu_utils
+from app.utils import media_utils, gpu_utils, audio_utils
 import subprocess
 import platform
 import logging
 from app.utils.user_utils import get_user_id
 import time
+import re
+import json
+import math
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DEFAULT_TARGET_WIDTH = 1080
+DEFAULT_TARGET_HEIGHT = 1920
+
+# 批量生成时每个变体可覆盖的字段
+VARIANT_FIELDS = {
+    'digital_human_avatars_position', 'digital_human_avatars_scale',
+    'target_width', 'target_height', 'video_frame_rate', 'background_color', 'background_path',
+    'subtitle_switch', 'font_size', 'font_color', 'font_position', 'font_path', 'font_name',
+    'voice_volume', 'voice_speed', 'music_path', 'music_volume', 'music_speed', 'renditions',
+}
+
+# 背景音乐速度范围，与单个 atempo 滤镜在各 ffmpeg 版本中都支持的范围一致
+MUSIC_SPEED_RANGE = (0.5, 2.0)
+
+# 输出阶梯，按短边缩放；短边不小于主视频的版本会被跳过
+RENDITION_LADDER = {
+    '720p': {'short_side': 720, 'quality': 25, 'maxrate': '2500k', 'audio_bitrate': '128k'},
+    '360p': {'short_side': 360, 'quality': 30, 'maxrate': '600k', 'audio_bitrate': '64k'},
+}
+
 @router.post("", response_model=ApiResponse)
-def create_video(mix_data: ShortVideoDetailBase, db: Session = Depends(get_db)):
+def create_video(mix_data: ShortVideoDetailBase,
+                 preview: bool = Query(False, description="预览模式：后台低分辨率快速渲染第一句，返回任务ID，不保存短视频记录"),
+                 db: Session = Depends(get_db)):
     """
     创建口播视频
     """
@@ -71,6 +104,33 @@ def create_video(mix_data: ShortVideoDetailBase, db: Session = Depends(get_db)):
         if not digital_human:
             return error_response(code=400, message="指定的数字人不存在")
 
+    if not valid_music_speed(mix_data.music_speed):
+        return error_response(code=400, message=f"背景音乐速度必须在 {MUSIC_SPEED_RANGE[0]}-{MUSIC_SPEED_RANGE[1]} 之间")
+
+    if mix_data.variants:
+        for variant in mix_data.variants:
+            unknown_fields = set(variant) - VARIANT_FIELDS
+            if unknown_fields:
+                return error_response(code=400, message=f"不支持的变体字段: {', '.join(sorted(unknown_fields))}")
+            unknown_renditions = set(variant.get('renditions') or []) - set(RENDITION_LADDER)
+            if unknown_renditions:
+                return error_response(code=400, message=f"不支持的输出版本: {', '.join(sorted(unknown_renditions))}")
+            if not valid_music_speed(variant.get('music_speed')):
+                return error_response(code=400, message=f"背景音乐速度必须在 {MUSIC_SPEED_RANGE[0]}-{MUSIC_SPEED_RANGE[1]} 之间")
+
+    # 每条短视频记录对应一个变体，参数相同的变体只会合成出同一个文件
+    overrides = mix_data.variants or []
+    variant_count = max(mix_data.generation_count or 1, len(overrides))
+    max_generation_count = get_settings().video_max_generation_count
+    if (mix_data.generation_count is not None and mix_data.generation_count < 1) or variant_count > max_generation_count:
+        return error_response(code=400, message=f"生成数量必须在 1-{max_generation_count} 之间")
+    padded_overrides = overrides + [{}] * (variant_count - len(overrides))
+    if len({json.dumps(override, sort_keys=True, ensure_ascii=False) for override in padded_overrides}) < variant_count:
+        return error_response(code=400, message=f"生成 {variant_count} 个视频需要 {variant_count} 组互不相同的变体参数（未提供的按默认参数生成）")
+
+    if preview:
+        return create_preview(mix_data, db)
+
     try:
         logger.info(f"创建短视频详情记录")
         db_short_video_detail = ShortVideoDetail(**mix_data.model_dump())
@@ -86,34 +146,176 @@ def create_video(mix_data: ShortVideoDetailBase, db: Session = Depends(get_db)):
         task_func = lambda: create_video_by_human(db_short_video_detail)
         task_service.execute_task_immediately(task_func=task_func, task_id=task_id, task_name=task_name)
 
-        return success_response(message="已经开始创建口播视频")
+        return success_response(data={"task_id": task_id, "short_video_detail_id": db_short_video_detail.id},
+                                message="已经开始创建口播视频")
     except Exception as e:
         logger.error(f"创建短视频记录失败: {str(e)}", exc_info=True)
         db.rollback()
         return error_response(code=500, message=f"创建短视频记录失败: {str(e)}")
 
 
+def create_preview(mix_data: ShortVideoDetailBase, db: Session):
+    """
+    提交预览任务：只取文案第一句（真人录制取前几秒），按低分辨率、低帧率和最快编码预设合成，
+    立即返回任务ID，进度和结果（预览视频、封面URL）通过 /api/progress 获取
+
+    预览的配音按截取的文案缓存，重复预览同一段文案时复用；正式生成的文案不同，需重新合成
+    """
+    short_video_detail = ShortVideoDetail(**mix_data.model_dump())
+    try:
+        human_id, is_public = resolve_digital_human(db, short_video_detail)
+    except ValueError as e:
+        return error_response(code=400, message=str(e))
+
+    preview_id = uuid.uuid4().hex
+    task_id = f"preview_{preview_id}"
+    task_name = f"预览口播视频_{short_video_detail.video_title}"
+    task_func = lambda: render_preview(short_video_detail, human_id, is_public, preview_id)
+    TaskService.get_instance().execute_task_immediately(task_func=task_func, task_id=task_id, task_name=task_name)
+    return success_response(data={"task_id": task_id}, message="已经开始生成预览视频")
+
+
+def render_preview(short_video_detail: ShortVideoDetail, human_id: str, is_public: bool, preview_id: str):
+    """
+    生成预览视频，在后台任务中执行
+
+    :return: {'video_url': 预览视频URL, 'video_cover': 封面URL}，作为任务结果随结束事件推送
+    """
+    stage_start_time = time.time()
+    settings = get_settings()
+    data_root = settings.project_root / 'data' / 'video' / 'preview' / preview_id
+    download_origin_dir = data_root / 'origin'
+    download_delete_dir = data_root / 'delete'
+    download_voice_dir = get_settings().project_root / 'data' / 'public' / 'voice'
+    for path in [data_root, download_origin_dir, download_voice_dir]:
+        path.mkdir(parents=True, exist_ok=True)
+
+    try:
+        report_progress('tts')
+        excerpt = first_sentence(short_video_detail.script_content or '')
+        temp_audio_prompt_wav_path, voice_path = synthesize_voice(short_video_detail, excerpt, data_root, data_root / 'voice.wav',
+                                                                  download_origin_dir, download_delete_dir, download_voice_dir)
+        if short_video_detail.voice_switch == 1:
+            media_utils.trim_media(temp_audio_prompt_wav_path, settings.video_preview_max_seconds)
+        feature_voice_path = adjust_voice(temp_audio_prompt_wav_path, voice_path, short_video_detail.voice_volume, short_video_detail.voice_speed)
+
+        digital_human_video_path = UltralightService().generate_video_by_human_id(
+            audio_path=voice_path,
+            human_id=human_id,
+            output_path=str(data_root / 'human.mp4'),
+            is_public=is_public,
+            feature_audio_path=feature_voice_path
+        )
+
+        variant = build_variants(short_video_detail)[0]
+        # 按比例缩小画布、人物位置和缩放，字幕由 ASS 按分辨率自动缩放
+        ratio = settings.video_preview_short_side / min(variant.target_width, variant.target_height)
+        x, y = (float(value) for value in variant.digital_human_avatars_position.split(','))
+        variant.target_width, variant.target_height = scale_to_short_side(variant.target_width, variant.target_height, settings.video_preview_short_side)
+        variant.digital_human_avatars_position = f"{x * ratio},{y * ratio}"
+        variant.digital_human_avatars_scale = variant.digital_human_avatars_scale * ratio
+        variant.video_frame_rate = min(variant.video_frame_rate, settings.video_preview_frame_rate)
+        variant.script_content = excerpt
+        variant.preview = True
+
+        report_progress('compose')
+        alpha_path = UltralightService().get_alpha_loop(human_id, is_public)
+        outputs = compose_variant(variant, digital_human_video_path, voice_path, data_root / 'preview.mp4', data_root / 'subtitle.ass',
+                                  alpha_path)
+        logger.info(f"预览视频生成完成，耗时: {time.time() - stage_start_time:.2f}秒")
+        return {
+            "video_url": media_utils.convert_path_to_url(str(outputs['video'])),
+            "video_cover": media_utils.convert_path_to_url(str(outputs['cover'])),
+        }
+    except Exception as e:
+        logger.error(f"预览视频生成失败: {str(e)}", exc_info=True)
+        raise
+    finally:
+        media_utils.delete_directory(download_delete_dir)
+
+
+def resolve_digital_human(db: Session, short_video_detail):
+    """
+    确定渲染使用的数字人：传了数字人ID时按记录的 human_id 和类型；公共数字人（type=0）未传ID时使用传值的 human_id
+
+    :return: (human_id, 是否为公共数字人)
+    """
+    if short_video_detail.digital_human_avatars_id:
+        digital_human = db.query(DigitalHumanAvatar).filter(DigitalHumanAvatar.id == short_video_detail.digital_human_avatars_id).first()
+        if digital_human and digital_human.human_id and digital_human.human_id != 'None':
+            return digital_human.human_id, digital_human.type != 1
+    elif short_video_detail.digital_human_avatars_type == 0 and short_video_detail.digital_human_avatars_human_id:
+        return short_video_detail.digital_human_avatars_human_id, True
+    raise ValueError(f"未找到ID为{short_video_detail.digital_human_avatars_id}的数字人")
+
+
+def first_sentence(text, min_chars=8):
+    """
+    截取文案的第一句，过短时继续拼接下一句
+
+    :param text: 文案
+    :param min_chars: 最少字符数
+    :return: 截取的文案
+    """
+    excerpt = ''
+    for part in re.split(r'(?<=[。！？!?；;\n])', text):
+        excerpt += part
+        if len(excerpt.strip()) >= min_chars:
+            break
+    return excerpt.strip() or text
+
+
+def build_variants(short_video_detail: ShortVideoDetail):
+    """
+    根据 generation_count 和 variants 展开每个视频的生成参数
+
+    :param short_video_detail: 短视频详情
+    :return: 参数列表，每项为覆盖了变体字段后的 SimpleNamespace
+    """
+    base = {column.name: getattr(short_video_detail, column.name) for column in short_video_detail.__table__.columns}
+    base.update(target_width=DEFAULT_TARGET_WIDTH, target_height=DEFAULT_TARGET_HEIGHT, background_color='black', preview=False,
+                renditions=list(get_settings().video_renditions))
+
+    overrides = list(short_video_detail.variants or [])
+    count = max(short_video_detail.generation_count or 1, len(overrides), 1)
+    variants = []
+    for index in range(count):
+        override = overrides[index] if index < len(overrides) else {}
+        unknown_fields = set(override) - VARIANT_FIELDS
+        if unknown_fields:
+            raise ValueError(f"不支持的变体字段: {', '.join(sorted(unknown_fields))}")
+        unknown_renditions = set(override.get('renditions', [])) - set(RENDITION_LADDER)
+        if unknown_renditions:
+            raise ValueError(f"不支持的输出版本: {', '.join(sorted(unknown_renditions))}")
+        variants.append(SimpleNamespace(**{**base, **override}))
+    return variants
+
+
 def create_video_by_human(short_video_detail: ShortVideoDetail):
     """
     创建口播视频
+
+    generation_count > 1 时批量生成：配音只合成一次，每种音量/语速只提取一次特征并渲染一次数字人，
+    各变体的合成在线程池中并行执行，每个变体对应一条短视频记录
     """
     logger.info(f"开始处理视频生成任务，视频ID: {short_video_detail.id}")
 
     # 全局变量
     script_content = short_video_detail.script_content
     # video_duration = short_video_detail.video_duration
-    target_width = 1080
-    target_height = 1920
+    # 变体参数在记录创建后的 try 中展开，参数错误也会记录到短视频
+    variant_count = max(short_video_detail.generation_count or 1, len(short_video_detail.variants or []), 1)
     # 定义文件路径
     voice_id = f"{short_video_detail.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    data_root = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'video' / voice_id
-    voice_path = data_root / 'voice.wav'
-    digital_human_video_path = data_root / 'human.mp4'
-    music_path = data_root / 'music.wav'
-    subtitle_path = data_root / 'subtitle.ass'
-    download_material_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'material'
-    download_avatar_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'avatar'
-    download_voice_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'voice'
+    data_root = get_settings().project_root / 'data' / 'video' / voice_id
+    # 配音、特征、数字人渲染、字幕等中间文件写入任务临时目录（优先 tmpfs），任务结束即删除，data_root 只保留成品
+    artifact_service = ArtifactService.get_instance()
+    scratch_dir = artifact_service.create_scratch(voice_id)
+    voice_path = scratch_dir / 'voice.wav'
+    digital_human_video_path = scratch_dir / 'human.mp4'
+    download_material_dir = get_settings().project_root / 'data' / 'public' / 'material'
+    download_avatar_dir = get_settings().project_root / 'data' / 'public' / 'avatar'
+    download_voice_dir = get_settings().project_root / 'data' / 'public' / 'voice'
     # 用户自己上传的文件，暂不删除
     download_origin_dir =  data_root / 'origin'
     # 公共数字人压缩包，需删除
@@ -123,285 +325,414 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
     for path in [data_root, download_material_dir, download_avatar_dir, download_voice_dir, download_origin_dir]:
         path.mkdir(parents=True, exist_ok=True)
 
-    # 在短视频表中新增一条初始记录
-    db = next(get_db())
-    new_short_video = ShortVideo(
-        title=short_video_detail.video_title,
-        type=0,
-        status=0,
-        short_videos_detail_id=short_video_detail.id,
-        created_at=datetime.now(),
-        user_id=short_video_detail.user_id
-    )
-    db.add(new_short_video)
+    # 在短视频表中为每个变体新增一条初始记录
+    db = SessionLocal()
+    write_queue = get_write_queue()
+    short_videos = []
+    for _ in range(variant_count):
+        new_short_video = ShortVideo(
+            title=short_video_detail.video_title,
+            type=0,
+            status=0,
+            short_videos_detail_id=short_video_detail.id,
+            created_at=datetime.now(),
+            user_id=short_video_detail.user_id
+        )
+        db.add(new_short_video)
+        short_videos.append(new_short_video)
     db.commit()
-    db.refresh(new_short_video)
+    for new_short_video in short_videos:
+        db.refresh(new_short_video)
 
     try:
-        logger.info("初始化短视频记录")
+        logger.info(f"初始化短视频记录，共 {len(short_videos)} 个")
+        variants = build_variants(short_video_detail)
 
         # 1. 如果开启真人录制，不使用AI生成声音，否则使用AI生成声音
         stage_start_time = time.time()
-        if short_video_detail.voice_switch == 1:
-            logger.info("处理真人录制语音")
-            short_video_detail.voice_path = media_utils.handle_media_url(short_video_detail.voice_path, download_origin_dir)
-            voice_path = voice_path.with_suffix(Path(short_video_detail.voice_path).suffix)
-            shutil.copy2(short_video_detail.voice_path, voice_path)
-        else:
-            voice_output_npy_path = data_root / 'tmp_voice.npy'
-            temp_audio_prompt_wav_path = data_root / 'tmp_voice.wav'
-            voice_material_type = short_video_detail.voice_material_type
-            voice_npy_prompt_text = short_video_detail.voice_npy_prompt_text
-            voice_voice_id = short_video_detail.voice_voice_id
-
-            fish_speech_service = FishSpeechService()
-
-            # 公共的配音
-            if not voice_voice_id:
-                raise ValueError("远端voice_voice_id不能为空")
-            voice_dir = download_voice_dir / voice_voice_id
-            if not voice_dir.exists():
-                media_utils.download_and_extract(short_video_detail.voice_download_url,  # 下载url
-                                                 download_delete_dir,  # 下载本地目录
-                                                 download_voice_dir)  # 解压目录
-            npy_prompt_text = voice_npy_prompt_text
-            npy_path = voice_dir / 'prompt' /'audio_prompt.npy'
-
-
-            fish_speech_service.generate_speech(
-                script_content,
-                npy_prompt_text,
-                npy_path,
-                voice_output_npy_path,
-                temp_audio_prompt_wav_path
-            )
-        media_utils.adjust_audio_volume_and_speed(temp_audio_prompt_wav_path, voice_path, volume=short_video_detail.voice_volume, speed=short_video_detail.voice_speed)
+        report_progress('tts')
+        temp_audio_prompt_wav_path, voice_path = synthesize_voice(short_video_detail, script_content, scratch_dir, voice_path,
+                                                                  download_origin_dir, download_delete_dir, download_voice_dir)
         logger.info(f"音频耗时: {time.time() - stage_start_time:.2f}秒")
 
 
-        # 2. 根据人物生成透明口播视频
-        # 使用ultralight生成数字人视频
+        # 2. 根据人物生成透明口播视频，每种音量/语速组合只渲染一次
+        stage_start_time = time.time()
         ultralight_service = UltralightService()
         # 公共数字人取传值human_id 否则获取 本地human_id
-        digitalHumanAvatarObj = db.query(DigitalHumanAvatar).filter(DigitalHumanAvatar.id == short_video_detail.digital_human_avatars_id).first()
-        human_id = digitalHumanAvatarObj.human_id
-        human_type = digitalHumanAvatarObj.type
-        is_public = True
-        if human_type == 1:
-            is_public = False
-        if not human_id or human_id == 'None':
-            raise ValueError(f"未找到ID为{short_video_detail.digital_human_avatars_id}的数字人")
-        digital_human_video_path = ultralight_service.generate_video_by_human_id(
-            audio_path=voice_path,
-            human_id=human_id,
-            output_path=str(digital_human_video_path),
-            is_public=is_public
-        )
-
-
-
-        temp_bg_path = data_root / 'tmp_black_bg.mp4'
-        command = [
-            'ffmpeg',
-            '-f', 'lavfi',
-            '-i', f'color=c=black:s={target_width}x{target_height}:r={short_video_detail.video_frame_rate}',
-            '-frames:v', '1',
-            '-y',
-            str(temp_bg_path)
-        ]
-        subprocess.run(command, check=True, capture_output=True, text=True)
-        background_video_path = str(temp_bg_path)
-
-
-        # 根据digital_human_avatars_position和digital_human_avatars_scale合并背景视频和透明口播视频
-        position = short_video_detail.digital_human_avatars_position.split(',')
-        # 将字符串坐标转换为浮点数，然后转换为整数
-        x, y = int(float(position[0])), int(float(position[1]))
-        scale = short_video_detail.digital_human_avatars_scale
-
-        # 构建ffmpeg命令
-        output_path = data_root / 'merged_bg_human.mp4'
-
-        # GPU相关配置
-        use_gpu = gpu_utils.check_gpu_available()
-        video_codec = 'h264_nvenc' if use_gpu else 'libx264'
-        encoding_preset = 'p4' if use_gpu else 'faster'
-
-        command = [
-            'ffmpeg',
-            '-i', str(adjust_background_video_duration(digital_human_video_path, background_video_path)),
-            '-i', str(digital_human_video_path),
-            '-filter_complex',
-            f'[0]fps={short_video_detail.video_frame_rate},scale={target_width}:{target_height}[bg];'
-            f'[1]fps={short_video_detail.video_frame_rate}[fg];'
-            f'[fg]scale=iw*{scale}:ih*{scale}[scaled];'
-            f'[bg][scaled]overlay={x}:{y}:format=auto[v]',
-            '-map', '[v]',
-            '-map', '1:a',
-            '-c:v', video_codec,
-            '-preset', encoding_preset,
-            *(['-rc', 'vbr', '-cq', '26'] if use_gpu else ['-crf', '26']),
-            '-r', str(short_video_detail.video_frame_rate),
-            '-y',
-            str(output_path)
-        ]
-        logger.info(f"执行ffmpeg命令: {' '.join(str(x) for x in command)}")
-        subprocess.run(command, check=True, capture_output=True)
-        background_video_path = output_path
-        logger.info(f"更新背景视频路径为合并后的视频: {background_video_path}")
-        logger.info(f"生成人物耗时:: {time.time() - stage_start_time:.2f}秒")
+        human_id, is_public = resolve_digital_human(db, short_video_detail)
+
+        renders = {}
+        for variant in variants:
+            audio_key = (variant.voice_volume, variant.voice_speed)
+            if audio_key in renders:
+                continue
+            suffix = f"_{len(renders)}" if renders else ""
+            render_voice_path = voice_path.with_name(f"{voice_path.stem}{suffix}{voice_path.suffix}")
+            feature_voice_path = adjust_voice(temp_audio_prompt_wav_path, render_voice_path, variant.voice_volume, variant.voice_speed)
+            render_video_path = ultralight_service.generate_video_by_human_id(
+                audio_path=render_voice_path,
+                human_id=human_id,
+                output_path=str(digital_human_video_path.with_name(f"{digital_human_video_path.stem}{suffix}.mp4")),
+                is_public=is_public,
+                feature_audio_path=feature_voice_path
+            )
+            renders[audio_key] = (render_voice_path, render_video_path)
+        alpha_path = ultralight_service.get_alpha_loop(human_id, is_public)
+        logger.info(f"生成人物耗时: {time.time() - stage_start_time:.2f}秒, 共渲染 {len(renders)} 次")
 
-        # 4. 生成字幕
+        # 3. 并行合成各变体，参数完全相同的变体只合成一次
         stage_start_time = time.time()
-        merge_subtitle_audio_path = background_video_path
-        if short_video_detail.subtitle_switch == 1:
-            logger.info("处理字幕生成")
-            merge_subtitle_audio_path = merge_subtitle(short_video_detail, background_video_path, subtitle_path, voice_path, target_width, target_height)
-            logger.info(f"合并字幕：耗时: {time.time() - stage_start_time:.2f}秒")
-
-        # 6. 更新短视频记录状态为已完成
-        new_short_video.status = 1  # 1表示已生成
-        new_short_video.video_url = str(merge_subtitle_audio_path)
-        first_frame_path = media_utils.extract_video_frame(merge_subtitle_audio_path)
-        new_short_video.video_cover = str(first_frame_path)
-        new_short_video.finished_at = datetime.now()
-        db.merge(new_short_video)
-        db.commit()
-        # print(f"已为第 {i+1} 个视频创建短视频记录，ID: {new_short_video.id}")
+        jobs = {}
+        for index, (variant, new_short_video) in enumerate(zip(variants, short_videos)):
+            signature = tuple(repr(getattr(variant, field)) for field in sorted(VARIANT_FIELDS))
+            jobs.setdefault(signature, (variant, index, []))[2].append(new_short_video)
+
+        max_workers = max(1, min(len(jobs), get_settings().video_variant_workers))
+        composed = 0
+        report_progress('compose', composed, len(jobs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for variant, index, rows in jobs.values():
+                render_voice_path, render_video_path = renders[(variant.voice_volume, variant.voice_speed)]
+                future = executor.submit(compose_variant, variant, render_video_path, render_voice_path,
+                                         data_root / f'video_{index}.mp4', scratch_dir / f'subtitle_{index}.ass', alpha_path)
+                futures[future] = rows
+
+            for future in as_completed(futures):
+                rows = futures[future]
+                composed += 1
+                report_progress('compose', composed, len(jobs))
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    logger.error(f"变体合成失败: {str(e)}", exc_info=True)
+                    for new_short_video in rows:
+                        new_short_video.status = 2  # 2表示生成失败需要重试
+                        new_short_video.status_msg = str(e)
+                        new_short_video.finished_at = datetime.now()
+                    write_queue.merge(*rows)
+                    continue
+
+                # 上传到对象存储，失败时保留本地路径由本机静态目录提供
+                try:
+                    outputs = publish_outputs(outputs)
+                except Exception as e:
+                    logger.error(f"成片发布到对象存储失败，保留本地文件: {str(e)}", exc_info=True)
+
+                # 参数相同的变体共用同一份成品（短视频为软删除，无需各自复制）
+                for new_short_video in rows:
+                    # 更新短视频记录状态为已完成
+                    new_short_video.status = 1  # 1表示已生成
+                    new_short_video.video_url = str(outputs['video'])
+                    new_short_video.video_cover = str(outputs['cover'])
+                    new_short_video.renditions = {name: str(path) for name, path in outputs['renditions'].items()}
+                    new_short_video.thumbnails = {str(width): str(path) for width, path in outputs['thumbnails'].items()} or None
+                    new_short_video.finished_at = datetime.now()
+                write_queue.merge(*rows)
+        logger.info(f"合成视频耗时: {time.time() - stage_start_time:.2f}秒, 共合成 {len(jobs)} 个")
     except Exception as e:
         logger.error(f"视频生成过程出错: {str(e)}", exc_info=True)
-        # 更新短视频记录状态为生成失败
-        new_short_video.status = 2  # 2表示生成失败需要重试
-        new_short_video.status_msg = str(e)
-        new_short_video.finished_at = datetime.now()
-        db.merge(new_short_video)
-        db.commit()
+        # 更新未完成的短视频记录状态为生成失败
+        for new_short_video in short_videos:
+            if new_short_video.status != 0:
+                continue
+            new_short_video.status = 2  # 2表示生成失败需要重试
+            new_short_video.status_msg = str(e)
+            new_short_video.finished_at = datetime.now()
+        write_queue.merge(*[row for row in short_videos if row.status == 2])
         
         # 记录详细的错误堆栈息
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"错误堆栈信息:\n{error_trace}")
+        logger.error(f"生成口播视频失败: {str(e)}", exc_info=True)
         raise
     finally:
+        db.close()
         media_utils.delete_directory(download_delete_dir)
+        artifact_service.release_scratch(scratch_dir)
 
 
-def merge_subtitle(short_video_detail, final_output_video_path, subtitle_path, voice_path, target_width, target_height):
-    try:
-        # 生成字幕文件（如果不存在）
-        if not os.path.exists(subtitle_path):
-            transcription_service = TranscriptionService()
-
-            # 准备字体样式配置
-            font_temp_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'font'
-            font_temp_dir.mkdir(parents=True, exist_ok=True)
-            font_temp_path = font_temp_dir / Path(short_video_detail.font_path).name
-
-            # 如果本地不存在字体文件则下载
-            if not os.path.exists(font_temp_path):
-                font_temp_path = media_utils.download_media(short_video_detail.font_path, str(font_temp_dir), keep_name=True)
-                if not font_temp_path:
-                    raise ValueError("下载字体文件失败")
-
-            # 获取字幕位置
-            x, y, r = map(float, short_video_detail.font_position.split(','))
-
-            # 配置ASS字幕样式
-            font_style = {
-                "font_name": short_video_detail.font_name,
-                "font_file": str(font_temp_path),
-                "font_size": short_video_detail.font_size,
-                "margin_v": y,
-                "margin_l": x,
-                "margin_r": r,
-                "alignment": 8,
-                "outline": 0,
-                "shadow": 0,
-                "primary_color": "&H" + short_video_detail.font_color,
-                "outline_color": "&H00000000"
-            }
-
-            prompt_text = short_video_detail.script_content
-
-            # 使用generate_ass_file生成ASS字幕
-            transcription_service.generate_ass_file(voice_path, str(subtitle_path), font_style, resolution=(target_height, target_width), prompt_text=prompt_text)
-
-        output_file = Path(final_output_video_path).with_name(f"with_subtitle_{Path(final_output_video_path).name}")
-
-        # 构建ffmpeg命令 - 简化为直接使用ASS字幕
-        if platform.system() == "Windows":
-            subtitle_path = str(subtitle_path).replace("\\", "\\\\").replace(":", "\\:")
-        ffmpeg_cmd = ' '.join([
-            'ffmpeg',
-            '-i', str(final_output_video_path),
-            '-vf', f"ass='{str(subtitle_path)}'",
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-crf', '23',
-            '-c:a', 'copy',
-            '-y',
-            str(output_file)
-        ])
-
-        subprocess.run(ffmpeg_cmd, shell=True, check=True, capture_output=True, text=True)
-        logger.info(f"字幕合并命令执行成功，输出文件：{output_file}")
-
-        return output_file
+def synthesize_voice(short_video_detail, script_content, data_root, voice_path,
+                     download_origin_dir, download_delete_dir, download_voice_dir):
+    """
+    准备未调整音量语速的原始配音：真人录制直接复制，否则使用AI合成（相同文案和声音命中缓存）
 
-    except Exception as e:
-        logger.error(f"添加字幕时出错: {str(e)}")
-        logger.error(f"FFmpeg命令: {' '.join(ffmpeg_cmd)}")
-        # 记录详细的错误堆栈信息
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(f"错误堆栈信息:\n{error_trace}")
-        raise
+    :return: (原始配音路径, 成品配音路径)，真人录制时成品配音后缀与录音一致
+    """
+    if short_video_detail.voice_switch == 1:
+        logger.info("处理真人录制语音")
+        short_video_detail.voice_path = media_utils.handle_media_url(short_video_detail.voice_path, download_origin_dir)
+        voice_path = voice_path.with_suffix(Path(short_video_detail.voice_path).suffix)
+        temp_audio_prompt_wav_path = data_root / f"tmp_voice{voice_path.suffix}"
+        shutil.copy2(short_video_detail.voice_path, temp_audio_prompt_wav_path)
+        return temp_audio_prompt_wav_path, voice_path
+
+    voice_output_npy_path = data_root / 'tmp_voice.npy'
+    temp_audio_prompt_wav_path = data_root / 'tmp_voice.wav'
+    voice_npy_prompt_text = short_video_detail.voice_npy_prompt_text
+    voice_voice_id = short_video_detail.voice_voice_id
+
+    fish_speech_service = FishSpeechService()
+
+    # 公共的配音
+    if not voice_voice_id:
+        raise ValueError("远端voice_voice_id不能为空")
+    voice_dir = download_voice_dir / voice_voice_id
+    media_utils.download_and_extract(short_video_detail.voice_download_url,  # 下载url
+                                     download_delete_dir,  # 下载本地目录
+                                     download_voice_dir,  # 解压目录
+                                     voice_dir)  # 已存在则跳过
+    npy_prompt_text = voice_npy_prompt_text
+    npy_path = voice_dir / 'prompt' /'audio_prompt.npy'
+
+    fish_speech_service.generate_speech_cached(
+        script_content,
+        npy_prompt_text,
+        npy_path,
+        voice_output_npy_path,
+        temp_audio_prompt_wav_path
+    )
+    return temp_audio_prompt_wav_path, voice_path
 
 
-def adjust_background_video_duration(digital_human_video_path, background_video_path):
+def adjust_voice(input_path, voice_path, volume, speed):
     '''
-        调节背景时长与数字人时长一致
-        :param digital_human_video_path: 数字人路径
-        :param background_video_path: 背景时长
+        调整配音的音量和语速，WAV 音频在内存中处理并同时输出16kHz特征音频
+        :param input_path: 原始音频路径
+        :param voice_path: 调整后的音频路径
+        :param volume: 音量倍数
+        :param speed: 语速倍数
+        :return: 16kHz特征音频路径，非WAV音频返回None
     '''
-    # 获取视频的时长
-    background_duration = media_utils.get_video_duration(background_video_path)
-    digital_human_duration = media_utils.get_video_duration(digital_human_video_path)
-
-    if not isinstance(background_video_path, Path):
-        background_video_path = Path(background_video_path)
-    # 创建一个临时文件路径
-    temp_adjusted_path = background_video_path.parent / (background_video_path.stem + ".duration.mp4")
-
-    if background_duration > digital_human_duration:
-        # 裁剪背景视频到数字人视频的时长
-        command = [
-            'ffmpeg',
-            '-i', background_video_path,
-            '-t', str(digital_human_duration),
-            '-c:v', 'copy',
-            '-c:a', 'copy',
-            '-y',
-            temp_adjusted_path
-        ]
+    voice_path = Path(voice_path)
+    if Path(input_path).suffix.lower() != '.wav':
+        # 真人录制的其他格式音频仍交给ffmpeg解码
+        media_utils.adjust_audio_volume_and_speed(input_path, voice_path.with_name(f"adjusted{voice_path.suffix}"), volume=volume, speed=speed)
+        shutil.move(voice_path.with_name(f"adjusted{voice_path.suffix}"), voice_path)
+        return None
+
+    feature_voice_path = voice_path.with_name(f"{voice_path.stem}_16k.wav")
+    audio_utils.postprocess_speech(input_path, voice_path, feature_voice_path, volume=volume, speed=speed)
+    return feature_voice_path
+
+
+def generate_subtitle(short_video_detail, subtitle_path, voice_path, target_width, target_height):
+    """
+    生成ASS字幕文件，同一音频的转录结果由 TranscriptionService 缓存
+
+    :param short_video_detail: 视频参数（字体、字幕位置等）
+    :param subtitle_path: 字幕输出路径
+    :param voice_path: 配音路径
+    :param target_width: 视频宽
+    :param target_height: 视频高
+    :return: 字幕路径
+    """
+    if os.path.exists(subtitle_path):
+        return subtitle_path
+    transcription_service = TranscriptionService()
+
+    # 准备字体样式配置
+    font_temp_dir = get_settings().project_root / 'data' / 'public' / 'font'
+    font_temp_dir.mkdir(parents=True, exist_ok=True)
+    font_temp_path = font_temp_dir / Path(short_video_detail.font_path).name
+
+    # 如果本地不存在字体文件则下载
+    if not os.path.exists(font_temp_path):
+        font_temp_path = media_utils.download_media(short_video_detail.font_path, str(font_temp_dir), keep_name=True, use_cache=True)
+        if not font_temp_path:
+            raise ValueError("下载字体文件失败")
+
+    # 获取字幕位置
+    x, y, r = map(float, short_video_detail.font_position.split(','))
+
+    # 配置ASS字幕样式
+    font_style = {
+        "font_name": short_video_detail.font_name,
+        "font_file": str(font_temp_path),
+        "font_size": short_video_detail.font_size,
+        "margin_v": y,
+        "margin_l": x,
+        "margin_r": r,
+        "alignment": 8,
+        "outline": 0,
+        "shadow": 0,
+        "primary_color": "&H" + short_video_detail.font_color,
+        "outline_color": "&H00000000"
+    }
+
+    prompt_text = short_video_detail.script_content
+
+    # 使用generate_ass_file生成ASS字幕
+    transcription_service.generate_ass_file(voice_path, str(subtitle_path), font_style, resolution=(target_height, target_width), prompt_text=prompt_text)
+    return subtitle_path
+
+
+def compose_variant(variant, digital_human_video_path, voice_path, output_path, subtitle_path, alpha_path=None):
+    """
+    合成单个变体：背景、数字人叠加、字幕烧录以及各分辨率版本、封面和缩略图在一次ffmpeg调用中完成
+    背景视频/图片使用素材缓存中按目标分辨率和帧率归一化的版本循环读取，未设置时使用纯色背景
+    背景音乐按素材索引中的响度计算增益，经侧链压缩在人声下避让后与人声混合，同在这一次调用中完成
+
+    :param variant: 变体参数，见 build_variants
+    :param digital_human_video_path: 数字人视频路径
+    :param voice_path: 配音路径（用于生成字幕）
+    :param output_path: 输出视频路径
+    :param subtitle_path: 字幕文件路径
+    :param alpha_path: 绿幕数字人的alpha循环视频，与数字人视频逐帧对齐，为None时不透明叠加
+    :return: {'video': 主视频路径, 'cover': 封面路径, 'thumbnails': {宽度: WebP缩略图路径}, 'renditions': {版本名: 路径}}
+    """
+    target_width = variant.target_width
+    target_height = variant.target_height
+    frame_rate = variant.video_frame_rate
+
+    # 根据digital_human_avatars_position和digital_human_avatars_scale合并背景和透明口播视频
+    position = variant.digital_human_avatars_position.split(',')
+    # 将字符串坐标转换为浮点数，然后转换为整数
+    x, y = int(float(position[0])), int(float(position[1]))
+    scale = variant.digital_human_avatars_scale
+
+    # 绿幕数字人使用预先计算的alpha合并为RGBA后叠加，无需逐帧重新抠像
+    human_label = '[1][2]alphamerge' if alpha_path else '[1]'
+    filter_complex = (
+        f'{human_label},fps={frame_rate},scale=iw*{scale}:ih*{scale}[scaled];'
+        f'[0][scaled]overlay={x}:{y}:format=auto:shortest=1[composed]'
+    )
+    if variant.subtitle_switch == 1:
+        logger.info("处理字幕生成")
+        generate_subtitle(variant, subtitle_path, voice_path, target_width, target_height)
+        escaped_subtitle_path = str(subtitle_path)
+        if platform.system() == "Windows":
+            escaped_subtitle_path = escaped_subtitle_path.replace("\\", "\\\\").replace(":", "\\:")
+        filter_complex += f";[composed]ass='{escaped_subtitle_path}'[subtitled]"
+        composed_label = 'subtitled'
+    else:
+        composed_label = 'composed'
+
+    # 输出阶梯：同一次解码和滤镜结果经 split 分发给主视频、各低分辨率版本和封面
+    output_path = Path(output_path)
+    ladder = [(name, RENDITION_LADDER[name]) for name in variant.renditions
+              if RENDITION_LADDER[name]['short_side'] < min(target_width, target_height) and not variant.preview]
+    labels = ['master'] + [name for name, _ in ladder] + ['cover']
+    filter_complex += f";[{composed_label}]split={len(labels)}" + ''.join(f'[{label}]' for label in labels)
+    for name, rendition in ladder:
+        width, height = scale_to_short_side(target_width, target_height, rendition['short_side'])
+        filter_complex += f";[{name}]scale={width}:{height}[{name}_out]"
+    cover_filter, cover_args, cover_path, thumbnails = media_utils.cover_outputs(
+        'cover', output_path, thumbnail_widths=[] if variant.preview else None)
+    filter_complex += cover_filter
+
+    # 音频：人声来自数字人视频，开启背景音乐时在同一滤镜图中混音
+    extra_inputs = ['-stream_loop', '-1', '-i', str(alpha_path)] if alpha_path else []
+    audio_labels = ['1:a'] * (1 + len(ladder))
+    if variant.music_switch == 1 and variant.music_path:
+        material_service = MaterialService.get_instance()
+        music = material_service.get_music(variant.music_path)
+        music_index = 2 + (1 if alpha_path else 0)
+        extra_inputs += ['-stream_loop', '-1', '-i', music['path']]
+        # 按索引中归一化后实测的响度计算增益，无需再次分析音乐
+        music_volume = variant.music_volume if variant.music_volume is not None else 1.0
+        gain_db = get_settings().video_music_bed_lufs - music['integrated_lufs'] + 20 * math.log10(max(music_volume, 0.01))
+        music_speed = variant.music_speed or 1.0
+        if not valid_music_speed(music_speed):
+            raise ValueError(f"背景音乐速度必须在 {MUSIC_SPEED_RANGE[0]}-{MUSIC_SPEED_RANGE[1]} 之间: {music_speed}")
+        tempo = f"atempo={music_speed}," if music_speed != 1.0 else ''
+        filter_complex += (
+            f";[1:a]aformat=sample_rates={material_service.music_sample_rate}:channel_layouts=stereo,asplit=2[voice][sidechain]"
+            f";[{music_index}:a]{tempo}volume={gain_db:.2f}dB[music]"
+            f";[music][sidechain]sidechaincompress={get_settings().video_music_ducking}[ducked]"
+            f";[voice][ducked]amix=inputs=2:duration=first:normalize=0"
+        )
+        audio_labels = [f'[aout{index}]' for index in range(1 + len(ladder))]
+        if len(audio_labels) > 1:
+            filter_complex += f",asplit={len(audio_labels)}" + ''.join(audio_labels)
+        else:
+            filter_complex += audio_labels[0]
+
+    # GPU相关配置
+    use_gpu = gpu_utils.check_gpu_available()
+    video_codec = 'h264_nvenc' if use_gpu else 'libx264'
+    if variant.preview:
+        encoding_preset = 'p1' if use_gpu else 'ultrafast'
+        master_quality = 30
     else:
-        # 扩展背景视频到数字人视频的时长
-        loop_count = int(digital_human_duration // background_duration) + 1
-        command = [
-            'ffmpeg',
-            '-stream_loop', str(loop_count),
-            '-i', background_video_path,
-            '-t', str(digital_human_duration),
-            '-c:v', 'copy',
-            '-c:a', 'copy',
-            '-y',
-            temp_adjusted_path
+        encoding_preset = 'p4' if use_gpu else 'medium'
+        master_quality = 23
+
+    # 需要HLS时按分片时长强制关键帧，保证分片长度均匀
+    hls_enabled = get_settings().video_hls and not variant.preview
+    hls_segment_seconds = get_settings().video_hls_segment_seconds
+    keyframe_args = ['-force_key_frames', f'expr:gte(t,n_forced*{hls_segment_seconds})'] if hls_enabled else []
+
+    def video_output_args(label, audio_label, quality, path, extra_args=()):
+        return [
+            '-map', f'[{label}]',
+            '-map', audio_label,
+            '-c:v', video_codec,
+            '-preset', encoding_preset,
+            *(['-rc', 'vbr', '-cq', str(quality)] if use_gpu else ['-crf', str(quality)]),
+            *extra_args,
+            *keyframe_args,
+            '-r', str(frame_rate),
+            '-movflags', '+faststart',
+            str(path)
         ]
 
-    subprocess.run(command, check=True)
+    renditions = {}
+    output_args = video_output_args('master', audio_labels[0], master_quality, output_path)
+    for (name, rendition), audio_label in zip(ladder, audio_labels[1:]):
+        rendition_path = output_path.with_name(f"{output_path.stem}_{name}{output_path.suffix}")
+        output_args += video_output_args(f'{name}_out', audio_label, rendition['quality'], rendition_path,
+                                         ['-maxrate', rendition['maxrate'], '-bufsize', rendition['maxrate'],
+                                          '-b:a', rendition['audio_bitrate']])
+        renditions[name] = rendition_path
+    output_args += cover_args
+
+    if variant.background_path:
+        background_path = MaterialService.get_instance().get_background(variant.background_path, target_width, target_height, frame_rate)
+        background_args = ['-stream_loop', '-1', '-i', str(background_path)]
+    else:
+        background_args = ['-f', 'lavfi', '-i', f'color=c={variant.background_color}:s={target_width}x{target_height}:r={frame_rate}']
+
+    command = [
+        'ffmpeg',
+        '-y',
+        *background_args,
+        '-i', str(digital_human_video_path),
+        *extra_inputs,
+        '-filter_complex', filter_complex,
+        *output_args
+    ]
+    logger.info(f"执行ffmpeg命令: {' '.join(str(x) for x in command)}")
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"合成视频失败: {e.stderr}")
+        raise
+    if hls_enabled:
+        # 无转码封装，主视频及各版本分别生成播放列表
+        for name, path in [('master', output_path), *renditions.items()]:
+            renditions[f'hls_{name}'] = media_utils.package_hls(path, segment_seconds=hls_segment_seconds)
+    logger.info(f"合成视频成功，输出文件：{output_path}, 其他版本: {list(renditions)}")
+    return {'video': output_path, 'cover': cover_path, 'thumbnails': thumbnails, 'renditions': renditions}
+
+
+def scale_to_short_side(width, height, short_side):
+    """
+    按短边等比缩放，宽高取偶数以满足 yuv420p 编码要求
+
+    :param width: 原宽
+    :param height: 原高
+    :param short_side: 目标短边长度
+    :return: (宽, 高)
+    """
+    ratio = short_side / min(width, height)
+    return int(round(width * ratio / 2)) * 2, int(round(height * ratio / 2)) * 2
 
-    # 替换原始文件
-    os.remove(background_video_path)
-    shutil.move(temp_adjusted_path, background_video_path)
 
-    return background_video_path
+def valid_music_speed(music_speed):
+    """
+    背景音乐速度是否在 atempo 支持的范围内，未设置视为原速
+
+    :param music_speed: 背景音乐速度
+    :return: 是否有效
+    """
+    return music_speed is None or MUSIC_SPEED_RANGE[0] <= music_speed <= MUSIC_SPEED_RANGE[1]
@@ -6,7 +6,8 @@ from app.models.digital_human_avatar import DigitalHumanAvatar
 from app.schemas.short_video_detail import ShortVideoDetailBase
 from app.services.task_service import TaskService
 
-from app.database import get_db
+from app.config import get_settings
+from app.database import get_db, SessionLocal, get_write_queue
 from app.models.short_video import ShortVideo
 from app.services.ultralight_service import UltralightService
 from app.utils.response_utils import success_response, error_response
@@ -14,10 +15,13 @@ from app.schemas.response import ApiResponse
 from app.models.short_video_detail import ShortVideoDetail
 from app.models.digital_human_voice import DigitalHumanVoice
 from app.services.fishspeech_service import FishSpeechService
+from app.services.progress_service import report_progress
+from app.services.artifact_service import ArtifactService
+from app.services.publish_service import publish_outputs
 from pathlib import Path
 import os
 from app.services.transcription_service import TranscriptionService
-from app.utils import media_utils, gpu_utils
+from app.utils import media_utils, gpu_utils, audio_utils
 import subprocess
 import platform
 import logging
@@ -84,7 +88,8 @@ def create_video(mix_data: ShortVideoDetailBase, db: Session = Depends(get_db)):
         task_func = lambda: create_video_by_human(db_short_video_detail)
         task_service.execute_task_immediately(task_func=task_func, task_id=task_id, task_name=task_name)
 
-        return success_response(message="已经开始创建口播视频")
+        return success_response(data={"task_id": task_id, "short_video_detail_id": db_short_video_detail.id},
+                                message="已经开始创建口播视频")
     except Exception as e:
         logger.error(f"创建短视频记录失败: {str(e)}", exc_info=True)
         db.rollback()
@@ -102,14 +107,17 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
     target_width, target_height = media_utils.calculate_target_dimensions(short_video_detail.video_layout, short_video_detail.resolution)
     # 定义文件路径
     voice_id = f"{short_video_detail.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    data_root = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'video' / voice_id
-    voice_path = data_root / 'voice.wav'
-    digital_human_video_path = data_root / 'human.mp4' 
+    data_root = get_settings().project_root / 'data' / 'video' / voice_id
+    # 配音、特征、数字人渲染、字幕等中间文件写入任务临时目录（优先 tmpfs），任务结束即删除，data_root 只保留成品
+    artifact_service = ArtifactService.get_instance()
+    scratch_dir = artifact_service.create_scratch(voice_id)
+    voice_path = scratch_dir / 'voice.wav'
+    digital_human_video_path = scratch_dir / 'human.mp4'
     music_path = data_root / 'music.wav'
-    subtitle_path = data_root / 'subtitle.ass'
-    download_material_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'material'
-    download_avatar_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'avatar'
-    download_voice_dir = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'voice'
+    subtitle_path = scratch_dir / 'subtitle.ass'
+    download_material_dir = get_settings().project_root / 'data' / 'public' / 'material'
+    download_avatar_dir = get_settings().project_root / 'data' / 'public' / 'avatar'
+    download_voice_dir = get_settings().project_root / 'data' / 'public' / 'voice'
     # 用户自己上传的文件，暂不删除
     download_origin_dir = data_root / 'origin'
     # 公共数字人压缩包，需删除
@@ -120,7 +128,7 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
         path.mkdir(parents=True, exist_ok=True)
 
     # 在短视频表中新增一条初始记录
-    db = next(get_db())
+    db = SessionLocal()
     new_short_video = ShortVideo(
         title=short_video_detail.video_title,
         type=0,
@@ -135,9 +143,10 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
     
     try:
         logger.info("初始化短视频记录")
+        report_progress('tts')
 
-        voice_output_npy_path = data_root / 'tmp_voice.npy'
-        temp_audio_prompt_wav_path = data_root / 'tmp_voice.wav'
+        voice_output_npy_path = scratch_dir / 'tmp_voice.npy'
+        temp_audio_prompt_wav_path = scratch_dir / 'tmp_voice.wav'
 
         fish_speech_service = FishSpeechService()
 
@@ -147,11 +156,7 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
             raise ValueError(f"未找到ID为{short_video_detail.voice_id}的声音")
 
         npy_prompt_text = voice.npy_prompt_text
-        npy_path = voice.npy_path
-        project_root = os.getenv("PROJECT_ROOT")
-        local_host = os.getenv("LOCAL_HOST")
-        if npy_path.startswith(local_host):
-            npy_path = npy_path.replace(local_host, project_root)
+        npy_path = get_settings().path_mapper.to_path(voice.npy_path)
 
         fish_speech_service.generate_speech(
             script_content,
@@ -160,7 +165,8 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
             voice_output_npy_path,
             temp_audio_prompt_wav_path
         )
-        media_utils.adjust_audio_volume_and_speed(temp_audio_prompt_wav_path, voice_path, volume=short_video_detail.voice_volume, speed=short_video_detail.voice_speed)
+        feature_voice_path = scratch_dir / 'voice_16k.wav'
+        audio_utils.postprocess_speech(temp_audio_prompt_wav_path, voice_path, feature_voice_path, volume=short_video_detail.voice_volume, speed=short_video_detail.voice_speed)
             
         
         # 2. 根据人物生成透明口播视频
@@ -183,12 +189,13 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
             audio_path=voice_path,
             human_id=human_id,
             output_path=str(digital_human_video_path),
-            is_public=is_public
+            is_public=is_public,
+            feature_audio_path=feature_voice_path
         )
         logger.info(f"数字人对口型视频地址: {digital_human_video_path}")
 
         # 如果没有背景视频，创建一个纯黑色背景视频
-        temp_bg_path = data_root / 'tmp_black_bg.mp4'
+        temp_bg_path = scratch_dir / 'tmp_black_bg.mp4'
         command = [
             'ffmpeg',
             '-f', 'lavfi',
@@ -205,6 +212,7 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
                                                   short_video_detail.video_layout)
 
         # 构建ffmpeg命令
+        report_progress('compose')
         output_path = data_root / 'merged_bg_human.mp4'
 
         # GPU相关配置
@@ -212,23 +220,33 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
         video_codec = 'h264_nvenc' if use_gpu else 'libx264'
         encoding_preset = 'p4' if use_gpu else 'faster'
 
+        filter_complex = (
+            f'[0]fps={short_video_detail.video_frame_rate},scale={target_width}:{target_height}[bg];'
+            f'[1]fps={short_video_detail.video_frame_rate}[fg];'
+            f'[fg]scale=iw*{scale}:ih*{scale}[scaled];'
+            f'[bg][scaled]overlay={x}:{y}:format=auto[v]'
+        )
+        # 不加字幕时这一步即为成片，封面和缩略图作为同一次编码的额外输出
+        cover_args = []
+        if short_video_detail.subtitle_switch != 1:
+            cover_filter, cover_args, _, _ = media_utils.cover_outputs('cover', output_path)
+            filter_complex = filter_complex[:-len('[v]')] + ',split=2[v][cover]' + cover_filter
+
         command = [
             'ffmpeg',
             '-i', str(background_video_path),
             '-i', str(digital_human_video_path),
-            '-filter_complex',
-            f'[0]fps={short_video_detail.video_frame_rate},scale={target_width}:{target_height}[bg];'
-            f'[1]fps={short_video_detail.video_frame_rate}[fg];'
-            f'[fg]scale=iw*{scale}:ih*{scale}[scaled];'
-            f'[bg][scaled]overlay={x}:{y}:format=auto[v]',
+            '-filter_complex', filter_complex,
             '-map', '[v]',
             '-map', '1:a',
             '-c:v', video_codec,
             '-preset', encoding_preset,
             *(['-rc', 'vbr', '-cq', '26'] if use_gpu else ['-crf', '26']),
             '-r', str(short_video_detail.video_frame_rate),
+            '-movflags', '+faststart',
             '-y',
-            str(output_path)
+            str(output_path),
+            *cover_args
         ]
 
         subprocess.run(command, check=True, capture_output=True)
@@ -239,16 +257,26 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
         merge_subtitle_audio_path = background_video_path
         if short_video_detail.subtitle_switch == 1:
             logger.info("处理字幕生成")
+            report_progress('subtitle')
             merge_subtitle_audio_path = merge_subtitle(short_video_detail, background_video_path, subtitle_path, voice_path, target_width, target_height,margin_x,margin_y)
+            # 烧录字幕后，未加字幕的合成视频不再需要
+            media_utils.delete_file(background_video_path)
         
+        # 5. 上传到对象存储，失败时保留本地路径由本机静态目录提供
+        first_frame_path, thumbnails = media_utils.cover_paths(merge_subtitle_audio_path)
+        outputs = {'video': merge_subtitle_audio_path, 'cover': first_frame_path, 'thumbnails': thumbnails}
+        try:
+            outputs = publish_outputs(outputs)
+        except Exception as e:
+            logger.error(f"成片发布到对象存储失败，保留本地文件: {str(e)}", exc_info=True)
+
         # 6. 更新短视频记录状态为已完成
         new_short_video.status = 1  # 1表示已生成
-        new_short_video.video_url = str(merge_subtitle_audio_path)
-        first_frame_path = media_utils.extract_video_frame(merge_subtitle_audio_path)
-        new_short_video.video_cover = str(first_frame_path)
+        new_short_video.video_url = str(outputs['video'])
+        new_short_video.video_cover = str(outputs['cover'])
+        new_short_video.thumbnails = {str(width): str(path) for width, path in outputs['thumbnails'].items()} or None
         new_short_video.finished_at = datetime.now()
-        db.merge(new_short_video)
-        db.commit()
+        get_write_queue().merge(new_short_video)
         # print(f"已为第 {i+1} 个视频创建短视频记录，ID: {new_short_video.id}")
     except Exception as e:
         logger.error(f"视频生成过程出错: {str(e)}", exc_info=True)
@@ -256,16 +284,15 @@ def create_video_by_human(short_video_detail: ShortVideoDetail):
         new_short_video.status = 2  # 2表示生成失败需要重试
         new_short_video.status_msg = str(e)
         new_short_video.finished_at = datetime.now()
-        db.merge(new_short_video)
-        db.commit()
+        get_write_queue().merge(new_short_video)
         
         # 记录详细的错误堆栈息
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"错误堆栈信息:\n{error_trace}")
+        logger.error(f"生成口播视频失败: {str(e)}", exc_info=True)
         raise
     finally:
+        db.close()
         media_utils.delete_directory(download_delete_dir)
+        artifact_service.release_scratch(scratch_dir)
 
 def merge_subtitle(short_video_detail, final_output_video_path, subtitle_path, voice_path, target_width, target_height,margin_x,margin_y):
     try:
@@ -273,7 +300,7 @@ def merge_subtitle(short_video_detail, final_output_video_path, subtitle_path, v
         if not os.path.exists(subtitle_path):
             transcription_service = TranscriptionService()
             
-            font_temp_path = Path(os.getenv("PROJECT_ROOT")) / 'data' / 'public' / 'font' / '1731038051181_longzhuti.ttf'
+            font_temp_path = get_settings().project_root / 'data' / 'public' / 'font' / '1731038051181_longzhuti.ttf'
 
             # 获取字幕位置
             # x, y, r = map(float, short_video_detail.font_position.split(','))
@@ -314,19 +341,25 @@ def merge_subtitle(short_video_detail, final_output_video_path, subtitle_path, v
         # 构建ffmpeg命令 - 简化为直接使用ASS字幕
         if platform.system() == "Windows":
             subtitle_path = str(subtitle_path).replace("\\", "\\\\").replace(":", "\\:")
-        ffmpeg_cmd = ' '.join([
+        # 字幕烧录为最后一次编码，封面和缩略图作为同一滤镜图的额外输出
+        cover_filter, cover_args, _, _ = media_utils.cover_outputs('cover', output_file)
+        ffmpeg_cmd = [
             'ffmpeg',
             '-i', str(final_output_video_path),
-            '-vf', f"ass='{str(subtitle_path)}'",
+            '-filter_complex', f"[0:v]ass='{str(subtitle_path)}',split=2[v][cover]{cover_filter}",
+            '-map', '[v]',
+            '-map', '0:a',
             '-c:v', 'libx264',
             '-preset', 'medium',
             '-crf', '23',
             '-c:a', 'copy',
+            '-movflags', '+faststart',
             '-y',
-            str(output_file)
-        ])
+            str(output_file),
+            *cover_args
+        ]
         
-        subprocess.run(ffmpeg_cmd, shell=True, check=True, capture_output=True, text=True)
+        subprocess.run(ffmpeg_cmd, check=True, capture_output=True, text=True)
         logger.info(f"字幕合并命令执行成功，输出文件：{output_file}")
         
         return output_file
@@ -383,9 +416,8 @@ def calculate_position_and_rate(height, width, video_layout):
 
     else:
         raise ValueError("无效的视频布局类型")
-    print(f"::::x: {x}, y: {y}, rate: {rate},  h/rate: {h/rate}, w/rate: {w/rate}   ")
-
-    print(f"::::margin_x: {margin_x}, margin_y: {margin_y}, rate: {1/rate}   ")
+    logger.debug(f"x: {x}, y: {y}, rate: {rate}, h/rate: {h/rate}, w/rate: {w/rate}")
+    logger.debug(f"margin_x: {margin_x}, margin_y: {margin_y}, rate: {1/rate}")
     """
     x，y 是视频的坐标
     rate 是视频的比例
@@ -0,0 +1,79 @@
+import logging
+import uuid
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import get_db
+from app.models.digital_human_avatar import DigitalHumanAvatar
+from app.schemas.response import ApiResponse
+from app.schemas.stream import StreamStart
+from app.services.ultralight_service import UltralightService
+from app.utils import media_utils
+from app.utils.response_utils import success_response, error_response
+from app.utils.user_utils import get_user_id
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+STREAM_OUTPUT_SCHEMES = ('rtmp://', 'rtmps://')
+
+
+@router.post("/start", response_model=ApiResponse[dict])
+def start_stream(stream_data: StreamStart, db: Session = Depends(get_db)):
+    """
+    用一段音频驱动数字人实时推流，音频按实际时长送入流式渲染，画面边渲染边推送到推流地址
+    """
+    if not stream_data.output.startswith(STREAM_OUTPUT_SCHEMES):
+        return error_response(code=400, message="推流地址只支持 rtmp:// 或 rtmps://")
+
+    audio_source = stream_data.audio_url
+    if get_settings().path_mapper.is_local_url(audio_source):
+        audio_source = media_utils.convert_url_to_path(audio_source)
+    elif not audio_source.startswith(('http://', 'https://')):
+        return error_response(code=400, message="音频地址只支持 http:// 或 https://")
+
+    # 公共数字人（type=0）所有用户可用，个人数字人只能使用自己的
+    digital_human = db.query(DigitalHumanAvatar).filter(
+        DigitalHumanAvatar.id == stream_data.digital_human_avatars_id,
+        DigitalHumanAvatar.is_deleted == False
+    ).first()
+    if not digital_human or (digital_human.type == 1 and digital_human.user_id != get_user_id()):
+        return error_response(code=400, message="指定的数字人不存在")
+    if digital_human.status != 1 or not digital_human.human_id or digital_human.human_id == 'None':
+        return error_response(code=400, message="数字人尚未训练完成")
+
+    metrics_path = None
+    if stream_data.save_metrics:
+        metrics_dir = get_settings().project_root / 'data' / 'stream'
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        metrics_path = metrics_dir / f"{uuid.uuid4().hex}.json"
+
+    try:
+        stream_id = UltralightService().stream_audio(digital_human.human_id, digital_human.type != 1,
+                                                     audio_source, stream_data.output, metrics_path)
+    except FileNotFoundError as e:
+        return error_response(code=400, message=str(e))
+    except Exception as e:
+        logger.error(f"启动实时流失败: {str(e)}", exc_info=True)
+        return error_response(code=500, message=f"启动实时流失败: {str(e)}")
+    return success_response(data={"stream_id": stream_id}, message="实时流已启动")
+
+
+@router.get("/{stream_id}", response_model=ApiResponse[dict])
+def get_stream(stream_id: str):
+    """查询实时流状态，结束后返回渲染耗时和延迟统计"""
+    status = UltralightService.stream_status(stream_id)
+    if status is None:
+        return error_response(code=404, message="实时流不存在")
+    return success_response(data=status)
+
+
+@router.post("/{stream_id}/stop", response_model=ApiResponse)
+def stop_stream(stream_id: str):
+    """停止实时流"""
+    if not UltralightService.stop_stream(stream_id):
+        return error_response(code=404, message="实时流不存在")
+    return success_response(message="实时流已停止")
@@ -0,0 +1,286 @@
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0") == "1"
+
+
+def _env_list(name: str, default: str = "") -> Tuple[str, ...]:
+    return tuple(item.strip() for item in os.getenv(name, default).split(',') if item.strip())
+
+
+class PathUrlMapper:
+    """
+    本地路径与对外URL互转，前缀正则在创建时编译一次
+
+    - 只替换开头的 PROJECT_ROOT / LOCAL_HOST，路径中间出现相同片段时不会误替换
+    - PROJECT_ROOT 中的分隔符同时匹配 / 和 \\，Windows 下拼接出的混合分隔符路径也能转换
+    """
+
+    def __init__(self, project_root: str, host: str):
+        self.project_root = project_root.rstrip('/\\') if project_root else ''
+        self.host = host.rstrip('/') if host else ''
+        self.enabled = bool(self.project_root and self.host)
+        if self.enabled:
+            root_pattern = r'[\\/]'.join(re.escape(part) for part in re.split(r'[\\/]', self.project_root))
+            self._path_prefix = re.compile('^' + root_pattern + r'(?=[\\/]|$)')
+            self._url_prefix = re.compile('^' + re.escape(self.host) + r'(?=/|$)')
+
+    def to_url(self, file_path):
+        """
+        本地路径转为URL，不在项目目录下的路径原样返回
+
+        :param file_path: 本地文件路径
+        :return: URL
+        """
+        if not file_path or not self.enabled:
+            return file_path
+        return self._path_prefix.sub(lambda _: self.host, str(file_path), count=1).replace('\\', '/')
+
+    def to_path(self, file_url):
+        """
+        本服务的URL转为本地路径，其他URL原样返回
+
+        :param file_url: URL
+        :return: 本地文件路径
+        """
+        if not file_url or not self.enabled:
+            return file_url
+        return self._url_prefix.sub(lambda _: self.project_root, str(file_url), count=1)
+
+    def is_local_url(self, file_url) -> bool:
+        """是否为本服务的URL"""
+        return bool(file_url and self.enabled and self._url_prefix.match(str(file_url)))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    应用配置，启动时从 .env 和环境变量读取一次，之后只读
+
+    服务类通过构造参数注入，未传入时使用 get_settings() 的全局实例
+    """
+    project_root: Path
+    local_host: str = ''
+    database_url: Optional[str] = None
+
+    # 数据库连接：连接池大小为空时按数据库类型取默认值（SQLite 8/8，其他 10/20）
+    db_busy_timeout: int = 30
+    db_pool_size: Optional[int] = None
+    db_max_overflow: Optional[int] = None
+    # SQLite 内存映射大小（字节）和页缓存大小（KiB）
+    db_mmap_size: int = 256 * 1024 ** 2
+    db_cache_kb: int = 65536
+    # 列表总数的缓存秒数
+    list_count_cache_ttl: int = 10
+    # /data/video 静态文件的浏览器缓存秒数
+    static_cache_max_age: int = 604800
+
+    # 进程角色：all 同时提供接口和执行任务；api 只提供增删改查接口；worker 提供视频生成、数字人克隆接口并执行后台任务
+    app_role: str = 'all'
+    # worker 启动时预加载转录模型，避免第一个任务等待模型加载
+    worker_preload: bool = True
+    # 同步接口所用线程池的大小
+    api_threadpool_size: int = 40
+
+    # 日志
+    log_level: str = 'INFO'
+    log_levels: str = ''
+    log_format: str = 'json'
+    log_backup_days: int = 14
+
+    # 外部模型的 conda 环境
+    fish_speech_conda_env: Optional[str] = None
+    ultralight_conda_env: str = 'dh'
+    wav2lip_conda_env: Optional[str] = None
+
+    # 对象存储
+    oss_endpoint: Optional[str] = None
+    oss_access_key_id: Optional[str] = None
+    oss_secret_access_key: Optional[str] = None
+    oss_bucket_name: Optional[str] = None
+    # virtual 为阿里云OSS默认的虚拟主机方式，MinIO 等本地兼容服务使用 path
+    oss_addressing_style: str = 'virtual'
+    oss_region: Optional[str] = None
+    # 成片对外访问的地址前缀（CDN 或自定义域名），为空时按 endpoint 和 bucket 拼接
+    oss_public_base_url: Optional[str] = None
+    oss_max_pool_connections: int = 32
+    # 客户端分片直传的分片大小，S3 要求除最后一片外不小于 5MB，且最多 10000 片
+    upload_part_size: int = 16 * 1024 ** 2
+
+    # 成片发布到对象存储
+    publish_outputs: bool = False
+    publish_evict_local: bool = False
+    publish_workers: int = 4
+    publish_multipart_threshold: int = 16 * 1024 ** 2
+    publish_multipart_chunksize: int = 8 * 1024 ** 2
+    publish_max_concurrency: int = 8
+
+    # Ultralight 渲染
+    ultralight_render_workers: int = 0
+    ultralight_render_threads: int = 4
+    ultralight_min_shard_frames: int = 250
+    ultralight_patch_composite: bool = True
+
+    # 下载缓存
+    download_cache_max_bytes: int = 20 * 1024 ** 3
+    download_parallel_threshold: int = 64 * 1024 ** 2
+    download_parallel_parts: int = 4
+
+    # 素材缓存
+    material_cache_max_bytes: int = 10 * 1024 ** 3
+    material_image_seconds: int = 1
+    material_music_sample_rate: int = 44100
+    material_music_target_lufs: float = -23.0
+
+    # 成片输出
+    video_renditions: Tuple[str, ...] = ('720p', '360p')
+    video_variant_workers: int = 2
+    video_max_generation_count: int = 10
+    video_hls: bool = False
+    video_hls_segment_seconds: int = 2
+    video_thumbnail_widths: Tuple[int, ...] = ()
+    # 预览：短边像素、最高帧率、真人录制截取的秒数
+    video_preview_short_side: int = 360
+    video_preview_frame_rate: int = 15
+    video_preview_max_seconds: int = 8
+    # 背景音乐：人声之下的目标响度，有人声时的闪避参数（sidechaincompress）
+    video_music_bed_lufs: float = -32.0
+    video_music_ducking: str = 'threshold=0.03:ratio=8:attack=20:release=400'
+
+    # 产物生命周期：临时文件目录与回收策略
+    artifact_scratch_dir: Optional[str] = None
+    artifact_tmpfs_min_free: int = 2 * 1024 ** 3
+    artifact_sweep_interval_minutes: int = 60
+    artifact_scratch_max_hours: int = 6
+    artifact_preview_max_hours: int = 24
+    artifact_cache_max_days: int = 30
+    artifact_cache_max_bytes: int = 5 * 1024 ** 3
+    artifact_final_max_days: int = 0
+    artifact_user_quota_bytes: int = 0
+
+    path_mapper: PathUrlMapper = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.app_role not in ('all', 'api', 'worker'):
+            raise ValueError(f"APP_ROLE 只能是 all / api / worker，当前为: {self.app_role}")
+        object.__setattr__(self, 'path_mapper', PathUrlMapper(str(self.project_root), self.local_host))
+
+    @property
+    def data_dir(self) -> Path:
+        return self.project_root / 'data'
+
+    @property
+    def is_worker(self) -> bool:
+        return self.app_role in ('all', 'worker')
+
+    @property
+    def is_api(self) -> bool:
+        return self.app_role in ('all', 'api')
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        """从 .env 和环境变量创建配置"""
+        load_dotenv()
+        return cls(
+            project_root=Path(os.getenv("PROJECT_ROOT", ".")),
+            local_host=os.getenv("LOCAL_HOST", ""),
+            database_url=os.getenv("DATABASE_URL") or None,
+            db_busy_timeout=_env_int("DB_BUSY_TIMEOUT", 30),
+            db_pool_size=_env_optional_int("DB_POOL_SIZE"),
+            db_max_overflow=_env_optional_int("DB_MAX_OVERFLOW"),
+            db_mmap_size=_env_int("DB_MMAP_SIZE", 256 * 1024 ** 2),
+            db_cache_kb=_env_int("DB_CACHE_KB", 65536),
+            list_count_cache_ttl=_env_int("LIST_COUNT_CACHE_TTL", 10),
+            static_cache_max_age=_env_int("STATIC_CACHE_MAX_AGE", 604800),
+            app_role=os.getenv("APP_ROLE", "all").strip().lower(),
+            worker_preload=_env_bool("WORKER_PRELOAD", True),
+            api_threadpool_size=_env_int("API_THREADPOOL_SIZE", 40),
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            log_levels=os.getenv("LOG_LEVELS", "urllib3=WARNING,asyncio=WARNING,apscheduler=WARNING"),
+            log_format=os.getenv("LOG_FORMAT", "json").lower(),
+            log_backup_days=_env_int("LOG_BACKUP_DAYS", 14),
+            fish_speech_conda_env=os.getenv("FISH_SPEECH_CONDA_ENV"),
+            ultralight_conda_env=os.getenv("ULTRALIGHT_CONDA_ENV", "dh"),
+            wav2lip_conda_env=os.getenv("WAV2LIP_CONDA_ENV"),
+            oss_endpoint=os.getenv("OSS_ENDPOINT"),
+            oss_access_key_id=os.getenv("OSS_ACCESS_KEY_ID"),
+            oss_secret_access_key=os.getenv("OSS_SECRET_ACCESS_KEY"),
+            oss_bucket_name=os.getenv("OSS_BUCKET_NAME"),
+            oss_addressing_style=os.getenv("OSS_ADDRESSING_STYLE", "virtual").lower(),
+            oss_region=os.getenv("OSS_REGION") or None,
+            oss_public_base_url=os.getenv("OSS_PUBLIC_BASE_URL") or None,
+            oss_max_pool_connections=_env_int("OSS_MAX_POOL_CONNECTIONS", 32),
+            upload_part_size=_env_int("UPLOAD_PART_SIZE", 16 * 1024 ** 2),
+            publish_outputs=_env_bool("PUBLISH_OUTPUTS", False),
+            publish_evict_local=_env_bool("PUBLISH_EVICT_LOCAL", False),
+            publish_workers=_env_int("PUBLISH_WORKERS", 4),
+            publish_multipart_threshold=_env_int("PUBLISH_MULTIPART_THRESHOLD", 16 * 1024 ** 2),
+            publish_multipart_chunksize=_env_int("PUBLISH_MULTIPART_CHUNKSIZE", 8 * 1024 ** 2),
+            publish_max_concurrency=_env_int("PUBLISH_MAX_CONCURRENCY", 8),
+            ultralight_render_workers=_env_int("ULTRALIGHT_RENDER_WORKERS", 0),
+            ultralight_render_threads=_env_int("ULTRALIGHT_RENDER_THREADS", 4),
+            ultralight_min_shard_frames=_env_int("ULTRALIGHT_MIN_SHARD_FRAMES", 250),
+            ultralight_patch_composite=_env_bool("ULTRALIGHT_PATCH_COMPOSITE", True),
+            download_cache_max_bytes=_env_int("DOWNLOAD_CACHE_MAX_BYTES", 20 * 1024 ** 3),
+            download_parallel_threshold=_env_int("DOWNLOAD_PARALLEL_THRESHOLD", 64 * 1024 ** 2),
+            download_parallel_parts=_env_int("DOWNLOAD_PARALLEL_PARTS", 4),
+            material_cache_max_bytes=_env_int("MATERIAL_CACHE_MAX_BYTES", 10 * 1024 ** 3),
+            material_image_seconds=_env_int("MATERIAL_IMAGE_SECONDS", 1),
+            material_music_sample_rate=_env_int("MATERIAL_MUSIC_SAMPLE_RATE", 44100),
+            material_music_target_lufs=_env_float("MATERIAL_MUSIC_TARGET_LUFS", -23),
+            video_renditions=_env_list("VIDEO_RENDITIONS", "720p,360p"),
+            video_variant_workers=_env_int("VIDEO_VARIANT_WORKERS", 2),
+            video_max_generation_count=_env_int("VIDEO_MAX_GENERATION_COUNT", 10),
+            video_hls=_env_bool("VIDEO_HLS", False),
+            video_hls_segment_seconds=_env_int("VIDEO_HLS_SEGMENT_SECONDS", 2),
+            video_thumbnail_widths=tuple(int(width) for width in _env_list("VIDEO_THUMBNAIL_WIDTHS")),
+            video_preview_short_side=_env_int("VIDEO_PREVIEW_SHORT_SIDE", 360),
+            video_preview_frame_rate=_env_int("VIDEO_PREVIEW_FRAME_RATE", 15),
+            video_preview_max_seconds=_env_int("VIDEO_PREVIEW_MAX_SECONDS", 8),
+            video_music_bed_lufs=_env_float("VIDEO_MUSIC_BED_LUFS", -32),
+            video_music_ducking=os.getenv("VIDEO_MUSIC_DUCKING", "threshold=0.03:ratio=8:attack=20:release=400"),
+            artifact_scratch_dir=os.getenv("ARTIFACT_SCRATCH_DIR") or None,
+            artifact_tmpfs_min_free=_env_int("ARTIFACT_TMPFS_MIN_FREE", 2 * 1024 ** 3),
+            artifact_sweep_interval_minutes=_env_int("ARTIFACT_SWEEP_INTERVAL_MINUTES", 60),
+            artifact_scratch_max_hours=_env_int("ARTIFACT_SCRATCH_MAX_HOURS", 6),
+            artifact_preview_max_hours=_env_int("ARTIFACT_PREVIEW_MAX_HOURS", 24),
+            artifact_cache_max_days=_env_int("ARTIFACT_CACHE_MAX_DAYS", 30),
+            artifact_cache_max_bytes=_env_int("ARTIFACT_CACHE_MAX_BYTES", 5 * 1024 ** 3),
+            artifact_final_max_days=_env_int("ARTIFACT_FINAL_MAX_DAYS", 0),
+            artifact_user_quota_bytes=_env_int("ARTIFACT_USER_QUOTA_BYTES", 0),
+        )
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """获取全局配置，首次调用时读取 .env，之后直接返回同一实例"""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
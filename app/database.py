@@ -1,31 +1,60 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
-import os
-from pathlib import Path
-from dotenv import load_dotenv
+from concurrent.futures import Future
+from contextlib import contextmanager
+import logging
+import queue
+import threading
+import time
 
-# 加载 .env 文件中的环境变量
-load_dotenv()
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
 
 # 获取项目根目录
-BASE_DIR = Path(os.getenv("PROJECT_ROOT"))
+BASE_DIR = settings.project_root
 
 # 确保 data 目录存在
 (BASE_DIR / 'data').mkdir(exist_ok=True)
 
-# 创建 SQLite 数据库文件的路径
-DATABASE_URL = f"sqlite:///{BASE_DIR / 'data' / 'app.db'}"
+# 数据库地址，默认使用 data/app.db 的 SQLite，切换 PostgreSQL 只需配置 DATABASE_URL
+DATABASE_URL = settings.database_url or f"sqlite:///{BASE_DIR / 'data' / 'app.db'}"
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+if IS_SQLITE:
+    # SQLite 同一时间只有一个写入者，连接数过多只会增加锁竞争
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": settings.db_busy_timeout},
+        poolclass=QueuePool,
+        pool_size=settings.db_pool_size or 8,
+        max_overflow=settings.db_max_overflow if settings.db_max_overflow is not None else 8,
+        pool_timeout=30
+    )
 
-# 创建 SQLAlchemy 引擎
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False, "timeout": 10},
-    poolclass=QueuePool,
-    pool_size=50,
-    max_overflow=100
-)
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """每个新连接设置 WAL、同步级别、内存映射和页缓存"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={settings.db_mmap_size}")
+        # 负数表示以KiB为单位
+        cursor.execute(f"PRAGMA cache_size=-{settings.db_cache_kb}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA busy_timeout={settings.db_busy_timeout * 1000}")
+        cursor.close()
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=settings.db_pool_size or 10,
+        max_overflow=settings.db_max_overflow if settings.db_max_overflow is not None else 20,
+        pool_pre_ping=True
+    )
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -45,3 +74,178 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def session_scope():
+    """
+    后台任务使用的数据库会话，结束时提交并关闭
+
+    代替 next(get_db())，避免会话和连接一直不释放
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# 建立 FTS5 全文索引的表及其搜索列
+FTS_COLUMNS = {
+    'short_videos': 'title',
+    'digital_human_avatars': 'name',
+    'digital_human_voices': 'name',
+}
+# 已成功建立全文索引的表
+fts_tables = set()
+
+
+def setup_fts():
+    """
+    为标题/名称建立 FTS5 全文索引（trigram 分词，支持中文子串匹配），由触发器与原表保持同步
+
+    仅 SQLite 且支持 trigram 分词(3.34+)时启用，否则搜索退回 LIKE
+    """
+    if not IS_SQLITE:
+        return
+    for table_name, column in FTS_COLUMNS.items():
+        fts_name = f"{table_name}_fts"
+        try:
+            with engine.begin() as connection:
+                exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": fts_name}).first()
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_name} USING fts5("
+                    f"{column}, content='{table_name}', content_rowid='id', tokenize='trigram')"))
+                connection.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ai AFTER INSERT ON {table_name} BEGIN "
+                    f"INSERT INTO {fts_name}(rowid, {column}) VALUES (new.id, new.{column}); END"))
+                connection.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ad AFTER DELETE ON {table_name} BEGIN "
+                    f"INSERT INTO {fts_name}({fts_name}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"))
+                connection.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts_name}_au AFTER UPDATE OF {column} ON {table_name} BEGIN "
+                    f"INSERT INTO {fts_name}({fts_name}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+                    f"INSERT INTO {fts_name}(rowid, {column}) VALUES (new.id, new.{column}); END"))
+                if not exists:
+                    # 首次创建时导入已有数据
+                    connection.execute(text(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')"))
+            fts_tables.add(table_name)
+        except Exception as e:
+            logger.warning(f"创建全文索引失败，{table_name} 的搜索使用 LIKE: {str(e)}")
+
+
+class WriteQueue:
+    """
+    后台写入队列：所有写操作由单个线程串行执行，短时间内到达的多个写操作合并为一次提交。
+    后台任务的状态更新经由此队列写入，避免多个渲染线程同时写 SQLite 时出现 "database is locked"。
+    """
+
+    def __init__(self, session_factory, batch_window: float = 0.05, max_batch: int = 100):
+        self.session_factory = session_factory
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func) -> Future:
+        """
+        提交一个写操作
+
+        :param func: func(session)，在写入线程的会话中执行，无需自行提交
+        :return: Future，提交成功后结果为 func 的返回值
+        """
+        future = Future()
+        self._queue.put((func, future))
+        return future
+
+    def write(self, func, wait: bool = True):
+        """提交写操作，wait 为 True 时等待提交完成并返回 func 的返回值"""
+        future = self.submit(func)
+        return future.result() if wait else future
+
+    def merge(self, *objects, wait: bool = True):
+        """将对象的当前状态合并写入数据库"""
+        return self.write(lambda session: [session.merge(obj) for obj in objects], wait)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, batch):
+        """在一个事务中执行一批写操作，返回各操作的结果"""
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            results = [func(session) for func, _ in batch]
+            session.commit()
+            return results
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                for (_, future), result in zip(batch, self._apply(batch)):
+                    future.set_result(result)
+            except Exception:
+                # 批量提交失败时逐个重试，只让出错的写操作失败
+                for item in batch:
+                    try:
+                        item[1].set_result(self._apply([item])[0])
+                    except Exception as e:
+                        logger.error(f"数据库写入失败: {str(e)}")
+                        item[1].set_exception(e)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """获取全局写入队列"""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(SessionLocal)
+    return _write_queue
+
+
+def sync_table_columns():
+    """
+    为已存在的表补充模型中新增的列
+
+    create_all 只会创建缺失的表，不会修改已有表结构；
+    新增列均为可空列，直接 ALTER TABLE ADD COLUMN 即可，新增的索引同时补建
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            # create_all 不会为已有表创建新增的索引
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
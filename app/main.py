@@ -1,6 +1,9 @@
 import os
 from app.utils.logger_utils import setup_logger
 setup_logger()
+from app.config import get_settings
+# 启动时读取一次配置，之后各模块共用同一实例
+settings = get_settings()
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,31 +11,52 @@ from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from app.api.video import crt_video,h5_crt_video
-from .database import engine, Base
+from .database import engine, Base, sync_table_columns, setup_fts
 from .api import (digital_human_avatars, digital_human_voices, short_videos, font)
-from .api import (file_deal)
+from .api import (file_deal, progress)
 
 from .utils.response_utils import error_response
 from contextlib import asynccontextmanager
 from app.services.task_service import TaskService
 import logging
+import time
+from anyio import to_thread
 from fastapi.staticfiles import StaticFiles
+from app.utils.static_utils import MediaStaticFiles
 
 logger = logging.getLogger(__name__)
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
+sync_table_columns()
+setup_fts()
 
-# 设置第三方库的日志级别为 WARNING，以减少噪音
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("asyncio").setLevel(logging.WARNING)
+def preload_worker_models():
+    """worker 启动时预加载转录模型，首个生成任务不再等待模型加载"""
+    from app.services.transcription_service import TranscriptionService
+
+    start_time = time.time()
+    TranscriptionService()
+    logger.info(f"预加载转录模型完成，耗时 {time.time() - start_time:.2f} 秒")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    TaskService.get_instance()
+    logger.info(f"进程角色: {settings.app_role}")
+    # 同步路由运行在 anyio 线程池中，慢请求占满线程时其他请求会排队
+    to_thread.current_default_thread_limiter().total_tokens = settings.api_threadpool_size
+    if settings.is_worker:
+        task_service = TaskService.get_instance()
+        if settings.artifact_sweep_interval_minutes > 0:
+            from app.services.artifact_service import ArtifactService
+            task_service.add_interval_job(ArtifactService.get_instance().sweep,
+                                          settings.artifact_sweep_interval_minutes * 60,
+                                          job_id='artifact_sweep', job_name='产物回收', start_delay=300)
+        if settings.worker_preload:
+            preload_worker_models()
     yield
-    TaskService.get_instance().shutdown()
+    # api 角色不提交任务，不会创建调度器
+    if TaskService._instance is not None:
+        TaskService.get_instance().shutdown()
 
 app = FastAPI(title="数字人管理系统", version="0.1.0", lifespan=lifespan)
 
@@ -60,10 +84,10 @@ app.mount("/data/avatar", StaticFiles(directory=avatars_path), name="avatar")
 app.mount("/data/voice", StaticFiles(directory=voice_path), name="voice")
 
 # 挂载静态文件目录
-app.mount("/data/video", StaticFiles(directory=video_path), name="video")
+app.mount("/data/video", MediaStaticFiles(directory=video_path, max_age=settings.static_cache_max_age), name="video")
 
 # 挂载静态文件目录
-app.mount("/data/public", StaticFiles(directory=public_path), name="public")
+app.mount("/data/public", MediaStaticFiles(directory=public_path), name="public")
 
 
 
@@ -108,13 +132,27 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 # 包含API路由
-app.include_router(digital_human_avatars.router, prefix="/api/digital-human-avatars", tags=["digital_human_avatars"])
-app.include_router(short_videos.router, prefix="/api/short-videos", tags=["short_videos"])
-app.include_router(digital_human_voices.router, prefix="/api/digital-human-voices", tags=["digital_human_voices"])
-app.include_router(crt_video.router, prefix="/api/video/create", tags=["crt_video"]) 
-app.include_router(h5_crt_video.router, prefix="/api/video/h5-create", tags=["h5_crt_video"])
-app.include_router(file_deal.router, prefix="/api/file-deal", tags=["file_deal"])
-app.include_router(font.router, prefix="/api/font", tags=["font"])
+if settings.is_api:
+    app.include_router(digital_human_avatars.router, prefix="/api/digital-human-avatars", tags=["digital_human_avatars"])
+    app.include_router(short_videos.router, prefix="/api/short-videos", tags=["short_videos"])
+    app.include_router(digital_human_voices.router, prefix="/api/digital-human-voices", tags=["digital_human_voices"])
+    app.include_router(file_deal.router, prefix="/api/file-deal", tags=["file_deal"])
+    app.include_router(font.router, prefix="/api/font", tags=["font"])
+
+# 视频生成路由只在 worker 中导入，api 进程不加载渲染、转录相关模块
+if settings.is_worker:
+    from app.api.video import crt_video, h5_crt_video, stream
+    from app.api import artifacts, digital_human_avatar_clone
+    # 数字人克隆与列表共用前缀，只有提交训练的 POST 由 worker 提供
+    app.include_router(digital_human_avatar_clone.router, prefix="/api/digital-human-avatars", tags=["digital_human_avatars"])
+    app.include_router(crt_video.router, prefix="/api/video/create", tags=["crt_video"])
+    app.include_router(h5_crt_video.router, prefix="/api/video/h5-create", tags=["h5_crt_video"])
+    # 实时流的推理进程由启动它的 worker 管理
+    app.include_router(stream.router, prefix="/api/video/stream", tags=["stream"])
+    # 产物回收在 worker 中执行，指标也由 worker 提供
+    app.include_router(artifacts.router, prefix="/api/artifacts", tags=["artifacts"])
+    # 任务进度在执行任务的进程内发布，只有 worker 能推送
+    app.include_router(progress.router, prefix="/api/progress", tags=["progress"])
 
 @app.get("/")
 async def root():
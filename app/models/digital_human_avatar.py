@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -28,6 +28,11 @@ class DigitalHumanAvatar(Base):
     """
 
     __tablename__ = "digital_human_avatars"
+    __table_args__ = (
+        # 列表页按用户筛选未删除记录并按创建时间倒序分页
+        Index('ix_digital_human_avatars_user_deleted_created', 'user_id', 'is_deleted', 'created_at'),
+        Index('ix_digital_human_avatars_user_status', 'user_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), index=True, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -22,6 +22,11 @@ class DigitalHumanVoice(Base):
     """
 
     __tablename__ = "digital_human_voices"
+    __table_args__ = (
+        # 列表页按用户筛选未删除记录并按创建时间倒序分页
+        Index('ix_digital_human_voices_user_deleted_created', 'user_id', 'is_deleted', 'created_at'),
+        Index('ix_digital_human_voices_user_status', 'user_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(100), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import JSON, Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -13,6 +13,8 @@ class ShortVideo(Base):
         status (int): 状态, 0表示生成中, 1表示已生成, 2表示生成失败需要重试
         video_url (str): 视频文件的URL或本地存储路径,最大长度255字符
         video_cover (str): 视频封面文件的URL或本地存储路径,最大长度255字符
+        renditions (dict): 其他分辨率版本, 版本名 -> 本地存储路径
+        thumbnails (dict): 列表页WebP缩略图, 宽度 -> 本地存储路径
         type (int): 视频类型, 0表示创作, 1表示混剪
         created_at (datetime): 视频创建时间
         finished_at (datetime): 视频生成完成时间
@@ -22,6 +24,11 @@ class ShortVideo(Base):
     """
 
     __tablename__ = "short_videos"
+    __table_args__ = (
+        # 列表页按用户筛选未删除记录并按创建时间倒序分页
+        Index('ix_short_videos_user_deleted_created', 'user_id', 'is_deleted', 'created_at'),
+        Index('ix_short_videos_user_status', 'user_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     title = Column(String(100), nullable=False, comment="短视频的标题")
@@ -29,6 +36,8 @@ class ShortVideo(Base):
     status_msg = Column(String(20), nullable=True, default="", comment="短视频状态信息")
     video_url = Column(String(255), nullable=True, comment="视频文件的URL或本地存储路径")
     video_cover = Column(String(255), nullable=True, comment="视频封面文件的URL或本地存储路径")
+    renditions = Column(JSON, nullable=True, comment="其他分辨率版本：版本名 -> 本地存储路径")
+    thumbnails = Column(JSON, nullable=True, comment="列表页WebP缩略图：宽度 -> 本地存储路径")
     type = Column(Integer, nullable=False, default=0, comment="视频类型：0表示创作，1表示混剪")
     created_at = Column(DateTime, nullable=False, server_default=func.now(), comment="视频创建时间")
     finished_at = Column(DateTime, comment="视频生成完成时间")
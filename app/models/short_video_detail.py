@@ -12,12 +12,14 @@ class ShortVideoDetail(Base):
     script_content = Column(String(255), comment="文案内容")
     video_duration = Column(Integer, comment="生成的视频时长(秒)")
     generation_count = Column(Integer, default=1, nullable=False, comment="生成数量")
+    variants = Column(JSON, comment="批量生成时每个视频覆盖的参数列表")
     
     # 视频设置
     video_layout = Column(Integer, default=2, nullable=False, comment="视频布局（1-横屏，2-竖屏）")
     video_frame_rate = Column(Integer, default=25, nullable=False, comment="视频帧率（25,30,50,60）")
     resolution = Column(Integer, default=3, nullable=False, comment="分辨率(1-480p,2-720p,3-1080p,4-2k,5-4k)")
     export_format = Column(Integer, default=1, nullable=False, comment="导出格式（1-mp4,2-mov）")
+    background_path = Column(String(255), comment="背景视频或图片路径，为空时使用纯色背景")
     
     # 数字人设置
     digital_human_avatars_type = Column(Integer, default=1, nullable=False, comment="数字人形象类型（0远程，1本地）")
@@ -43,6 +45,12 @@ class ShortVideoDetail(Base):
     voice_voice_id = Column(String(500), comment="远端:voice_id") # voice_id
 
     
+    # 背景音乐设置
+    music_switch = Column(Integer, default=0, comment="背景音乐开关（0-关闭，1-开启）")
+    music_path = Column(String(255), comment="背景音乐文件路径")
+    music_volume = Column(Float, default=1, comment="背景音乐音量")
+    music_speed = Column(Float, default=1, comment="背景音乐速度")
+
     # 字幕设置
     subtitle_switch = Column(Integer, default=0, nullable=False, comment="字幕开关（0-关闭，1-开启）")
     font_id = Column(Integer, comment="字体id")
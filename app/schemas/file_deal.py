@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class MultipartInitiate(BaseModel):
+    """发起分片上传的请求模式"""
+    filename: str = Field(..., description="文件名称（对象名称）")
+    file_size: int = Field(..., gt=0, description="文件大小（字节）")
+    part_size: Optional[int] = Field(None, description="期望的分片大小（字节），默认使用服务端配置")
+
+class MultipartPartUrls(BaseModel):
+    """重新获取分片预签名URL的请求模式"""
+    filename: str = Field(..., description="文件名称（对象名称）")
+    upload_id: str = Field(..., description="分片上传ID")
+    part_numbers: List[int] = Field(..., description="分片序号列表（从1开始）")
+
+class MultipartPart(BaseModel):
+    """已上传的分片"""
+    partNumber: int = Field(..., description="分片序号")
+    etag: str = Field(..., description="上传分片时响应头中的ETag")
+
+class MultipartComplete(BaseModel):
+    """完成分片上传的请求模式"""
+    filename: str = Field(..., description="文件名称（对象名称）")
+    upload_id: str = Field(..., description="分片上传ID")
+    parts: Optional[List[MultipartPart]] = Field(None, description="已上传的分片，不传时以服务端记录为准")
+
+class MultipartAbort(BaseModel):
+    """取消分片上传的请求模式"""
+    filename: str = Field(..., description="文件名称（对象名称）")
+    upload_id: str = Field(..., description="分片上传ID")
@@ -11,4 +11,5 @@ class ApiResponse(BaseModel, Generic[T]):
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
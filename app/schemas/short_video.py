@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 class ShortVideoBase(BaseModel):
     """短视频基础模型
@@ -28,6 +28,8 @@ class ShortVideo(ShortVideoBase):
     status: int = Field(..., description="短视频状态: 0表示生成中, 1表示已生成, 2表示生成失败需要重试")
     video_url: Optional[str] = Field(..., max_length=255, description="视频文件的URL或本地存储路径")
     video_cover: Optional[str] = Field(None, max_length=255, description="视频封面文件的URL或本地存储路径")
+    renditions: Optional[Dict[str, str]] = Field(None, description="其他分辨率版本: 版本名 -> URL或本地存储路径")
+    thumbnails: Optional[Dict[str, str]] = Field(None, description="列表页WebP缩略图: 宽度 -> URL或本地存储路径")
     type: int = Field(..., description="视频类型: 0表示创作, 1表示混剪")
     created_at: datetime = Field(..., description="视频创建时间")
     finished_at: Optional[datetime] = Field(None, description="视频生成完成时间")
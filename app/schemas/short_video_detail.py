@@ -12,7 +12,9 @@ class ShortVideoDetailBase(BaseModel):
     video_frame_rate: Optional[int] = Field(25, description="视频帧率（1-25fps,2-30fps,3-50fps,4-60fps）")
     video_duration: Optional[int] = Field(None, description="生成的视频时长(秒)")
     export_format: Optional[int] = Field(1, description="导出格式（1-mp4,2-mov）")
-    generation_count: Optional[int] = Field(1, description="生成数量")
+    background_path: Optional[str] = Field(None, description="背景视频或图片的URL/路径，为空时使用纯色背景")
+    generation_count: Optional[int] = Field(1, description="生成数量（不超过 VIDEO_MAX_GENERATION_COUNT，大于1时需通过 variants 提供互不相同的参数）")
+    variants: Optional[List[Dict]] = Field(None, description="批量生成时每个视频覆盖的参数，如人物位置、缩放、分辨率、字幕样式、背景色")
     
     digital_human_avatars_type: Optional[int] = Field(1, description="数字人形象类型（0远程，1本地）")
     digital_human_avatars_download_url: Optional[str] = Field(default=None, description="远程:模型压缩包下载地址")
@@ -34,6 +36,11 @@ class ShortVideoDetailBase(BaseModel):
     voice_npy_prompt_text: Optional[str] = Field(None, description="远程:npy提示文本")
     voice_voice_id: Optional[str] = Field(None, description="远端:voice_id")
     
+    music_switch: Optional[int] = Field(0, description="背景音乐开关（0-关闭，1-开启）")
+    music_path: Optional[str] = Field(None, description="背景音乐的URL/路径（对应 MusicSettings.music_path 前端字段，暂无音乐素材表，不支持按 music_material_id 选择）")
+    music_volume: Optional[float] = Field(1.0, description="背景音乐音量")
+    music_speed: Optional[float] = Field(1.0, description="背景音乐速度（0.5-2.0）")
+
     subtitle_switch: Optional[int] = Field(0, description="字幕开关（0-关闭，1-开启）")
     font_id: Optional[int] = Field(0, description="字体id")
     font_size: Optional[int] = Field(16, description="字体大小")
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class StreamStart(BaseModel):
+    """启动实时流的请求模式"""
+    digital_human_avatars_id: int = Field(..., description="数字人ID")
+    audio_url: str = Field(..., description="驱动音频的URL，任意ffmpeg可解码的格式")
+    output: str = Field(..., description="推流地址（rtmp:// 或 rtmps://）")
+    save_metrics: Optional[bool] = Field(True, description="结束时记录渲染耗时和延迟统计")
@@ -0,0 +1,491 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+FINAL = 'final'
+CACHEABLE = 'cacheable'
+SCRATCH = 'scratch'
+
+# 回收策略，指标按策略分别统计
+POLICIES = ('scratch', 'preview', 'deleted', 'retention', 'cache')
+
+# 无容量上限、按内容哈希命名的缓存目录（配音、音频特征），由回收任务淘汰；download/material 自行维护索引和上限
+UNBOUNDED_CACHES = ('tts', 'features')
+TMPFS_DIR = Path('/dev/shm')
+TMPFS_SCRATCH_NAME = 'marketing_scratch'
+# 已释放文件的软删除记录在 status_msg 中做标记，之后的回收不再处理
+RELEASED_MSG = '文件已释放'
+# 口播视频的任务目录：<视频详情ID>_<时间戳>
+JOB_DIR_PATTERN = re.compile(r'^(\d+)_\d{14}$')
+
+
+class ArtifactService:
+    """
+    产物生命周期管理服务类。
+    实现了单例模式，负责分配任务临时目录、定期回收磁盘空间并记录回收指标。
+
+    产物分为三类：
+    - final：短视频、数字人记录引用的成品（视频、封面、缩略图、清晰度版本、HLS、数字人模型目录）
+    - cacheable：按内容哈希复用的中间结果（data/cache 下的配音、音频特征等），删除后可重新生成
+    - scratch：单次任务的中间文件（原始配音、特征、数字人渲染视频、字幕等），任务结束即可删除
+
+    回收策略：
+    - scratch：任务临时目录优先放在 tmpfs，任务结束即删除；异常退出遗留的临时目录和旧任务目录中未被引用的文件超时删除
+    - preview：预览视频超过 ARTIFACT_PREVIEW_MAX_HOURS 删除
+    - deleted：软删除的短视频和个人数字人释放本地文件及对象存储中的成品，与未删除记录共用的文件保留
+    - retention：开启 ARTIFACT_FINAL_MAX_DAYS / ARTIFACT_USER_QUOTA_BYTES 后，超期或超出用户配额的最早的短视频被软删除
+    - cache：超过 ARTIFACT_CACHE_MAX_DAYS 未使用或总大小超过 ARTIFACT_CACHE_MAX_BYTES 时按最近使用时间淘汰
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """获取ArtifactService的单例实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, settings: Settings = None):
+        """初始化ArtifactService"""
+        self.settings = settings or get_settings()
+        # 统一为绝对路径，与记录中的路径比较时不受工作目录和相对 PROJECT_ROOT 影响
+        data_dir = Path(os.path.abspath(self.settings.data_dir))
+        self.data_dir = data_dir
+        self.video_dir = data_dir / 'video'
+        self.preview_dir = self.video_dir / 'preview'
+        self.avatar_dir = data_dir / 'avatar'
+        self.cache_dir = data_dir / 'cache'
+        self.disk_scratch_dir = data_dir / 'tmp'
+
+        self._sweep_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'sweeps': 0,
+            'last_sweep_at': None,
+            'last_duration_seconds': None,
+            'last_error': None,
+            'removed_files': {policy: 0 for policy in POLICIES},
+            'reclaimed_bytes': {policy: 0 for policy in POLICIES},
+            'deleted_objects': 0,
+            'usage_bytes': None,
+        }
+
+    # ---------- 临时目录 ----------
+
+    def scratch_root(self) -> Path:
+        """
+        任务临时目录的根目录：配置了 ARTIFACT_SCRATCH_DIR 时使用该目录；
+        否则 /dev/shm 可写且剩余空间不少于 ARTIFACT_TMPFS_MIN_FREE 时使用 tmpfs，其余情况使用 data/tmp
+
+        :return: 根目录
+        """
+        if self.settings.artifact_scratch_dir:
+            return Path(self.settings.artifact_scratch_dir)
+        try:
+            if TMPFS_DIR.is_dir() and os.access(TMPFS_DIR, os.W_OK) \
+                    and shutil.disk_usage(TMPFS_DIR).free >= self.settings.artifact_tmpfs_min_free:
+                return TMPFS_DIR / TMPFS_SCRATCH_NAME
+        except OSError:
+            pass
+        return self.disk_scratch_dir
+
+    def create_scratch(self, name: str) -> Path:
+        """
+        为一次任务创建临时目录，任务结束时调用 release_scratch 删除
+
+        :param name: 任务名称，用于目录命名
+        :return: 临时目录
+        """
+        scratch_dir = self.scratch_root() / f"{name}_{uuid.uuid4().hex[:8]}"
+        scratch_dir.mkdir(parents=True, exist_ok=True)
+        logger.debug(f"创建任务临时目录: {scratch_dir}")
+        return scratch_dir
+
+    def release_scratch(self, scratch_dir):
+        """
+        删除任务临时目录
+
+        :param scratch_dir: create_scratch 返回的目录
+        """
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def classify(self, path, live_paths: set) -> str:
+        """
+        产物分类
+
+        :param path: 文件或目录路径
+        :param live_paths: 未删除记录引用的本地产物路径
+        :return: final / cacheable / scratch
+        """
+        path = Path(os.path.abspath(path))
+        if path in live_paths:
+            return FINAL
+        if self.cache_dir in path.parents:
+            return CACHEABLE
+        return SCRATCH
+
+    # ---------- 回收 ----------
+
+    def sweep(self, dry_run: bool = False) -> Optional[dict]:
+        """
+        按策略回收磁盘空间，由 TaskService 定期执行
+
+        :param dry_run: 只统计可回收的文件，不删除、不修改数据库
+        :return: 本次回收的统计 {策略: {'files': 文件数, 'bytes': 字节数}}，上一次回收未结束时返回None
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            logger.info("上一次产物回收仍在进行，跳过本次")
+            return None
+        start_time = time.time()
+        report = {policy: {'files': 0, 'bytes': 0} for policy in POLICIES}
+        report['deleted_objects'] = 0
+        sweep = SimpleNamespace(report=report, dry_run=dry_run, removed=set())
+        try:
+            videos, avatars, busy_avatar_ids = self._load_records()
+            self._apply_retention(sweep, videos)
+            live_paths, live_keys = self._live_references(videos, avatars)
+            self._sweep_deleted_videos(sweep, videos, live_paths, live_keys)
+            self._sweep_deleted_avatars(sweep, avatars, busy_avatar_ids)
+            self._sweep_job_dirs(sweep, videos, live_paths)
+            self._sweep_expired(sweep, [self.preview_dir], self.settings.artifact_preview_max_hours, 'preview')
+            self._sweep_expired(sweep, self._scratch_roots(), self.settings.artifact_scratch_max_hours, 'scratch')
+            self._sweep_caches(sweep)
+            usage = self._usage(live_paths)
+        except Exception as e:
+            with self._metrics_lock:
+                self._metrics['last_error'] = str(e)
+            logger.error(f"产物回收失败: {str(e)}", exc_info=True)
+            raise
+        finally:
+            self._sweep_lock.release()
+
+        duration = round(time.time() - start_time, 2)
+        reclaimed = sum(report[policy]['bytes'] for policy in POLICIES)
+        if not dry_run:
+            with self._metrics_lock:
+                metrics = self._metrics
+                metrics['sweeps'] += 1
+                metrics['last_sweep_at'] = datetime.now().isoformat(timespec='seconds')
+                metrics['last_duration_seconds'] = duration
+                metrics['last_error'] = None
+                metrics['usage_bytes'] = usage
+                metrics['deleted_objects'] += report['deleted_objects']
+                for policy in POLICIES:
+                    metrics['removed_files'][policy] += report[policy]['files']
+                    metrics['reclaimed_bytes'][policy] += report[policy]['bytes']
+        logger.info(f"产物回收{'（试运行）' if dry_run else ''}完成，耗时 {duration} 秒，"
+                    f"释放 {reclaimed / 1024 ** 2:.1f}MB，删除对象 {report['deleted_objects']} 个")
+        return report
+
+    def metrics(self) -> dict:
+        """
+        回收指标：累计删除的文件数和字节数（按策略）、上一次回收时间和耗时、各类产物占用、磁盘剩余空间
+
+        :return: 指标字典
+        """
+        with self._metrics_lock:
+            metrics = {
+                **self._metrics,
+                'removed_files': dict(self._metrics['removed_files']),
+                'reclaimed_bytes': dict(self._metrics['reclaimed_bytes']),
+            }
+        disk = shutil.disk_usage(self.data_dir)
+        metrics['disk'] = {'total_bytes': disk.total, 'free_bytes': disk.free}
+        metrics['scratch_root'] = str(self.scratch_root())
+        return metrics
+
+    def _load_records(self):
+        """读取短视频和个人数字人记录，转为普通对象，避免回收过程中修改会话中的记录"""
+        from app.database import session_scope
+        from app.models.digital_human_avatar import DigitalHumanAvatar
+        from app.models.short_video import ShortVideo
+        from app.models.short_video_detail import ShortVideoDetail
+
+        with session_scope() as db:
+            videos = [
+                SimpleNamespace(id=row.id, user_id=row.user_id, status=row.status, status_msg=row.status_msg,
+                                is_deleted=row.is_deleted, created_at=row.created_at,
+                                detail_id=row.short_videos_detail_id, locations=self._row_locations(row))
+                for row in db.query(ShortVideo).all()
+            ]
+            avatars = [
+                SimpleNamespace(id=row.id, human_id=row.human_id, status=row.status, is_deleted=row.is_deleted)
+                for row in db.query(DigitalHumanAvatar).filter(DigitalHumanAvatar.type == 1).all()
+            ]
+            # 生成中的短视频正在使用的数字人
+            busy_detail_ids = {video.detail_id for video in videos if video.status == 0 and not video.is_deleted}
+            busy_avatar_ids = {
+                avatar_id for (avatar_id,) in db.query(ShortVideoDetail.digital_human_avatars_id)
+                .filter(ShortVideoDetail.id.in_(busy_detail_ids)).all()
+            } if busy_detail_ids else set()
+        return videos, avatars, busy_avatar_ids
+
+    @staticmethod
+    def _row_locations(row) -> list:
+        """短视频记录引用的全部产物（本地路径或URL）"""
+        values = [row.video_url, row.video_cover]
+        values += list((row.renditions or {}).values()) + list((row.thumbnails or {}).values())
+        return [str(value) for value in values if value]
+
+    def _local_artifact(self, location) -> Optional[Path]:
+        """
+        记录中的位置对应的本地产物，HLS 播放列表对应其所在目录；对象存储的URL返回None
+        """
+        location = self.settings.path_mapper.to_path(location)
+        if str(location).startswith('http'):
+            return None
+        path = Path(os.path.abspath(location))
+        return path.parent if path.suffix == '.m3u8' else path
+
+    def _live_references(self, videos, avatars):
+        """未删除记录引用的本地产物和对象键"""
+        from app.services.upload_service import object_key_from_url
+
+        live_paths = set()
+        live_keys = set()
+        for video in videos:
+            if video.is_deleted:
+                continue
+            for location in video.locations:
+                path = self._local_artifact(location)
+                if path is not None:
+                    live_paths.add(path)
+                else:
+                    key = object_key_from_url(location, self.settings)
+                    if key:
+                        live_keys.add(key)
+        for avatar in avatars:
+            if not avatar.is_deleted and avatar.human_id:
+                live_paths.add(self.avatar_dir / avatar.human_id)
+        return live_paths, live_keys
+
+    def _apply_retention(self, sweep, videos):
+        """超期或超出用户配额的最早的已生成短视频标记为软删除，文件在随后的 deleted 策略中释放"""
+        max_days = self.settings.artifact_final_max_days
+        quota = self.settings.artifact_user_quota_bytes
+        if not max_days and not quota:
+            return
+
+        finished = sorted((video for video in videos if video.status == 1 and not video.is_deleted),
+                          key=lambda video: video.created_at, reverse=True)
+        expired = set()
+        if max_days:
+            deadline = datetime.now() - timedelta(days=max_days)
+            expired.update(video.id for video in finished if video.created_at < deadline)
+        if quota:
+            # 从最新的开始累加，超出配额后更早的全部回收，每个用户至少保留最新的一个；同一用户共用的文件只计一次
+            used = {}
+            counted = set()
+            for video in finished:
+                newest = video.user_id not in used
+                for location in video.locations:
+                    path = self._local_artifact(location)
+                    if path is not None and (video.user_id, path) not in counted:
+                        counted.add((video.user_id, path))
+                        used[video.user_id] = used.get(video.user_id, 0) + self._size(path)
+                used.setdefault(video.user_id, 0)
+                if not newest and used[video.user_id] > quota:
+                    expired.add(video.id)
+
+        if not expired:
+            return
+        sweep.report['retention']['files'] += len(expired)
+        logger.warning(f"按保留策略软删除 {len(expired)} 个短视频: {sorted(expired)}")
+        for video in videos:
+            if video.id in expired:
+                video.is_deleted = True
+        if not sweep.dry_run:
+            self._update_videos(expired, {'is_deleted': True})
+
+    def _sweep_deleted_videos(self, sweep, videos, live_paths, live_keys):
+        """释放软删除的短视频引用的本地文件和对象存储中的成品"""
+        from app.services.upload_service import object_key_from_url
+
+        released = set()
+        object_keys = set()
+        for video in videos:
+            if not video.is_deleted or video.status_msg == RELEASED_MSG:
+                continue
+            for location in video.locations:
+                path = self._local_artifact(location)
+                if path is not None:
+                    if path not in live_paths:
+                        self._remove(sweep, path, 'deleted')
+                else:
+                    key = object_key_from_url(location, self.settings)
+                    if key and key not in live_keys:
+                        object_keys.add(key)
+            released.add(video.id)
+
+        if object_keys:
+            sweep.report['deleted_objects'] += self._delete_objects(object_keys, sweep.dry_run)
+        if released and not sweep.dry_run:
+            self._update_videos(released, {'status_msg': RELEASED_MSG})
+
+    def _sweep_deleted_avatars(self, sweep, avatars, busy_avatar_ids):
+        """删除软删除的个人数字人的模型目录（训练中或正在被生成任务使用的跳过）"""
+        live_humans = {avatar.human_id for avatar in avatars if not avatar.is_deleted}
+        for avatar in avatars:
+            human_id = avatar.human_id
+            if not avatar.is_deleted or avatar.status == 0 or avatar.id in busy_avatar_ids:
+                continue
+            if not human_id or human_id == 'None' or human_id in live_humans:
+                continue
+            avatar_path = self.avatar_dir / human_id
+            # human_id 异常（包含路径分隔符等）时不删除
+            if avatar_path.parent == self.avatar_dir and avatar_path.is_dir():
+                self._remove(sweep, avatar_path, 'deleted')
+
+    def _sweep_job_dirs(self, sweep, videos, live_paths):
+        """
+        清理口播视频任务目录：没有未删除记录的目录整个删除；
+        仍有成品的目录删除未被引用的中间文件（用户上传的 origin 目录保留）
+        """
+        if not self.video_dir.is_dir():
+            return
+        busy_details = {video.detail_id for video in videos if video.status == 0 and not video.is_deleted}
+        live_details = {video.detail_id for video in videos if not video.is_deleted}
+        deadline = time.time() - self.settings.artifact_scratch_max_hours * 3600
+        for job_dir in self.video_dir.iterdir():
+            match = JOB_DIR_PATTERN.match(job_dir.name)
+            if not match or not job_dir.is_dir():
+                continue
+            detail_id = int(match.group(1))
+            if detail_id in busy_details or job_dir.stat().st_mtime > deadline:
+                continue
+            if detail_id not in live_details:
+                self._remove(sweep, job_dir, 'scratch')
+                continue
+            for entry in job_dir.iterdir():
+                if entry.name != 'origin' and self.classify(entry, live_paths) == SCRATCH:
+                    self._remove(sweep, entry, 'scratch')
+
+    def _sweep_expired(self, sweep, roots, max_hours: int, policy: str):
+        """删除目录下超过 max_hours 未修改的条目"""
+        deadline = time.time() - max_hours * 3600
+        for root in roots:
+            if not root.is_dir():
+                continue
+            for entry in root.iterdir():
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        self._remove(sweep, entry, policy)
+                except FileNotFoundError:
+                    continue
+
+    def _scratch_roots(self) -> list:
+        """可能存放任务临时文件的目录，包括旧版本下载训练素材的 data/avatar/origin"""
+        roots = [self.disk_scratch_dir, TMPFS_DIR / TMPFS_SCRATCH_NAME, self.avatar_dir / 'origin']
+        if self.settings.artifact_scratch_dir:
+            roots.append(Path(self.settings.artifact_scratch_dir))
+        return roots
+
+    def _sweep_caches(self, sweep):
+        """按最近使用时间淘汰配音、音频特征缓存：先删除超期的，总大小仍超过上限时从最久未使用的开始删除"""
+        deadline = time.time() - self.settings.artifact_cache_max_days * 86400
+        entries = []
+        for name in UNBOUNDED_CACHES:
+            cache_dir = self.cache_dir / name
+            if not cache_dir.is_dir():
+                continue
+            for path in cache_dir.rglob('*'):
+                try:
+                    if path.is_file():
+                        stat = path.stat()
+                        entries.append((stat.st_mtime, stat.st_size, path))
+                except FileNotFoundError:
+                    continue
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if mtime >= deadline and total <= self.settings.artifact_cache_max_bytes:
+                break
+            self._remove(sweep, path, 'cache')
+            total -= size
+
+    def _usage(self, live_paths: set) -> dict:
+        """各类产物当前占用的字节数"""
+        final = sum(self._size(path) for path in live_paths)
+        cacheable = self._size(self.cache_dir)
+        scratch = sum(self._size(root) for root in set(self._scratch_roots()) | {self.preview_dir})
+        return {FINAL: final, CACHEABLE: cacheable, SCRATCH: scratch}
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        """文件或目录的总字节数"""
+        try:
+            if path.is_file():
+                return path.stat().st_size
+            if path.is_dir():
+                return sum(item.stat().st_size for item in path.rglob('*') if item.is_file())
+        except OSError:
+            pass
+        return 0
+
+    def _remove(self, sweep, path: Path, policy: str):
+        """删除文件或目录并记入本次回收的统计"""
+        # 试运行时文件仍在，已统计过的文件和目录不重复计入
+        if not path.exists() or path in sweep.removed or sweep.removed.intersection(path.parents):
+            return
+        files = [item for item in path.rglob('*') if item.is_file()] if path.is_dir() else [path]
+        files = [item for item in files if item not in sweep.removed and not sweep.removed.intersection(item.parents)]
+        sweep.removed.add(path)
+        size = sum(self._size(item) for item in files)
+        count = len(files)
+        if not sweep.dry_run:
+            try:
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+            except OSError as e:
+                logger.warning(f"删除失败: {path}, {str(e)}")
+                return
+        logger.debug(f"回收[{policy}]: {path} ({size} 字节)")
+        sweep.report[policy]['files'] += count
+        sweep.report[policy]['bytes'] += size
+
+    def _delete_objects(self, keys: set, dry_run: bool) -> int:
+        """删除对象存储中的成品，HLS 播放列表连同同目录的分片一起删除"""
+        from app.services.upload_service import delete_objects, list_object_keys
+
+        if not self.settings.oss_bucket_name:
+            return 0
+        objects = set()
+        try:
+            for key in keys:
+                if key.endswith('.m3u8'):
+                    objects.update(list_object_keys(key.rsplit('/', 1)[0] + '/'))
+                else:
+                    objects.add(key)
+            return len(objects) if dry_run else delete_objects(objects)
+        except Exception as e:
+            logger.error(f"删除对象存储中的成品失败: {str(e)}")
+            return 0
+
+    @staticmethod
+    def _update_videos(video_ids: set, values: dict):
+        """经写入队列批量更新短视频记录"""
+        from app.database import get_write_queue
+        from app.models.short_video import ShortVideo
+
+        get_write_queue().write(lambda session: session.query(ShortVideo)
+                                .filter(ShortVideo.id.in_(video_ids))
+                                .update(values, synchronize_session=False))
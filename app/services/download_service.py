@@ -0,0 +1,339 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.71 Safari/537.36',
+}
+
+
+class DownloadService:
+    """
+    公共素材下载服务类，负责声音、数字人、字体等远程资源的下载与本地缓存。
+    实现了单例模式，同一进程内共享连接池、缓存索引和下载锁。
+
+    - 连接池复用、超时与失败重试
+    - 基于 Range 的断点续传，大文件分段并行下载
+    - 同一 URL 同时只下载一次（single-flight）
+    - 解压到临时目录后再原子重命名
+    - 带校验和的缓存索引，按 LRU 控制缓存总大小
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """获取DownloadService的单例实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, settings: Settings = None):
+        """初始化DownloadService，创建连接池并加载缓存索引"""
+        settings = settings or get_settings()
+        project_root = settings.project_root
+        self.cache_dir = project_root / 'data' / 'cache' / 'download'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / 'index.json'
+
+        self.max_cache_bytes = settings.download_cache_max_bytes
+        self.parallel_threshold = settings.download_parallel_threshold
+        self.parallel_parts = settings.download_parallel_parts
+        self.chunk_size = 1024 * 1024
+        self.timeout = (10, 60)  # (连接超时, 读取超时)
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET", "HEAD"])
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index = self._load_index()
+
+    @contextmanager
+    def _single_flight(self, key: str):
+        """同一个key同时只允许一个线程执行，其余线程等待其完成后复用结果"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            # 最后一个使用者释放后移除，避免每个URL都常驻一把锁
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def _load_index(self) -> dict:
+        """加载缓存索引"""
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"缓存索引损坏，将重新创建: {str(e)}")
+            return {}
+
+    def _save_index(self):
+        """原子写入缓存索引"""
+        temp_path = self.index_path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(self._index, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def _sha256(file_path: Path) -> str:
+        """计算文件的sha256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _probe(self, url: str):
+        """获取远程文件大小以及是否支持Range请求"""
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            if response.status_code >= 400:
+                return None, False
+            size = response.headers.get('Content-Length')
+            accept_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+            return (int(size) if size else None), accept_ranges
+        except requests.RequestException as e:
+            logger.debug(f"HEAD 请求失败，使用普通下载: {url}, {str(e)}")
+            return None, False
+
+    def content_length(self, url: str):
+        """
+        远程文件大小，不下载文件
+
+        :param url: 文件URL
+        :return: 字节数，服务端未返回时为None
+        """
+        return self._probe(url)[0]
+
+    def _fetch_range(self, url: str, part_path: Path, start: int = 0, end: int = None, total: int = None):
+        """
+        下载[start, end]区间到part_path，part_path已存在时从断点继续
+
+        :param url: 下载地址
+        :param part_path: 分段文件路径
+        :param start: 起始字节
+        :param end: 结束字节（包含），为None表示到文件末尾
+        :param total: 远程文件大小，未知时为None
+        """
+        downloaded = part_path.stat().st_size if part_path.exists() else 0
+        expected = (end - start + 1) if end is not None else (total - start if total else None)
+        if expected is not None and downloaded >= expected:
+            return
+
+        headers = {}
+        if downloaded or start or end is not None:
+            headers['Range'] = f"bytes={start + downloaded}-{'' if end is None else end}"
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and downloaded:
+                # 上次已下载完整但未重命名，续传的起点等于文件大小
+                content_range = response.headers.get('Content-Range', '')
+                size = content_range.rsplit('/', 1)[-1] if content_range.startswith('bytes */') else ''
+                if not size.isdigit() or start + downloaded == int(size):
+                    return
+                logger.warning(f"断点文件与远程文件大小不一致，重新下载: {url}")
+                part_path.unlink()
+                return self._fetch_range(url, part_path, start, end, total)
+            if response.status_code == 200 and 'Range' in headers:
+                if start or end is not None:
+                    raise RuntimeError(f"服务器不支持分段下载: {url}")
+                # 服务器忽略了Range，从头下载
+                downloaded = 0
+            elif response.status_code not in (200, 206):
+                raise RuntimeError(f"下载失败，状态码: {response.status_code}, url: {url}")
+
+            with open(part_path, 'ab' if downloaded else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+
+    def _download_to(self, url: str, save_path: Path):
+        """下载到指定路径，先写入 .part 文件，完成后原子重命名"""
+        save_path = Path(save_path)
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = save_path.with_name(save_path.name + '.part')
+        size, accept_ranges = self._probe(url)
+
+        start_time = time.time()
+        if size and accept_ranges and size >= self.parallel_threshold and self.parallel_parts > 1:
+            # 大文件分段并行下载
+            part_size = -(-size // self.parallel_parts)
+            ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+            part_paths = [save_path.with_name(f"{save_path.name}.part{index}") for index in range(len(ranges))]
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(self._fetch_range, url, path, start, end)
+                           for path, (start, end) in zip(part_paths, ranges)]
+                for future in futures:
+                    future.result()
+            with open(part_path, 'wb') as output:
+                for path in part_paths:
+                    with open(path, 'rb') as f:
+                        shutil.copyfileobj(f, output, self.chunk_size)
+            for path in part_paths:
+                path.unlink()
+        else:
+            self._fetch_range(url, part_path, total=size)
+
+        if size and part_path.stat().st_size != size:
+            part_path.unlink()
+            raise RuntimeError(f"下载文件大小不一致: {url}")
+        os.replace(part_path, save_path)
+        logger.info(f"下载完成: {url} -> {save_path}, 耗时 {time.time() - start_time:.2f} 秒")
+        return save_path
+
+    def download(self, url: str, save_path, use_cache: bool = False) -> Path:
+        """
+        下载文件到指定路径，支持断点续传，同一目标并发调用时只下载一次
+
+        :param url: 下载地址
+        :param save_path: 保存路径
+        :param use_cache: 是否经过本地缓存（公共素材使用，用户上传的文件直接下载）
+        :return: 保存路径
+        """
+        save_path = Path(save_path)
+        with self._single_flight(f"download:{save_path}"):
+            if not use_cache:
+                return self._download_to(url, save_path)
+
+            cached = self.fetch(url)
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            save_path.unlink(missing_ok=True)
+            try:
+                os.link(cached, save_path)
+            except OSError:
+                shutil.copy2(cached, save_path)
+        return save_path
+
+    def fetch(self, url: str) -> Path:
+        """
+        获取URL对应的本地缓存文件，不存在或校验失败时下载
+
+        :param url: 下载地址
+        :return: 缓存文件路径
+        """
+        with self._single_flight(f"fetch:{url}"):
+            with self._index_lock:
+                entry = self._index.get(url)
+            if entry:
+                cached_path = Path(entry['path'])
+                stat_result = cached_path.stat() if cached_path.exists() else None
+                # 修改时间与索引一致时只比较大小，文件被改动过才重新计算sha256
+                if stat_result and stat_result.st_size == entry['size'] and (
+                        stat_result.st_mtime == entry.get('mtime') or self.verify(url)):
+                    with self._index_lock:
+                        entry['last_access'] = time.time()
+                        entry['mtime'] = stat_result.st_mtime
+                        self._save_index()
+                    logger.debug(f"命中下载缓存: {url}")
+                    return cached_path
+                logger.warning(f"缓存文件缺失或校验失败，重新下载: {url}")
+
+            extension = os.path.splitext(urlparse(url).path)[1]
+            cached_path = self.cache_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}{extension}"
+            self._download_to(url, cached_path)
+
+            with self._index_lock:
+                self._index[url] = {
+                    'path': str(cached_path),
+                    'size': cached_path.stat().st_size,
+                    'mtime': cached_path.stat().st_mtime,
+                    'sha256': self._sha256(cached_path),
+                    'created_at': time.time(),
+                    'last_access': time.time(),
+                }
+                self._evict(keep=url)
+                self._save_index()
+            return cached_path
+
+    def _evict(self, keep: str = None):
+        """按最近访问时间淘汰缓存，使缓存总大小不超过上限（需持有 _index_lock）"""
+        total = sum(entry['size'] for entry in self._index.values())
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_cache_bytes:
+                break
+            if url == keep:
+                continue
+            Path(entry['path']).unlink(missing_ok=True)
+            total -= entry['size']
+            del self._index[url]
+            logger.info(f"淘汰下载缓存: {url}")
+
+    def verify(self, url: str) -> bool:
+        """校验缓存文件的sha256"""
+        with self._index_lock:
+            entry = self._index.get(url)
+        if not entry or not Path(entry['path']).exists():
+            return False
+        return self._sha256(Path(entry['path'])) == entry['sha256']
+
+    def ensure_extracted(self, url: str, extract_dir, target_dir=None) -> Path:
+        """
+        下载ZIP并解压到extract_dir，先解压到临时目录，再重命名到目标位置
+
+        :param url: ZIP文件地址
+        :param extract_dir: 解压目录
+        :param target_dir: 解压后应存在的目录，已存在时直接返回
+        :return: 解压目录
+        """
+        extract_dir = Path(extract_dir)
+        target_dir = Path(target_dir) if target_dir else None
+        with self._single_flight(f"extract:{target_dir or extract_dir}"):
+            if target_dir and target_dir.exists():
+                return target_dir
+
+            zip_path = self.fetch(url)
+            extract_dir.mkdir(parents=True, exist_ok=True)
+            temp_dir = extract_dir / f".extract_{uuid.uuid4().hex}"
+            try:
+                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                    zip_ref.extractall(temp_dir)
+                for entry in temp_dir.iterdir():
+                    destination = extract_dir / entry.name
+                    if destination.exists():
+                        logger.info(f"目标已存在，跳过: {destination}")
+                        continue
+                    os.replace(entry, destination)
+                logger.info(f"成功解压缩文件到: {extract_dir}")
+            except zipfile.BadZipFile:
+                logger.error(f"文件不是有效的ZIP文件: {zip_path}")
+                with self._index_lock:
+                    self._index.pop(url, None)
+                    self._save_index()
+                Path(zip_path).unlink(missing_ok=True)
+                raise
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            return target_dir or extract_dir
@@ -1,8 +1,6 @@
 import shlex
 import ffmpeg
 from pathlib import Path
-import os
-from dotenv import load_dotenv
 import uuid
 from datetime import datetime
 import traceback
@@ -10,12 +8,14 @@ import logging
 import srt
 import platform
 
+from app.config import Settings, get_settings
+
 logger = logging.getLogger(__name__)
 
 class FFmpegService:
-    def __init__(self):
-        load_dotenv()
-        self.project_root = Path(os.getenv("PROJECT_ROOT"))
+    def __init__(self, settings: Settings = None):
+        settings = settings or get_settings()
+        self.project_root = settings.project_root
         self.video_dir = self.project_root / 'data' / 'video'
         self.image_dir = self.project_root / 'data' / 'image'
         self.music_dir = self.project_root / 'data' / 'music'
@@ -1,31 +1,37 @@
+import hashlib
+import shutil
 import subprocess
 from pathlib import Path
 import datetime
 import uuid
 import os
-from dotenv import load_dotenv
 import logging
+
+from app.config import Settings, get_settings
+from app.services.progress_service import report_progress, watch_progress_files
+from app.utils.logger_utils import subprocess_env
+
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 class FishSpeechService:
     """FishSpeech服务类,用于语音克隆和生成。"""
 
-    def __init__(self):
+    def __init__(self, settings: Settings = None):
         """初始化FishSpeechService"""
-        load_dotenv()
-        project_root = Path(os.getenv("PROJECT_ROOT"))
+        settings = settings or get_settings()
+        project_root = settings.project_root
         
         self.base_path = project_root / 'external_modules' / 'fish-speech'
         self.checkpoint_path = self.base_path / 'checkpoints' / 'fish-speech-1.4'
         self.vqgan_path = self.checkpoint_path / 'firefly-gan-vq-fsq-8x1024-21hz-generator.pth'
-        self.conda_env = os.getenv("FISH_SPEECH_CONDA_ENV")
+        self.conda_env = settings.fish_speech_conda_env
+        self.cache_dir = project_root / 'data' / 'cache' / 'tts'
 
-    def run_command(self, command):
+    def run_command(self, command, env=None):
         """在指定的Conda环境中运行命令。"""
         full_command = f"conda run -n {self.conda_env} {command}"
         logger.debug(f"fishspeech: 执行命令: {command}")
-        subprocess.run(full_command, shell=True, check=True, cwd=str(self.base_path))
+        subprocess.run(full_command, shell=True, check=True, cwd=str(self.base_path), env=subprocess_env(env))
 
     def clone_voice(self, audio_path, audio_prompt_wav_path):
         """
@@ -56,14 +62,49 @@ class FishSpeechService:
         返回:
         tuple: 生成的npy文件路径和wav文件路径
         """
-        # 生成语音特征
-        self.run_command(f"python tools/llama/generate.py --text \"{text}\" --prompt-text \"{prompt_text}\"  --prompt-tokens {prompt_npy_path} "
-                         f"--checkpoint-path {self.checkpoint_path} --num-samples 1 ")
+        # 生成语音特征，已生成的token数写入进度文件（遇到结束符提前结束，总数未知）
+        progress_path = (self.cache_dir / f"progress_{uuid.uuid4().hex}.txt").as_posix()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with watch_progress_files('tts', [progress_path]):
+            self.run_command(f"python tools/llama/generate.py --text \"{text}\" --prompt-text \"{prompt_text}\"  --prompt-tokens {prompt_npy_path} "
+                             f"--checkpoint-path {self.checkpoint_path} --num-samples 1 ",
+                             env={"FISH_SPEECH_PROGRESS_PATH": progress_path})
         
         # 将特征转换为音频
+        report_progress('vocoder')
         self.run_command(f"python tools/vqgan/inference.py -i codes_0.npy --checkpoint-path {self.vqgan_path} -o {output_wav_path}")
         return output_npy_path, output_wav_path
 
+    def generate_speech_cached(self, text, prompt_text, prompt_npy_path, output_npy_path, output_wav_path):
+        """
+        生成语音，相同文本和声音提示的结果会被缓存，预览和正式生成之间可复用
+
+        参数与 generate_speech 相同
+
+        返回:
+        tuple: 生成的npy文件路径和wav文件路径
+        """
+        prompt_mtime = os.path.getmtime(prompt_npy_path) if os.path.exists(prompt_npy_path) else 0
+        cache_key = hashlib.sha1(f"{text}\0{prompt_text}\0{Path(prompt_npy_path).as_posix()}\0{prompt_mtime}".encode('utf-8')).hexdigest()
+        cached_wav_path = self.cache_dir / f"{cache_key}.wav"
+
+        try:
+            shutil.copy2(cached_wav_path, output_wav_path)
+            # 刷新修改时间，产物回收按最近使用时间淘汰缓存
+            cached_wav_path.touch()
+            logger.info(f"fishspeech: 命中语音缓存: {cached_wav_path}")
+            return output_npy_path, output_wav_path
+        except FileNotFoundError:
+            # 未命中，或刚被产物回收删除
+            pass
+
+        self.generate_speech(text, prompt_text, prompt_npy_path, output_npy_path, output_wav_path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = cached_wav_path.with_name(f"{cache_key}.{uuid.uuid4().hex}.tmp")
+        shutil.copy2(output_wav_path, temp_path)
+        os.replace(temp_path, cached_wav_path)
+        return output_npy_path, output_wav_path
+
     def process_audio(self, avatar_path, wav_output_path):
         """处理音频文件"""
         try:
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+
+class MaterialService:
+    """
+    背景视频和背景音乐的预处理缓存服务类。
+    实现了单例模式，同一素材按内容哈希只处理一次。
+
+    - 背景按目标分辨率、帧率归一化为 yuv420p 的H.264视频，合成时直接循环读取，无需每次缩放和转帧率
+    - 音乐统一重采样并按 EBU R128 两遍响度归一化为WAV，响度测量结果保存在索引中
+    - 缓存索引记录源文件哈希，按 LRU 控制缓存总大小
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """获取MaterialService的单例实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, settings: Settings = None):
+        """初始化MaterialService，加载缓存索引"""
+        self.settings = settings or get_settings()
+        project_root = self.settings.project_root
+        self.cache_dir = project_root / 'data' / 'cache' / 'material'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / 'index.json'
+
+        self.max_cache_bytes = self.settings.material_cache_max_bytes
+        self.image_seconds = self.settings.material_image_seconds
+        self.music_sample_rate = self.settings.material_music_sample_rate
+        self.music_target_lufs = self.settings.material_music_target_lufs
+
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index = self._load_index()
+
+    @contextmanager
+    def _single_flight(self, key: str):
+        """同一个key同时只允许一个线程执行，其余线程等待其完成后复用结果"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            # 最后一个使用者释放后移除，避免每个素材都常驻一把锁
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def _load_index(self) -> dict:
+        """加载缓存索引"""
+        index = {'sources': {}, 'entries': {}}
+        if self.index_path.exists():
+            try:
+                index.update(json.loads(self.index_path.read_text(encoding='utf-8')))
+            except Exception as e:
+                logger.warning(f"素材缓存索引损坏，将重新创建: {str(e)}")
+        return index
+
+    def _save_index(self):
+        """原子写入缓存索引（需持有 _index_lock）"""
+        temp_path = self.index_path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(self._index, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(temp_path, self.index_path)
+
+    def resolve_source(self, source) -> Path:
+        """
+        素材地址转为本地路径：远程地址经下载缓存获取，本服务的URL转换为本地路径
+
+        :param source: 素材URL或本地路径
+        :return: 本地文件路径
+        """
+        from app.services.download_service import DownloadService
+
+        source = str(source)
+        path_mapper = self.settings.path_mapper
+        if path_mapper.is_local_url(source):
+            return Path(path_mapper.to_path(source))
+        if source.startswith('http'):
+            return DownloadService.get_instance().fetch(source)
+        return Path(source)
+
+    def source_hash(self, path: Path) -> str:
+        """
+        计算素材内容的sha256，按 (路径, 大小, 修改时间) 记忆，未变化的文件不重复计算
+
+        :param path: 本地文件路径
+        :return: sha256
+        """
+        stat = path.stat()
+        fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+        with self._index_lock:
+            entry = self._index['sources'].get(str(path.resolve()))
+        if entry and entry['fingerprint'] == fingerprint:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        with self._index_lock:
+            self._index['sources'][str(path.resolve())] = {'fingerprint': fingerprint, 'sha256': digest.hexdigest()}
+            self._save_index()
+        return digest.hexdigest()
+
+    def _cached(self, key: str, output_path: Path, build) -> dict:
+        """
+        返回key对应的缓存条目，不存在时调用build生成
+
+        :param key: 缓存key
+        :param output_path: 缓存文件路径
+        :param build: build(temp_path) 生成素材并返回需要记录的附加信息
+        :return: 缓存条目
+        """
+        with self._single_flight(key):
+            with self._index_lock:
+                entry = self._index['entries'].get(key)
+                if entry and Path(entry['path']).exists():
+                    entry['last_access'] = time.time()
+                    self._save_index()
+                    logger.debug(f"命中素材缓存: {key}")
+                    return entry
+
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = output_path.with_name(f"{output_path.stem}.{uuid.uuid4().hex}.tmp{output_path.suffix}")
+            start_time = time.time()
+            try:
+                extra = build(temp_path) or {}
+                os.replace(temp_path, output_path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+            logger.info(f"素材预处理完成: {key} -> {output_path}, 耗时 {time.time() - start_time:.2f} 秒")
+
+            with self._index_lock:
+                entry = {
+                    'path': str(output_path),
+                    'size': output_path.stat().st_size,
+                    'created_at': time.time(),
+                    'last_access': time.time(),
+                    **extra,
+                }
+                self._index['entries'][key] = entry
+                self._evict(keep=key)
+                self._save_index()
+            return entry
+
+    def _evict(self, keep: str = None):
+        """按最近访问时间淘汰缓存，使缓存总大小不超过上限（需持有 _index_lock）"""
+        entries = self._index['entries']
+        total = sum(entry['size'] for entry in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_cache_bytes:
+                break
+            if key == keep:
+                continue
+            Path(entry['path']).unlink(missing_ok=True)
+            total -= entry['size']
+            del entries[key]
+            logger.info(f"淘汰素材缓存: {key}")
+
+    def get_background(self, source, width: int, height: int, fps: int) -> Path:
+        """
+        获取按目标分辨率和帧率归一化后的背景视频，图片背景转为短视频，合成时循环读取
+
+        :param source: 背景视频或图片的URL/本地路径
+        :param width: 目标宽
+        :param height: 目标高
+        :param fps: 目标帧率
+        :return: 归一化后的背景视频路径
+        """
+        source_path = self.resolve_source(source)
+        source_hash = self.source_hash(source_path)
+        key = f"background:{source_hash}:{width}x{height}@{fps}"
+        output_path = self.cache_dir / 'background' / f"{source_hash[:16]}_{width}x{height}_{fps}.mp4"
+
+        def build(temp_path):
+            input_args = ['-i', str(source_path)]
+            if source_path.suffix.lower() in IMAGE_EXTENSIONS:
+                input_args = ['-loop', '1', '-t', str(self.image_seconds), *input_args]
+            command = [
+                'ffmpeg', '-y', *input_args,
+                '-vf', f'fps={fps},scale={width}:{height}:force_original_aspect_ratio=increase,'
+                       f'crop={width}:{height},setsar=1,format=yuv420p',
+                '-an', '-c:v', 'libx264', '-preset', 'medium', '-crf', '18', '-g', str(fps),
+                '-movflags', '+faststart',
+                str(temp_path)
+            ]
+            subprocess.run(command, check=True, capture_output=True, text=True)
+
+        return Path(self._cached(key, output_path, build)['path'])
+
+    def measure_loudness(self, audio_path) -> dict:
+        """
+        EBU R128 响度测量（loudnorm 第一遍）
+
+        :param audio_path: 音频路径
+        :return: {'input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset'}
+        """
+        command = [
+            'ffmpeg', '-hide_banner', '-nostats', '-i', str(audio_path),
+            '-af', f'loudnorm=I={self.music_target_lufs}:TP=-2:LRA=11:print_format=json',
+            '-f', 'null', '-'
+        ]
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        stats = json.loads(re.findall(r'\{[^{}]*\}', result.stderr)[-1])
+        return {name: float(stats[name]) for name in ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')}
+
+    def get_music(self, source) -> dict:
+        """
+        获取重采样并响度归一化后的背景音乐
+
+        :param source: 音乐的URL/本地路径
+        :return: {'path': 归一化后的WAV路径, 'loudness': 源文件响度测量结果, 'integrated_lufs': 归一化后实测的响度}
+        """
+        source_path = self.resolve_source(source)
+        source_hash = self.source_hash(source_path)
+        sample_rate = self.music_sample_rate
+        target = self.music_target_lufs
+        key = f"music:{source_hash}:{sample_rate}@{target:g}:measured"
+        output_path = self.cache_dir / 'music' / f"{source_hash[:16]}_{sample_rate}_{target:g}_measured.wav"
+
+        def build(temp_path):
+            loudness = self.measure_loudness(source_path)
+            # 第二遍使用测量值线性归一化，避免动态压缩改变音乐听感
+            loudnorm = (f"loudnorm=I={target}:TP=-2:LRA=11:linear=true:"
+                        f"measured_I={loudness['input_i']}:measured_TP={loudness['input_tp']}:"
+                        f"measured_LRA={loudness['input_lra']}:measured_thresh={loudness['input_thresh']}:"
+                        f"offset={loudness['target_offset']}")
+            command = [
+                'ffmpeg', '-y', '-i', str(source_path), '-vn',
+                '-af', loudnorm,
+                '-ar', str(sample_rate), '-ac', '2', '-c:a', 'pcm_s16le',
+                str(temp_path)
+            ]
+            subprocess.run(command, check=True, capture_output=True, text=True)
+            # 真峰值受限或素材过短时 loudnorm 达不到目标响度，记录实测值供合成时计算增益
+            integrated = self.measure_loudness(temp_path)['input_i']
+            return {'loudness': loudness, 'integrated_lufs': integrated if math.isfinite(integrated) else target}
+
+        return self._cached(key, output_path, build)
@@ -0,0 +1,241 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 当前线程正在执行的任务ID，由 TaskService 在执行任务前设置，任务内的服务上报进度时无需层层传递
+current_job_id = contextvars.ContextVar('current_job_id', default=None)
+# 当前线程所在的任务阶段，由 report_progress 设置，日志记录中附带
+current_stage = contextvars.ContextVar('current_stage', default=None)
+
+ALL_JOBS = '*'
+
+
+class ProgressService:
+    """
+    任务进度的进程内发布/订阅服务类。
+    实现了单例模式，任务线程发布阶段切换和细粒度进度，SSE 连接订阅后由事件循环推送给客户端。
+
+    - 每个任务保留最新一条事件，后订阅的客户端先收到当前状态
+    - 按阶段记录开始时间和起始进度，根据平均速度估算剩余时间
+    - 订阅队列有上限，客户端消费过慢时丢弃最旧的事件，不阻塞任务线程
+    - 提交任务时记录所属用户，订阅和查询只返回该用户自己的任务
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """获取ProgressService的单例实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, max_jobs: int = 1000, queue_size: int = 100):
+        """初始化ProgressService"""
+        self.max_jobs = max_jobs
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._latest = OrderedDict()
+        self._owners = {}
+        self._stage_starts = {}
+        self._subscribers = {}
+
+    def publish(self, job_id: str, stage: str, current: Optional[float] = None, total: Optional[float] = None,
+                message: Optional[str] = None, status: str = 'running', result: Optional[dict] = None,
+                user_id: Optional[str] = None) -> dict:
+        """
+        发布任务进度
+
+        :param job_id: 任务ID
+        :param stage: 阶段名称，如 tts、features、render、compose
+        :param current: 当前阶段已完成的数量（帧数、token数等）
+        :param total: 当前阶段的总数量，未知时为None
+        :param message: 附加说明
+        :param status: running / succeeded / failed
+        :param result: 任务结果，任务成功结束时附带（如预览视频URL）
+        :param user_id: 任务所属用户，提交任务时传入一次，之后的事件沿用
+        :return: 发布的事件
+        """
+        now = time.time()
+        with self._lock:
+            stage_key = (job_id, stage)
+            if stage_key not in self._stage_starts:
+                self._stage_starts[stage_key] = (now, current or 0)
+            stage_start, start_current = self._stage_starts[stage_key]
+
+            eta_seconds = None
+            progress = None
+            if current is not None and total:
+                progress = round(min(current / total, 1.0), 4)
+                done = current - start_current
+                if done > 0 and current < total:
+                    eta_seconds = round((now - stage_start) / done * (total - current), 1)
+                elif current >= total:
+                    eta_seconds = 0
+
+            event = {
+                'job_id': job_id,
+                'stage': stage,
+                'status': status,
+                'current': current,
+                'total': total,
+                'progress': progress,
+                'eta_seconds': eta_seconds,
+                'message': message,
+                'result': result,
+                'timestamp': now,
+            }
+            self._latest[job_id] = event
+            self._latest.move_to_end(job_id)
+            if user_id is not None:
+                self._owners[job_id] = user_id
+            owner = self._owners.get(job_id)
+            while len(self._latest) > self.max_jobs:
+                expired_job_id, _ = self._latest.popitem(last=False)
+                self._owners.pop(expired_job_id, None)
+                self._stage_starts = {key: value for key, value in self._stage_starts.items() if key[0] != expired_job_id}
+            if status != 'running':
+                self._stage_starts = {key: value for key, value in self._stage_starts.items() if key[0] != job_id}
+
+            subscribers = list(self._subscribers.get(job_id, ())) + \
+                [(loop, queue) for loop, queue, subscriber in self._subscribers.get(ALL_JOBS, ()) if subscriber == owner]
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # 事件循环已关闭，连接会在断开时取消订阅
+                pass
+        return event
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        """在事件循环线程中写入订阅队列，队列已满时丢弃最旧的事件"""
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def is_owner(self, job_id: str, user_id: str) -> bool:
+        """任务是否属于该用户，未记录的任务视为不存在"""
+        with self._lock:
+            return self._owners.get(job_id) == user_id
+
+    def subscribe(self, user_id: str, job_id: Optional[str] = None) -> asyncio.Queue:
+        """
+        订阅任务进度，需要在事件循环中调用；指定任务ID时调用方需先用 is_owner 校验
+
+        :param user_id: 订阅的用户，不指定任务ID时只推送该用户的任务
+        :param job_id: 任务ID，为None时订阅该用户的全部任务
+        :return: 事件队列，已有的最新事件会先放入队列
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if job_id:
+                self._subscribers.setdefault(job_id, set()).add((loop, queue))
+                latest = [self._latest[job_id]] if job_id in self._latest else []
+            else:
+                self._subscribers.setdefault(ALL_JOBS, set()).add((loop, queue, user_id))
+                latest = [event for key, event in self._latest.items() if self._owners.get(key) == user_id]
+        for event in latest[-self.queue_size:]:
+            self._offer(queue, event)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, job_id: Optional[str] = None):
+        """取消订阅"""
+        key = job_id or ALL_JOBS
+        with self._lock:
+            subscribers = self._subscribers.get(key, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(key, None)
+
+    def latest(self, job_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+        """任务的最新事件，传入用户时只返回该用户的任务"""
+        with self._lock:
+            if user_id is not None and self._owners.get(job_id) != user_id:
+                return None
+            return self._latest.get(job_id)
+
+
+def report_progress(stage: str, current: Optional[float] = None, total: Optional[float] = None,
+                    message: Optional[str] = None, job_id: Optional[str] = None):
+    """
+    上报当前任务的进度，不在任务中调用时忽略
+
+    :param stage: 阶段名称
+    :param current: 已完成数量
+    :param total: 总数量
+    :param message: 附加说明
+    :param job_id: 任务ID，默认使用当前线程所执行的任务
+    """
+    if job_id is None:
+        job_id = current_job_id.get()
+        current_stage.set(stage)
+    if job_id:
+        ProgressService.get_instance().publish(job_id, stage, current, total, message)
+
+
+def read_progress_file(path) -> tuple:
+    """
+    读取子进程写入的进度文件（内容为 "已完成 总数"）
+
+    :param path: 进度文件路径
+    :return: (已完成, 总数)，文件不存在或未写完时返回 (0, None)
+    """
+    try:
+        done, total = Path(path).read_text().split()
+        return int(done), int(total)
+    except (OSError, ValueError):
+        return 0, None
+
+
+@contextmanager
+def watch_progress_files(stage: str, paths, total: Optional[int] = None, interval: float = 1.0):
+    """
+    子进程运行期间轮询其进度文件并汇总上报，用于渲染分片、TTS 等在 conda 子进程中执行的步骤
+
+    :param stage: 阶段名称
+    :param paths: 各子进程的进度文件路径
+    :param total: 总数量，为None时使用各进度文件中的总数之和
+    :param interval: 轮询间隔（秒）
+    """
+    job_id = current_job_id.get()
+    if not job_id:
+        yield
+        return
+
+    stop = threading.Event()
+
+    def poll():
+        last = None
+        while True:
+            stopped = stop.wait(interval)
+            results = [read_progress_file(path) for path in paths]
+            done = sum(result[0] for result in results)
+            file_total = sum(result[1] or 0 for result in results) or None
+            if done != last:
+                report_progress(stage, done, total or file_total, job_id=job_id)
+                last = done
+            if stopped:
+                break
+
+    watcher = threading.Thread(target=poll, name=f"progress-{job_id}", daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        watcher.join()
+        for path in paths:
+            Path(path).unlink(missing_ok=True)
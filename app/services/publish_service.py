@@ -0,0 +1,173 @@
+import logging
+import mimetypes
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from app.config import Settings, get_settings
+from app.services.upload_service import get_s3_client, object_url
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.webp': 'image/webp',
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+}
+
+
+class PublishService:
+    """
+    成片发布服务类，将渲染完成的视频、封面、缩略图和 HLS 分片上传到对象存储，返回对外访问的URL。
+    实现了单例模式，同一进程内复用 S3 客户端及其连接池。
+
+    - 大于 PUBLISH_MULTIPART_THRESHOLD 的文件按 PUBLISH_MULTIPART_CHUNKSIZE 分片，每个文件最多 PUBLISH_MAX_CONCURRENCY 个分片并行上传
+    - 同一批输出中的多个文件由 PUBLISH_WORKERS 个线程并行上传
+    - 全部上传成功后才替换为URL，PUBLISH_EVICT_LOCAL=1 时删除本地文件
+    - 客户端可注入，便于对接 MinIO 或 moto 等本地 S3 兼容服务
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """获取PublishService的单例实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, settings: Settings = None, client=None):
+        """
+        初始化PublishService
+
+        :param settings: 配置，默认使用全局配置
+        :param client: boto3 S3 客户端，默认使用 upload_service 中共享的客户端
+        """
+        from boto3.s3.transfer import TransferConfig
+
+        settings = settings or get_settings()
+        self.client = client or get_s3_client()
+        self.settings = settings
+        self.project_root = settings.project_root
+        self.bucket_name = settings.oss_bucket_name
+        self.evict_local = settings.publish_evict_local
+        self.workers = max(1, settings.publish_workers)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.publish_multipart_threshold,
+            multipart_chunksize=settings.publish_multipart_chunksize,
+            max_concurrency=settings.publish_max_concurrency,
+            use_threads=True,
+        )
+
+    def object_key(self, local_path) -> str:
+        """
+        本地文件对应的对象键，项目目录下的文件沿用相对路径（data/video/...），保证多节点上键名一致
+
+        :param local_path: 本地文件路径
+        :return: 对象键
+        """
+        path = Path(local_path).resolve()
+        try:
+            return path.relative_to(self.project_root.resolve()).as_posix()
+        except ValueError:
+            return f"data/publish/{path.parent.name}/{path.name}"
+
+    def object_url(self, key: str) -> str:
+        """
+        对象的对外访问URL
+
+        :param key: 对象键
+        :return: URL
+        """
+        return object_url(key, self.settings)
+
+    def publish_file(self, local_path, key: Optional[str] = None) -> str:
+        """
+        上传单个文件，超过阈值时自动分片并行上传
+
+        :param local_path: 本地文件路径
+        :param key: 对象键，默认由 object_key 生成
+        :return: 对象URL
+        """
+        local_path = Path(local_path)
+        key = key or self.object_key(local_path)
+        content_type = CONTENT_TYPES.get(local_path.suffix.lower()) or mimetypes.guess_type(local_path.name)[0]
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_file(str(local_path), self.bucket_name, key,
+                                ExtraArgs=extra_args, Config=self.transfer_config)
+        logger.debug(f"已上传 {local_path} -> {key}")
+        return self.object_url(key)
+
+    def publish_outputs(self, outputs: dict) -> dict:
+        """
+        发布一次合成的全部输出，结构与输入相同，路径替换为URL
+
+        HLS 播放列表（.m3u8）连同所在目录下的初始化分片和媒体分片一起上传，分片按相对路径引用，上传后无需改写播放列表
+
+        :param outputs: {'video': 路径, 'cover': 路径, 'thumbnails': {宽度: 路径}, 'renditions': {版本名: 路径}}，缺少的项跳过
+        :return: 同结构的URL字典
+        """
+        # 收集需要上传的文件：(本地路径, 对象键)
+        files = {}
+        targets = []
+        for path in self._iter_paths(outputs):
+            path = Path(path)
+            if path.suffix == '.m3u8':
+                for item in path.parent.iterdir():
+                    if item.is_file():
+                        files[item] = self.object_key(item)
+                targets.append(path.parent)
+            else:
+                files[path] = self.object_key(path)
+                targets.append(path)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(files))),
+                                thread_name_prefix='publish') as executor:
+            # 任一文件失败都抛出异常，调用方保留本地路径
+            list(executor.map(lambda item: self.publish_file(*item), files.items()))
+        logger.info(f"已发布 {len(files)} 个文件到对象存储: {self.bucket_name}")
+
+        result = self._map_paths(outputs, lambda path: self.object_url(files[Path(path)]))
+
+        if self.evict_local:
+            for target in targets:
+                if target.is_dir():
+                    shutil.rmtree(target, ignore_errors=True)
+                else:
+                    target.unlink(missing_ok=True)
+        return result
+
+    @staticmethod
+    def _iter_paths(outputs: dict):
+        for value in outputs.values():
+            if isinstance(value, dict):
+                yield from value.values()
+            elif value:
+                yield value
+
+    @staticmethod
+    def _map_paths(outputs: dict, convert) -> dict:
+        return {
+            name: ({key: convert(path) for key, path in value.items()} if isinstance(value, dict)
+                   else (convert(value) if value else value))
+            for name, value in outputs.items()
+        }
+
+
+def publish_outputs(outputs: dict) -> dict:
+    """
+    PUBLISH_OUTPUTS=1 时将输出发布到对象存储并返回URL，否则原样返回本地路径
+
+    :param outputs: 合成输出，见 PublishService.publish_outputs
+    :return: 写入数据库的路径或URL
+    """
+    if not get_settings().publish_outputs:
+        return outputs
+    return PublishService.get_instance().publish_outputs(outputs)
@@ -1,12 +1,13 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Callable, Any, Optional, Dict, List
 from app.models.task import Task
 from functools import wraps
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import session_scope, get_write_queue
+from app.services.progress_service import ProgressService, current_job_id, current_stage
+from app.utils.user_utils import get_user_id
 import logging
-from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
@@ -29,68 +30,73 @@ class TaskService:
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
 
-    def _get_db_session(self):
-        """获取数据库会话"""
-        return next(get_db())
-
-    @contextmanager
     def _db_session_context(self):
-        """创建一个数据库会话上下文管理器"""
-        session = self._get_db_session()
-        try:
-            yield session
-            session.commit()
-        except Exception:
-            session.rollback()
-            raise
+        """创建一个数据库会话上下文管理器（只读查询使用）"""
+        return session_scope()
 
     def _add_task_to_db(self, task_func: Callable, run_date: datetime, task_id: str, task_name: str):
-        """将任务添加到数据库"""
-        with self._db_session_context() as db:
-            try:
-                task = Task(
-                    id=task_id,
-                    name=task_name,
-                    start_time=run_date,
-                    status=0,  # 0 表示执行中
-                )
-                db.add(task)
-            except Exception as e:
-                logger.error(f"添加任务到数据库失败: {str(e)}")
-                raise
+        """将任务添加到数据库，经写入队列串行提交"""
+        def add_task(db):
+            db.add(Task(
+                id=task_id,
+                name=task_name,
+                start_time=run_date,
+                status=0,  # 0 表示执行中
+            ))
+        try:
+            get_write_queue().write(add_task)
+        except Exception as e:
+            logger.error(f"添加任务到数据库失败: {str(e)}")
+            raise
 
     def _update_task_status(self, task_id: str, status: int, result: str = None):
-        """更新任务状态"""
-        with self._db_session_context() as db:
-            try:
-                task = db.query(Task).filter(Task.id == task_id).first()
-                if task:
-                    task.status = status
-                    task.result = result
-                    if status in [1, 2, 3]:  # 执行成功、失败或取消时设置结束时间
-                        task.end_time = datetime.now()
-            except Exception as e:
-                logger.error(f"更新任务状态失败: {str(e)}")
-                raise
+        """更新任务状态，经写入队列串行提交"""
+        def update_status(db):
+            task = db.query(Task).filter(Task.id == task_id).first()
+            if task:
+                task.status = status
+                task.result = result
+                if status in [1, 2, 3]:  # 执行成功、失败或取消时设置结束时间
+                    task.end_time = datetime.now()
+        try:
+            get_write_queue().write(update_status)
+        except Exception as e:
+            logger.error(f"更新任务状态失败: {str(e)}")
+            raise
 
     def _task_wrapper(self, task_func: Callable, task_id: str):
         """包装任务函数,在执行前后更新任务状态"""
         @wraps(task_func)
         def wrapper(*args, **kwargs):
+            progress = ProgressService.get_instance()
+            # 任务内的服务通过 current_job_id 上报进度
+            token = current_job_id.set(task_id)
+            stage_token = current_stage.set(None)
             self._update_task_status(task_id, 0)  # 0 表示执行中
+            progress.publish(task_id, 'started')
             try:
                 result = task_func(*args, **kwargs)
                 self._update_task_status(task_id, 1, str(result))  # 1 表示执行成功
+                progress.publish(task_id, 'finished', status='succeeded',
+                                 result=result if isinstance(result, dict) else None)
                 return result
             except Exception as e:
                 self._update_task_status(task_id, 2, str(e))  # 2 表示执行失败
+                progress.publish(task_id, 'finished', message=str(e), status='failed')
                 logger.error(f"任务执行失败: {str(e)}")
                 raise
+            finally:
+                current_stage.reset(stage_token)
+                current_job_id.reset(token)
         return wrapper
 
     def schedule_task(self, task_func: Callable, run_date: datetime, task_id: str, task_name: str):
         """调度一个任务在指定时间执行"""
         try:
+            # 先写入任务记录，避免任务立即执行时状态更新找不到记录
+            self._add_task_to_db(task_func, run_date, task_id, task_name)
+            # 任务在请求中提交，记录所属用户，进度只推送给该用户
+            ProgressService.get_instance().publish(task_id, 'queued', message=task_name, user_id=get_user_id())
             wrapped_func = self._task_wrapper(task_func, task_id)
             self.scheduler.add_job(
                 wrapped_func,
@@ -99,7 +105,6 @@ class TaskService:
                 id=task_id,
                 name=task_name
             )
-            self._add_task_to_db(task_func, run_date, task_id, task_name)
         except Exception as e:
             logger.error(f"调度任务失败: {str(e)}")
             raise
@@ -108,6 +113,9 @@ class TaskService:
         """立即执行一个任务"""
         try:
             run_date = datetime.now()
+            # 先写入任务记录，避免任务立即执行时状态更新找不到记录
+            self._add_task_to_db(task_func, run_date, task_id, task_name)
+            ProgressService.get_instance().publish(task_id, 'queued', message=task_name, user_id=get_user_id())
             wrapped_func = self._task_wrapper(task_func, task_id)
             self.scheduler.add_job(
                 wrapped_func,
@@ -116,16 +124,44 @@ class TaskService:
                 id=task_id,
                 name=task_name
             )
-            self._add_task_to_db(task_func, run_date, task_id, task_name)
         except Exception as e:
             logger.error(f"立即执行任务失败: {str(e)}")
             raise
 
+    def add_interval_job(self, job_func: Callable, seconds: int, job_id: str, job_name: str, start_delay: int = 0):
+        """
+        添加周期执行的维护任务（如产物回收），不写入任务表，也不发布进度
+
+        上一次未执行完时跳过本次，错过的多次执行合并为一次
+
+        :param job_func: 任务函数
+        :param seconds: 执行间隔（秒）
+        :param job_id: 任务ID，重复添加时替换
+        :param job_name: 任务名称
+        :param start_delay: 首次执行前的延迟（秒），避开启动时的模型加载
+        """
+        try:
+            self.scheduler.add_job(
+                job_func,
+                'interval',
+                seconds=seconds,
+                next_run_time=datetime.now() + timedelta(seconds=start_delay),
+                id=job_id,
+                name=job_name,
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+        except Exception as e:
+            logger.error(f"添加周期任务失败: {str(e)}")
+            raise
+
     def remove_task(self, task_id: str):
         """从调度器中移除指定的任务"""
         try:
             self.scheduler.remove_job(task_id)
             self._update_task_status(task_id, 3, "任务被取消")  # 3 表示取消执行
+            ProgressService.get_instance().publish(task_id, 'finished', message="任务被取消", status='cancelled')
         except Exception as e:
             logger.error(f"移除任务失败: {str(e)}")
             raise
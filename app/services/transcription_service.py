@@ -1,16 +1,13 @@
 import logging
 import os
-import torch
-from faster_whisper import WhisperModel
 import srt
 from datetime import timedelta
-from PIL import ImageFont
 import re
 import math
+import threading
+from concurrent.futures import Future
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO) 
 
 
 def singleton(cls):
@@ -26,6 +23,10 @@ def singleton(cls):
 @singleton
 class TranscriptionService:
     def __init__(self, model_size=None):
+        # torch / faster_whisper 体积大、导入慢，只在首次创建服务时导入，不拖慢仅处理增删改查的进程
+        import torch
+        from faster_whisper import WhisperModel
+
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.compute_type = "float16" if self.device == "cuda" else "int8"
         
@@ -37,6 +38,12 @@ class TranscriptionService:
         logger.info(f"使用设备: {self.device}, 计算类型: {self.compute_type}, 模型大小: {self.model_size}")
         
         self.model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+        # 同一音频的分句结果缓存，批量生成多个字幕样式时只转录一次
+        self._split_cache = {}
+        self._split_cache_size = 16
+        # 正在转录的请求，相同参数的并发请求等待同一次转录结果；锁只保护缓存和该字典，不包住转录本身
+        self._split_inflight = {}
+        self._split_lock = threading.Lock()
         # self.model = WhisperModel(self.model_size, device="cpu", compute_type="int8")
 
         logger.info(f"转录服务初始化完成,用模型: {self.model_size}")
@@ -67,6 +74,35 @@ class TranscriptionService:
         :param prompt_text: 提示文本
         :return: 包含分割后片段的列表,每个片段包含开始时间、结束时间和文本
         """
+        cache_key = (os.path.abspath(str(audio_file)), os.path.getmtime(audio_file), max_chars_per_segment, prompt_text)
+        with self._split_lock:
+            if cache_key in self._split_cache:
+                logger.info(f"使用缓存的转录结果: {audio_file}")
+                return list(self._split_cache[cache_key])
+            future = self._split_inflight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = self._split_inflight[cache_key] = Future()
+        if not owner:
+            logger.info(f"等待进行中的转录结果: {audio_file}")
+            return list(future.result())
+
+        try:
+            split_segments = self._transcribe_and_split(audio_file, max_chars_per_segment, prompt_text)
+        except Exception as e:
+            with self._split_lock:
+                self._split_inflight.pop(cache_key, None)
+            future.set_exception(e)
+            raise
+        with self._split_lock:
+            if len(self._split_cache) >= self._split_cache_size:
+                self._split_cache.pop(next(iter(self._split_cache)))
+            self._split_cache[cache_key] = split_segments
+            self._split_inflight.pop(cache_key, None)
+        future.set_result(split_segments)
+        return list(split_segments)
+
+    def _transcribe_and_split(self, audio_file, max_chars_per_segment=10, prompt_text=None):
         logger.info(f"每个片段的最大字符数: {max_chars_per_segment}")
         initial_prompt = "请使用简体中文转录以下音频内容，要求：\n" \
                          "1. 保持语言表达自然流畅\n" \
@@ -98,8 +134,8 @@ class TranscriptionService:
             start = f"{int(segment.start // 60):02d}:{segment.start % 60:05.2f}"
             end = f"{int(segment.end // 60):02d}:{segment.end % 60:05.2f}"
             
-            # 打印带时间戳的字幕
-            print(f"[{start} -> {end}] {segment.text}")
+            # 逐句记录带时间戳的字幕（DEBUG 级别，默认不输出）
+            logger.debug(f"[{start} -> {end}] {segment.text}")
             current_text = ""
             current_words = []
             
@@ -107,9 +143,6 @@ class TranscriptionService:
             if segment.words:
                 for word in segment.words:
 
-                    word_start = f"{int(word.start // 60):02d}:{word.start % 60:05.2f}"
-                    word_end = f"{int(word.end // 60):02d}:{word.end % 60:05.2f}"
-                    print(f"    {word.word}: [{word_start} -> {word_end}]")
                     # 检查词级时间戳是否在有效范围内
                     if word.start >= last_end_time and word.end <= segment.end:
 
@@ -391,6 +424,7 @@ class TranscriptionService:
         max_width = resolution[1] - margin_r - margin_l
         logger.info(f"字体展示宽度: {max_width}")
         try:
+            from PIL import ImageFont
             font = ImageFont.truetype(font_file, font_size)
             char_width = font.getbbox('好')[2]  # 使用 getbbox 获取字符宽度
             logger.info(f"字体宽度: {char_width}")
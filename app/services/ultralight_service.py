@@ -1,25 +1,48 @@
+import hashlib
+import json
+import shutil
+import shlex
 import subprocess
 from pathlib import Path
 import os
-from dotenv import load_dotenv
+import threading
+import time
 from datetime import datetime
 import uuid
 from typing import Union  # 添加这个导入
 import logging
+from app.config import Settings, get_settings
+from app.services.progress_service import report_progress, watch_progress_files
+from app.utils import gpu_utils
+from app.utils.logger_utils import subprocess_env
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+
+# 本进程启动的实时流：{stream_id: {'process': 推理进程, 'decoder': 音频解码进程, ...}}
+_streams = {}
+_streams_lock = threading.Lock()
 
 
 class UltralightService:
     """Ultralight数字人服务类,用于训练和生成数字人视频。"""
 
-    def __init__(self):
+    def __init__(self, settings: Settings = None):
         """初始化UltralightService"""
-        load_dotenv()
-        project_root = Path(os.getenv("PROJECT_ROOT"))
+        settings = settings or get_settings()
+        project_root = settings.project_root
+        self.project_root = project_root
         self.base_path = project_root / 'external_modules' / 'ultralight'
-        self.conda_env = os.getenv("ULTRALIGHT_CONDA_ENV", "dh")  # 从环境变量读取，默认值为 "ultralight"
+        self.conda_env = settings.ultralight_conda_env  # 从环境变量读取，默认值为 "ultralight"
+        # 分片渲染的进程数，0 表示根据CPU核数自动计算
+        self.render_workers = settings.ultralight_render_workers
+        # 每个分片进程的torch线程数
+        self.render_threads = settings.ultralight_render_threads
+        # 每个分片的最少帧数，过短的视频不分片
+        self.min_shard_frames = settings.ultralight_min_shard_frames
+        # 只渲染嘴部补丁并叠加到预编码的待机循环上
+        self.patch_composite = settings.ultralight_patch_composite
+        # 音频特征缓存目录
+        self.feature_cache_dir = project_root / 'data' / 'cache' / 'features'
         logger.info("UltralightService初始化完成，基础路径: %s，Conda环境: %s", self.base_path, self.conda_env)
 
 
@@ -27,9 +50,54 @@ class UltralightService:
         """在指定的Conda环境中运行命令。"""
         full_command = f"conda run -n {self.conda_env} {command}"
         logger.info("运行命令: %s", full_command)
-        subprocess.run(full_command, shell=True, check=True, cwd=str(self.base_path))
+        subprocess.run(full_command, shell=True, check=True, cwd=str(self.base_path), env=subprocess_env())
+
+    def run_commands_parallel(self, commands, threads: int = 0):
+        """在指定的Conda环境中并行运行多条命令，任一命令失败则抛出异常。"""
+        env = subprocess_env()
+        if threads > 0:
+            env["OMP_NUM_THREADS"] = str(threads)
+            env["MKL_NUM_THREADS"] = str(threads)
+
+        processes = []
+        for command in commands:
+            full_command = f"conda run -n {self.conda_env} {command}"
+            logger.info("并行运行命令: %s", full_command)
+            processes.append((full_command, subprocess.Popen(full_command, shell=True, cwd=str(self.base_path), env=env)))
+
+        failed = None
+        for full_command, process in processes:
+            if process.wait() != 0 and failed is None:
+                failed = subprocess.CalledProcessError(process.returncode, full_command)
+        if failed:
+            raise failed
+
+    def plan_shards(self, frame_count: int):
+        """
+        将渲染帧拆分为连续的帧区间。
+
+        参数:
+            frame_count: 总帧数
+
+        返回:
+            list: [(start_frame, end_frame), ...]
 
-    def train(self, video_path: str, avatar_dir: str, asr_type: str = "hubert", use_syncnet: bool = True):
+        异常:
+            ValueError: 没有可渲染的帧（音频为空或过短）
+        """
+        if frame_count <= 0:
+            raise ValueError(f"没有可渲染的帧（帧数 {frame_count}），请检查音频是否为空或过短")
+        workers = self.render_workers
+        if workers <= 0:
+            # GPU 上多进程会争抢显存，只在CPU节点自动分片
+            workers = 1 if gpu_utils.check_gpu_available() else max(1, (os.cpu_count() or 1) // max(self.render_threads, 1))
+        workers = max(1, min(workers, frame_count // max(self.min_shard_frames, 1)))
+
+        shard_size = -(-frame_count // workers)
+        return [(start, min(start + shard_size, frame_count)) for start in range(0, frame_count, shard_size)]
+
+    def train(self, video_path: str, avatar_dir: str, asr_type: str = "hubert", use_syncnet: bool = True,
+              source: str = None):
         """
         训练数字人模型。
 
@@ -38,6 +106,8 @@ class UltralightService:
             avatar_dir: 数字人目录路径
             asr_type: 音频特征提取器类型,可选"hubert"或"wenet"b不是不用
             use_syncnet: 是否使用syncnet预训练
+            source: 训练素材的本地路径或URL。传入时预处理直接从素材解码并按帧率重采样写入 video_path，
+                    远程素材以流的方式读取，不再先下载、复制出完整的原始视频
 
         返回:
             tuple: (best_checkpoint_path, avatar_dir) - 最佳模型文件路径和数据目录路径
@@ -55,10 +125,20 @@ class UltralightService:
         # 预处理数据
         # 根据asr类型设置不同的帧率
         fps = "20" if asr_type == "wenet" else "25"
-        self.run_command(f"ffmpeg -i {video_path} -r {fps} -y {video_path}_tmp.mp4")
-        subprocess.run(f"conda run -n {self.conda_env} python process.py {video_path}_tmp.mp4 --asr {asr_type}", shell=True, check=True, cwd=str(self.base_path / 'data_utils'))
-        os.remove(f"{video_path}_tmp.mp4")
-        logger.info("临时视频文件已删除: %s_tmp.mp4", video_path)
+        if source:
+            # 远程素材断线时自动重连，预签名URL中的 & 需要转义
+            reconnect = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 10 " if str(source).startswith('http') else ""
+            self.run_command(f"ffmpeg {reconnect}-i {shlex.quote(str(source))} -r {fps} -y {video_path}")
+            subprocess.run(f"conda run -n {self.conda_env} python process.py {video_path} --asr {asr_type}", shell=True, check=True, cwd=str(self.base_path / 'data_utils'))
+        else:
+            self.run_command(f"ffmpeg -i {video_path} -r {fps} -y {video_path}_tmp.mp4")
+            subprocess.run(f"conda run -n {self.conda_env} python process.py {video_path}_tmp.mp4 --asr {asr_type}", shell=True, check=True, cwd=str(self.base_path / 'data_utils'))
+            os.remove(f"{video_path}_tmp.mp4")
+            logger.info("临时视频文件已删除: %s_tmp.mp4", video_path)
+        self.pack_avatars([avatar_dir])
+        self.ensure_alpha_matte(avatar_dir)
+        if self.patch_composite:
+            self.ensure_idle_loop(avatar_dir, int(fps))
 
         # 2. 训练syncnet(如果启用)
         if use_syncnet:
@@ -99,6 +179,114 @@ class UltralightService:
         # 只返回checkpoint路径，不返回avatar_dir
         return best_checkpoint_path
 
+    def pack_avatars(self, avatar_dirs, remove_source: bool = True):
+        """
+        将数字人的逐帧图片和关键点打包为单个帧容器，已打包的目录会被跳过。
+
+        参数:
+            avatar_dirs: 数字人目录路径列表
+            remove_source: 打包后是否删除 full_body_img/ 和 landmarks/ 下的小文件
+        """
+        dirs = ' '.join(Path(avatar_dir).as_posix() for avatar_dir in avatar_dirs)
+        if not dirs:
+            return
+        pack_cmd = f"python data_utils/avatar_pack.py {dirs}"
+        if remove_source:
+            pack_cmd += " --remove_source"
+        self.run_command(pack_cmd)
+        logger.info("数字人帧打包完成: %s", dirs)
+
+    def pack_existing_avatars(self, avatars_root: Union[str, Path], remove_source: bool = True):
+        """
+        转换已有数字人目录为打包格式。
+
+        参数:
+            avatars_root: 数字人根目录，如 data/avatar 或 data/public/avatar
+            remove_source: 打包后是否删除原始小文件
+        """
+        avatar_dirs = [path for path in Path(avatars_root).iterdir()
+                       if (path / 'full_body_img').is_dir()]
+        logger.info("待打包的数字人目录数量: %d", len(avatar_dirs))
+        self.pack_avatars(avatar_dirs, remove_source)
+        return avatar_dirs
+
+    def ensure_idle_loop(self, avatar_dir: Union[str, Path], fps: int = 25) -> Path:
+        """
+        确保数字人的待机循环视频已预编码，不存在时生成
+
+        参数:
+            avatar_dir: 数字人目录
+            fps: 帧率，需与推理帧率一致
+
+        返回:
+            Path: 待机循环视频路径
+        """
+        idle_loop_path = Path(avatar_dir) / f"idle_loop_{fps}.mp4"
+        idle_alpha_path = Path(avatar_dir) / f"idle_alpha_{fps}.mp4"
+        has_alpha = (Path(avatar_dir) / 'alpha_index.npy').exists()
+        if not idle_loop_path.exists() or (has_alpha and not idle_alpha_path.exists()):
+            logger.info("预编码待机循环视频: %s", idle_loop_path)
+            self.run_command(f"python data_utils/idle_loop.py {Path(avatar_dir).as_posix()} --fps {fps}")
+        return idle_loop_path
+
+    def ensure_alpha_matte(self, avatar_dir: Union[str, Path]) -> bool:
+        """
+        绿幕数字人计算全部训练帧的alpha并与帧容器一起保存，每个数字人只计算一次
+
+        参数:
+            avatar_dir: 数字人目录（需已打包）
+
+        返回:
+            bool: 是否为绿幕数字人
+        """
+        alpha_index_path = Path(avatar_dir) / 'alpha_index.npy'
+        if not alpha_index_path.exists():
+            logger.info("计算数字人alpha: %s", avatar_dir)
+            self.run_command(f"python data_utils/alpha_matte.py {Path(avatar_dir).as_posix()}")
+        return alpha_index_path.exists()
+
+    def export_no_green(self, avatar_dir: Union[str, Path], video_path: Union[str, Path],
+                        cover_path: Union[str, Path], fps: int = 25) -> bool:
+        """
+        导出去除绿幕后的透明视频(webm)和第一帧透明PNG
+
+        参数:
+            avatar_dir: 数字人目录
+            video_path: 透明视频输出路径
+            cover_path: 透明封面输出路径
+            fps: 帧率
+
+        返回:
+            bool: 是否为绿幕数字人，不是时不导出
+        """
+        if not self.ensure_alpha_matte(avatar_dir):
+            return False
+        self.run_command(f"python data_utils/alpha_matte.py {Path(avatar_dir).as_posix()} "
+                         f"--export_video {Path(video_path).as_posix()} --export_cover {Path(cover_path).as_posix()} --fps {fps}")
+        return True
+
+    def get_alpha_loop(self, human_id: str, is_public: bool, fps: int = 25) -> Union[Path, None]:
+        """
+        获取数字人的alpha循环视频，与渲染输出逐帧对齐（同为来回播放顺序，从第0帧开始）
+
+        参数:
+            human_id: 数字人ID
+            is_public: 是否为公共数字人
+            fps: 帧率
+
+        返回:
+            Path | None: alpha循环视频路径，非绿幕数字人返回None
+        """
+        project_root = self.project_root
+        if is_public:
+            avatar_dir = project_root / 'data' / 'public' / 'avatar' / human_id
+        else:
+            avatar_dir = project_root / 'data' / 'avatar' / human_id
+        if not (avatar_dir / 'alpha_index.npy').exists():
+            return None
+        self.ensure_idle_loop(avatar_dir, fps)
+        return avatar_dir / f"idle_alpha_{fps}.mp4"
+
     def get_best_checkpoint(self, checkpoint_dir: Path) -> Path:
         """
         获取checkpoint目录中最后一个checkpoint文件作为最佳模型。
@@ -137,7 +325,8 @@ class UltralightService:
         return best_path
 
     def generate_video(self, audio_path: str, avatar_dir: str, checkpoint_path: str, 
-                      output_path: Union[str, Path], asr_type: str = "hubert"):
+                      output_path: Union[str, Path], asr_type: str = "hubert",
+                      feature_audio_path: Union[str, Path, None] = None, use_vad: bool = True):
         """
         生成数字人视频。
 
@@ -147,6 +336,8 @@ class UltralightService:
             checkpoint_path: 训练好的模型路径
             output_path: 指定输出视频的路径（字符串或Path对象）
             asr_type: 音频特征提取器类型
+            feature_audio_path: 已重采样为16kHz的特征提取音频，为None时使用audio_path
+            use_vad: 是否开启静音检测，静音帧跳过UNet推理
         
         返回:
             Path: 生成的视频文件路径
@@ -171,17 +362,37 @@ class UltralightService:
         output_path_str = output_path.as_posix()
 
         # 1. 提取音频特征
+        feature_audio_path = Path(feature_audio_path).as_posix() if feature_audio_path else audio_path
         if asr_type == "hubert":
             logger.info("使用hubert提取音频特征")
-            feature_cmd = f"python data_utils/hubert.py --wav {audio_path}"
-            feat_path = str(Path(audio_path).parent / f"{Path(audio_path).stem}_hu.npy")
+            feature_cmd = f"python data_utils/hubert.py --wav {feature_audio_path}"
+            feat_path = str(Path(feature_audio_path).parent / f"{Path(feature_audio_path).stem}_hu.npy")
         else:
             logger.info("使用hubert提取音频特征")
-            feature_cmd = f"python data_utils/wenet_infer.py {audio_path}"
-            feat_path = str(Path(audio_path).parent / f"{Path(audio_path).stem}_wenet.npy")
+            feature_cmd = f"python data_utils/wenet_infer.py {feature_audio_path}"
+            feat_path = str(Path(feature_audio_path).parent / f"{Path(feature_audio_path).stem}_wenet.npy")
                 
-        logger.info("生成人物：提取音频：执行命令:: %s", feature_cmd)
-        self.run_command(feature_cmd)
+        # 相同音频的特征按内容哈希缓存，预览、重试和批量生成时不再重复提取
+        with open(feature_audio_path, 'rb') as f:
+            audio_hash = hashlib.sha1(f.read()).hexdigest()
+        cached_feat_path = self.feature_cache_dir / f"{audio_hash}_{asr_type}.npy"
+        try:
+            shutil.copy2(cached_feat_path, feat_path)
+            # 刷新修改时间，产物回收按最近使用时间淘汰缓存
+            cached_feat_path.touch()
+            cache_hit = True
+            logger.info("命中音频特征缓存: %s", cached_feat_path)
+        except FileNotFoundError:
+            # 未命中，或刚被产物回收删除
+            cache_hit = False
+        if not cache_hit:
+            logger.info("生成人物：提取音频：执行命令:: %s", feature_cmd)
+            report_progress('features')
+            self.run_command(feature_cmd)
+            self.feature_cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_feat_path = cached_feat_path.with_name(f"{cached_feat_path.stem}.{uuid.uuid4().hex}.tmp")
+            shutil.copy2(feat_path, temp_feat_path)
+            os.replace(temp_feat_path, cached_feat_path)
         logger.info("音频特征提取完成，保存路径: %s", feat_path)
 
         # 2. 生成视频
@@ -189,28 +400,72 @@ class UltralightService:
                        f"--asr {asr_type} "
                        f"--dataset {avatar_dir} "
                        f"--audio_feat {feat_path} "
-                       f"--save_path {temp_output_str} "
                        f"--checkpoint {checkpoint_path}")
-
-        logger.info("生成人物：推理视频：执行命令: %s", generate_cmd)
-        self.run_command(generate_cmd)
-        logger.info("视频生成到临时文件: %s", temp_output_str)
+        if use_vad:
+            generate_cmd += f" --vad --audio_wav {feature_audio_path}"
+        fps = 20 if asr_type == "wenet" else 25
+        idle_loop_path = self.ensure_idle_loop(avatar_dir, fps) if self.patch_composite else None
+        if idle_loop_path:
+            generate_cmd += " --patch_only"
+
+        import numpy as np
+        frame_count = np.load(feat_path, mmap_mode='r').shape[0]
+        shards = self.plan_shards(frame_count)
+        # 每个渲染进程定期写入已渲染帧数，任务中汇总上报为 render 阶段进度
+        progress_paths = [(output_dir / f"temp_{uuid.uuid4()}_{index}.progress").as_posix() for index in range(len(shards))]
+        report_progress('render', 0, frame_count)
+        if len(shards) == 1:
+            logger.info("生成人物：推理视频：执行命令: %s", generate_cmd)
+            with watch_progress_files('render', progress_paths, frame_count):
+                self.run_command(f"{generate_cmd} --save_path {temp_output_str} --progress_path {progress_paths[0]}")
+            temp_outputs = [temp_output]
+            video_input = f"-i {temp_output_str}"
+        else:
+            # 每一帧只依赖其音频特征窗口和来回播放的帧序号，可按帧区间拆分到多个进程渲染
+            logger.info("生成人物：分片推理视频，共 %d 帧，分片: %s", frame_count, shards)
+            temp_outputs = [output_dir / f"temp_{uuid.uuid4()}_{index}.mp4" for index in range(len(shards))]
+            shard_cmds = [f"{generate_cmd} --save_path {shard_output.as_posix()} "
+                          f"--start_frame {start} --end_frame {end} --threads {self.render_threads} "
+                          f"--progress_path {progress_path}"
+                          for shard_output, (start, end), progress_path in zip(temp_outputs, shards, progress_paths)]
+            with watch_progress_files('render', progress_paths, frame_count):
+                self.run_commands_parallel(shard_cmds, self.render_threads)
+
+            # 使用concat demuxer无损拼接各分片
+            concat_list = output_dir / f"temp_{uuid.uuid4()}.txt"
+            concat_list.write_text(''.join(f"file '{shard_output.as_posix()}'\n" for shard_output in temp_outputs), encoding='utf-8')
+            temp_outputs.append(concat_list)
+            video_input = f"-f concat -safe 0 -i {concat_list.as_posix()}"
+        logger.info("视频生成到临时文件: %s", [str(path) for path in temp_outputs])
 
         # 3. 合并音视频
-        merge_cmd = f"ffmpeg -y -i {temp_output_str} -i {audio_path} -c:v libx264 -c:a aac {output_path_str}"
+        report_progress('render', frame_count, frame_count)
+        report_progress('merge')
+        if idle_loop_path:
+            # 嘴部补丁叠加到循环播放的待机视频上，两者帧序号一致，补丁位置固定
+            box_paths = [path.with_suffix('.json') for path in temp_outputs if path.suffix == '.mp4']
+            temp_outputs.extend(box_paths)
+            box = json.loads(box_paths[0].read_text(encoding='utf-8'))
+            merge_cmd = (f"ffmpeg -y -stream_loop -1 -i {Path(idle_loop_path).as_posix()} {video_input} -i {audio_path} "
+                         f"-filter_complex \"[0:v][1:v]overlay={box['x']}:{box['y']}:shortest=1[v]\" "
+                         f"-map \"[v]\" -map 2:a -c:v libx264 -c:a aac {output_path_str}")
+        else:
+            merge_cmd = f"ffmpeg -y {video_input} -i {audio_path} -c:v libx264 -c:a aac {output_path_str}"
         subprocess.run(merge_cmd, shell=True, check=True)
         logger.info("音视频合并完成，输出路径: %s", output_path_str)
 
         
         # 4. 删除临时文件
-        if temp_output.exists():
-            temp_output.unlink()
-            logger.info("临时文件已删除: %s", temp_output)
+        for temp_path in temp_outputs:
+            if temp_path.exists():
+                temp_path.unlink()
+                logger.info("临时文件已删除: %s", temp_path)
 
         
         return output_path
 
-    def generate_video_by_human_id(self, audio_path: str, human_id: str, output_path: str, is_public: int) -> Path:
+    def generate_video_by_human_id(self, audio_path: str, human_id: str, output_path: str, is_public: int,
+                                   feature_audio_path: Union[str, Path, None] = None) -> Path:
         """根据human_id生成视频
 
         参数:
@@ -218,12 +473,12 @@ class UltralightService:
             human_id: 数字人ID
             output_path: 输出视频路径
             is_public: 是否为公共数字人
+            feature_audio_path: 16kHz特征提取音频路径
 
         返回:
             Path: 生成的视频文件路径
         """
-        load_dotenv()
-        project_root = Path(os.getenv("PROJECT_ROOT"))
+        project_root = self.project_root
         if is_public:
             avatar_dir = project_root / 'data' / (Path('public') / 'avatar') / human_id
         else:
@@ -239,5 +494,141 @@ class UltralightService:
             avatar_dir=str(avatar_dir),
             checkpoint_path=str(checkpoint_path),  # 确保转换为字符串
             output_path=output_path,
-            asr_type='hubert'
-        )
\ No newline at end of file
+            asr_type='hubert',
+            feature_audio_path=feature_audio_path
+        )
+
+    def start_stream(self, human_id: str, output: str, is_public: bool = False,
+                     audio_wav: Union[str, Path, None] = None, realtime: bool = True,
+                     checkpoint_path: Union[str, Path, None] = None,
+                     metrics_path: Union[str, Path, None] = None,
+                     asr_type: str = "hubert", stdin=None) -> subprocess.Popen:
+        """启动实时流式数字人进程
+
+        参数:
+            human_id: 数字人ID
+            output: 推流地址(rtmp://...)、本地文件路径，或 "-" 表示输出mpegts到进程标准输出
+            is_public: 是否为公共数字人
+            audio_wav: 16kHz单声道驱动音频，为None时从进程标准输入读取s16le PCM
+            realtime: 按音频实际时长节奏读取audio_wav
+            checkpoint_path: 模型路径，默认使用数字人目录下的 checkpoint/best.pth
+            metrics_path: 结束时写入延迟统计的JSON路径
+            asr_type: 模型训练时使用的音频特征，训练流程默认 hubert（25fps）；wenet（20fps）需使用 wenet 特征训练的模型
+            stdin: 未传 audio_wav 时作为进程标准输入的文件对象，默认创建管道由调用方写入
+
+        返回:
+            subprocess.Popen: 流式进程，调用方负责写入音频/读取输出并等待结束
+        """
+        avatar_dir = self.get_avatar_dir(human_id, is_public)
+        checkpoint_path = Path(checkpoint_path) if checkpoint_path else avatar_dir / 'checkpoint' / 'best.pth'
+        if not checkpoint_path.exists():
+            raise FileNotFoundError(f"找不到模型文件: {checkpoint_path}")
+
+        command = ["conda", "run", "--no-capture-output", "-n", self.conda_env,
+                   "python", "stream_inference.py",
+                   "--dataset", avatar_dir.as_posix(),
+                   "--checkpoint", checkpoint_path.as_posix(),
+                   "--asr", asr_type,
+                   "--output", output,
+                   "--threads", str(self.render_threads)]
+        if audio_wav:
+            command += ["--audio_wav", Path(audio_wav).as_posix()]
+            if realtime:
+                command.append("--realtime")
+        else:
+            command.append("--pcm_stdin")
+        if metrics_path:
+            command += ["--metrics_path", Path(metrics_path).as_posix()]
+
+        logger.info("启动实时流式数字人: %s", " ".join(command))
+        return subprocess.Popen(command, cwd=str(self.base_path), env=subprocess_env(),
+                                stdin=None if audio_wav else (stdin or subprocess.PIPE),
+                                stdout=subprocess.PIPE if output == "-" else None)
+
+    def get_avatar_dir(self, human_id: str, is_public: bool) -> Path:
+        """数字人模型目录"""
+        if is_public:
+            return self.project_root / 'data' / 'public' / 'avatar' / human_id
+        return self.project_root / 'data' / 'avatar' / human_id
+
+    def stream_audio(self, human_id: str, is_public: bool, audio_source: str, output: str,
+                     metrics_path: Union[str, Path, None] = None) -> str:
+        """用一段音频驱动数字人实时推流
+
+        ffmpeg 按实际时长（-re）将任意格式的音频文件或URL解码为16kHz单声道PCM，经管道送入流式进程
+
+        参数:
+            human_id: 数字人ID
+            is_public: 是否为公共数字人
+            audio_source: 驱动音频的本地路径或URL
+            output: 推流地址或本地文件路径
+            metrics_path: 结束时写入延迟统计的JSON路径
+
+        返回:
+            str: 流ID，用于查询和停止
+        """
+        decoder = subprocess.Popen(["ffmpeg", "-loglevel", "error", "-re", "-i", str(audio_source),
+                                    "-f", "s16le", "-ac", "1", "-ar", "16000", "pipe:1"],
+                                   stdout=subprocess.PIPE)
+        try:
+            process = self.start_stream(human_id, output, is_public, metrics_path=metrics_path, stdin=decoder.stdout)
+        except Exception:
+            decoder.kill()
+            raise
+        finally:
+            # 管道由推理进程读取，父进程不再持有
+            decoder.stdout.close()
+
+        stream_id = uuid.uuid4().hex
+        with _streams_lock:
+            # 已结束的流只保留到下一次启动，记录不随推流次数增长
+            for finished_id in [key for key, value in _streams.items() if value['process'].poll() is not None]:
+                del _streams[finished_id]
+            _streams[stream_id] = {'process': process, 'decoder': decoder, 'human_id': human_id,
+                                   'output': output, 'started_at': time.time(), 'metrics_path': metrics_path}
+        logger.info("实时流已启动: %s -> %s", stream_id, output)
+        return stream_id
+
+    @staticmethod
+    def stream_status(stream_id: str) -> Union[dict, None]:
+        """查询实时流状态，流不存在时返回None"""
+        with _streams_lock:
+            stream = _streams.get(stream_id)
+        if not stream:
+            return None
+        returncode = stream['process'].poll()
+        status = {
+            'stream_id': stream_id,
+            'human_id': stream['human_id'],
+            'output': stream['output'],
+            'running': returncode is None,
+            'returncode': returncode,
+            'duration_s': round(time.time() - stream['started_at'], 1),
+        }
+        metrics_path = stream['metrics_path']
+        if returncode is not None and metrics_path and Path(metrics_path).exists():
+            status['metrics'] = json.loads(Path(metrics_path).read_text())
+        return status
+
+    @staticmethod
+    def stop_stream(stream_id: str) -> bool:
+        """停止实时流并移除记录，流不存在时返回False"""
+        with _streams_lock:
+            stream = _streams.pop(stream_id, None)
+        if not stream:
+            return False
+        # 先停止音频解码，推理进程读到输入结束后输出剩余帧并正常退出，超时再强制结束
+        decoder, process = stream['decoder'], stream['process']
+        if decoder.poll() is None:
+            decoder.terminate()
+        for action in (None, process.terminate, process.kill):
+            if action:
+                action()
+            try:
+                process.wait(timeout=10)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+        decoder.wait()
+        logger.info("实时流已停止: %s", stream_id)
+        return True
@@ -1,32 +1,154 @@
-from dotenv import load_dotenv
-import boto3
-import os
-from botocore.config import Config
-
-# 加载 .env 文件
-load_dotenv()
-
-# 从环境变量中获取配置
-endpoint = os.getenv('OSS_ENDPOINT')
-access_key_id = os.getenv('OSS_ACCESS_KEY_ID')
-secret_access_key = os.getenv('OSS_SECRET_ACCESS_KEY')
-bucket_name = os.getenv('OSS_BUCKET_NAME')
-
-# 打印以验证加载的值（仅用于调试，生产环境中请移除）
-print(f"Endpoint: {endpoint}")
-print(f"Access Key ID: {access_key_id}")
-print(f"Secret Access Key: {secret_access_key}")
-print(f"bucket_name: {bucket_name}")
-
-# 创建S3客户端
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=access_key_id,
-    aws_secret_access_key=secret_access_key,
-    endpoint_url=endpoint,
-    config=Config(s3={"addressing_style": "virtual"},
-                  signature_version='v4')
-)
+import logging
+import math
+import mimetypes
+import threading
+from urllib.parse import quote, unquote, urlparse
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    获取S3客户端，首次调用时才导入 boto3 并创建，API进程启动时不再加载
+
+    :return: boto3 S3 客户端
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+
+                settings = get_settings()
+                # 预签名和成片发布共用同一个客户端，连接池按分片并发上传的连接数设置
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=settings.oss_access_key_id,
+                    aws_secret_access_key=settings.oss_secret_access_key,
+                    endpoint_url=settings.oss_endpoint,
+                    region_name=settings.oss_region,
+                    config=Config(s3={"addressing_style": settings.oss_addressing_style},
+                                  signature_version='v4',
+                                  max_pool_connections=settings.oss_max_pool_connections)
+                )
+    return _s3_client
+
+
+# S3 分片上传的限制：除最后一片外每片不小于 5MB，最多 10000 片
+MIN_PART_SIZE = 5 * 1024 ** 2
+MAX_PARTS = 10000
+
+
+def object_url(key: str, settings: Settings = None) -> str:
+    """
+    对象的对外访问URL，配置了 OSS_PUBLIC_BASE_URL 时使用该前缀，否则按 endpoint 和 bucket 拼接
+
+    :param key: 对象键
+    :param settings: 配置，默认使用全局配置
+    :return: URL
+    """
+    settings = settings or get_settings()
+    key = quote(key)
+    if settings.oss_public_base_url:
+        return f"{settings.oss_public_base_url.rstrip('/')}/{key}"
+    endpoint = urlparse(settings.oss_endpoint)
+    if settings.oss_addressing_style == 'path':
+        return f"{endpoint.scheme}://{endpoint.netloc}/{settings.oss_bucket_name}/{key}"
+    return f"{endpoint.scheme}://{settings.oss_bucket_name}.{endpoint.netloc}/{key}"
+
+
+def object_key_from_url(url: str, settings: Settings = None):
+    """
+    从本存储桶的对象URL中解析对象键（object_url 的逆操作），其他URL返回None
+
+    :param url: 对象URL
+    :param settings: 配置，默认使用全局配置
+    :return: 对象键或None
+    """
+    settings = settings or get_settings()
+    if not url or not settings.oss_bucket_name or not settings.oss_endpoint:
+        return None
+    endpoint = urlparse(settings.oss_endpoint)
+    prefixes = [
+        f"{endpoint.netloc}/{settings.oss_bucket_name}/",
+        f"{settings.oss_bucket_name}.{endpoint.netloc}/",
+    ]
+    if settings.oss_public_base_url:
+        public = urlparse(settings.oss_public_base_url)
+        prefixes.insert(0, f"{public.netloc}{public.path.rstrip('/')}/")
+    parsed = urlparse(url)
+    location = f"{parsed.netloc}{parsed.path}"
+    for prefix in prefixes:
+        if location.startswith(prefix) and len(location) > len(prefix):
+            return unquote(location[len(prefix):])
+    return None
+
+
+def generate_presigned_get_url(object_name, expiration=3600):
+    """
+    生成用于读取对象的预签名URL，私有存储桶中的对象也可由 ffmpeg 等直接通过 HTTP 读取
+
+    :param object_name: 对象名称
+    :param expiration: URL的有效期（秒）
+    :return: 预签名的URL
+    """
+    return get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': get_settings().oss_bucket_name, 'Key': object_name},
+        ExpiresIn=expiration
+    )
+
+
+def get_object_size(object_name) -> int:
+    """
+    对象大小（字节）
+
+    :param object_name: 对象名称
+    :return: 字节数
+    """
+    response = get_s3_client().head_object(Bucket=get_settings().oss_bucket_name, Key=object_name)
+    return response['ContentLength']
+
+def list_object_keys(prefix: str) -> list:
+    """
+    列出前缀下的全部对象键
+
+    :param prefix: 对象键前缀
+    :return: 对象键列表
+    """
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    keys = []
+    for page in paginator.paginate(Bucket=get_settings().oss_bucket_name, Prefix=prefix):
+        keys.extend(item['Key'] for item in page.get('Contents', []))
+    return keys
+
+
+def delete_objects(object_names) -> int:
+    """
+    批量删除对象，每次请求最多1000个
+
+    :param object_names: 对象名称列表
+    :return: 删除的对象数
+    """
+    client = get_s3_client()
+    bucket_name = get_settings().oss_bucket_name
+    object_names = list(object_names)
+    deleted = 0
+    for start in range(0, len(object_names), 1000):
+        batch = object_names[start:start + 1000]
+        response = client.delete_objects(Bucket=bucket_name,
+                                         Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.error(f"删除对象失败: {error.get('Key')}, {error.get('Message')}")
+        deleted += len(batch) - len(errors)
+    return deleted
 
 def generate_presigned_url(object_name, expiration=3600):
     """
@@ -38,8 +160,8 @@ def generate_presigned_url(object_name, expiration=3600):
     :return: 预签名的URL
     """
     try:
-        bucket_name = os.getenv('OSS_BUCKET_NAME')
-        presigned_url = s3.generate_presigned_url(
+        bucket_name = get_settings().oss_bucket_name
+        presigned_url = get_s3_client().generate_presigned_url(
             'put_object',
             Params={'Bucket': bucket_name, 'Key': object_name},
             ExpiresIn=expiration
@@ -51,5 +173,138 @@ def generate_presigned_url(object_name, expiration=3600):
         }
 
     except Exception as e:
-        print(f"生成预签名URL时出错: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"生成预签名URL时出错: {e}")
+        return None
+
+
+def plan_parts(file_size: int, part_size: int = None) -> tuple:
+    """
+    计算分片大小和分片数，分片数超过上限时按需增大分片
+
+    :param file_size: 文件大小（字节）
+    :param part_size: 期望的分片大小，默认使用配置 UPLOAD_PART_SIZE
+    :return: (分片大小, 分片数)
+    """
+    part_size = max(part_size or get_settings().upload_part_size, MIN_PART_SIZE)
+    part_size = max(part_size, math.ceil(file_size / MAX_PARTS))
+    return part_size, max(1, math.ceil(file_size / part_size))
+
+
+def presign_upload_parts(object_name, upload_id, part_numbers, expiration=3600):
+    """
+    为分片生成上传用的预签名URL，断点续传或URL过期时可只为未完成的分片重新生成
+
+    :param object_name: 对象名称
+    :param upload_id: 分片上传ID
+    :param part_numbers: 分片序号列表（从1开始）
+    :param expiration: URL的有效期（秒）
+    :return: [{"partNumber": 序号, "preSignUrl": URL}]
+    """
+    client = get_s3_client()
+    bucket_name = get_settings().oss_bucket_name
+    return [
+        {
+            "partNumber": part_number,
+            "preSignUrl": client.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': bucket_name, 'Key': object_name, 'UploadId': upload_id, 'PartNumber': part_number},
+                ExpiresIn=expiration
+            )
+        }
+        for part_number in part_numbers
+    ]
+
+
+def create_multipart_upload(object_name, file_size, part_size=None, expiration=3600):
+    """
+    发起分片上传并为全部分片生成预签名URL，客户端可并行 PUT 各分片
+
+    :param object_name: 对象名称（即文件名）
+    :param file_size: 文件大小（字节）
+    :param part_size: 期望的分片大小，默认使用配置 UPLOAD_PART_SIZE
+    :param expiration: URL的有效期（秒）
+    :return: 上传ID、分片大小和各分片的预签名URL
+    """
+    try:
+        bucket_name = get_settings().oss_bucket_name
+        part_size, part_count = plan_parts(file_size, part_size)
+        content_type = mimetypes.guess_type(object_name)[0] or 'application/octet-stream'
+        response = get_s3_client().create_multipart_upload(Bucket=bucket_name, Key=object_name, ContentType=content_type)
+        upload_id = response['UploadId']
+        return {
+            "oriFileName": object_name,
+            "filePath": f"{bucket_name}/{object_name}",
+            "uploadId": upload_id,
+            "partSize": part_size,
+            "partCount": part_count,
+            "parts": presign_upload_parts(object_name, upload_id, range(1, part_count + 1), expiration)
+        }
+    except Exception as e:
+        logger.error(f"发起分片上传时出错: {e}")
+        return None
+
+
+def list_uploaded_parts(object_name, upload_id):
+    """
+    已上传的分片，客户端断点续传时跳过这些分片
+
+    :param object_name: 对象名称
+    :param upload_id: 分片上传ID
+    :return: [{"partNumber": 序号, "etag": ETag, "size": 字节数}]
+    """
+    try:
+        paginator = get_s3_client().get_paginator('list_parts')
+        parts = []
+        for page in paginator.paginate(Bucket=get_settings().oss_bucket_name, Key=object_name, UploadId=upload_id):
+            parts.extend({"partNumber": part['PartNumber'], "etag": part['ETag'], "size": part['Size']}
+                         for part in page.get('Parts', []))
+        return parts
+    except Exception as e:
+        logger.error(f"查询已上传分片时出错: {e}")
+        return None
+
+
+def complete_multipart_upload(object_name, upload_id, parts=None):
+    """
+    合并分片完成上传
+
+    :param object_name: 对象名称
+    :param upload_id: 分片上传ID
+    :param parts: [{"partNumber": 序号, "etag": ETag}]，为空时以服务端已上传的分片为准
+                  （浏览器未配置 CORS ExposeHeaders 时读不到 ETag）
+    :return: 对象路径和访问URL
+    """
+    try:
+        bucket_name = get_settings().oss_bucket_name
+        if not parts:
+            parts = list_uploaded_parts(object_name, upload_id)
+            if not parts:
+                raise ValueError("没有已上传的分片")
+        multipart = {'Parts': [{'PartNumber': part['partNumber'], 'ETag': part['etag']}
+                               for part in sorted(parts, key=lambda part: part['partNumber'])]}
+        get_s3_client().complete_multipart_upload(Bucket=bucket_name, Key=object_name, UploadId=upload_id,
+                                                  MultipartUpload=multipart)
+        return {
+            "oriFileName": object_name,
+            "filePath": f"{bucket_name}/{object_name}",
+            "fileUrl": object_url(object_name)
+        }
+    except Exception as e:
+        logger.error(f"完成分片上传时出错: {e}")
+        return None
+
+
+def abort_multipart_upload(object_name, upload_id) -> bool:
+    """
+    取消分片上传并释放已上传的分片
+
+    :param object_name: 对象名称
+    :param upload_id: 分片上传ID
+    :return: 是否成功
+    """
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=get_settings().oss_bucket_name, Key=object_name, UploadId=upload_id)
+        return True
+    except Exception as e:
+        logger.error(f"取消分片上传时出错: {e}")
+        return False
@@ -1,21 +1,20 @@
 import subprocess
-from pathlib import Path
-import os
-from dotenv import load_dotenv
 from datetime import datetime
 import uuid
 
+from app.config import Settings, get_settings
+
 class Wav2LipService:
     """Wav2Lip服务类,用于生成唇形同步视频。"""
 
-    def __init__(self):
+    def __init__(self, settings: Settings = None):
         """初始化Wav2LipService"""
-        load_dotenv()
-        project_root = Path(os.getenv("PROJECT_ROOT"))
+        settings = settings or get_settings()
+        project_root = settings.project_root
         
         self.base_path = project_root / 'external_modules' / 'wav2lip-onnx-256'
         self.checkpoint_path = self.base_path / 'checkpoints' / 'wav2lip_256.onnx'
-        self.conda_env = os.getenv("WAV2LIP_CONDA_ENV")
+        self.conda_env = settings.wav2lip_conda_env
         self.video_dir = project_root / 'data' / 'video'
         self.video_dir.mkdir(parents=True, exist_ok=True)
 
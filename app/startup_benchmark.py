@@ -0,0 +1,56 @@
+"""
+启动耗时基准：在全新的子进程中按不同 APP_ROLE 导入 app.main，统计导入耗时、峰值内存和已加载的重量级模块
+
+python -m app.startup_benchmark
+python -m app.startup_benchmark --roles api worker --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ['torch', 'faster_whisper', 'PIL', 'boto3', 'botocore', 'numpy']
+
+PROBE = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(role: str) -> dict:
+    """在子进程中导入一次 app.main，返回耗时、峰值内存和已加载的重量级模块"""
+    env = os.environ.copy()
+    env['APP_ROLE'] = role
+    # 只测导入耗时，不预加载模型
+    env['WORKER_PRELOAD'] = '0'
+    result = subprocess.run([sys.executable, '-c', PROBE], env=env, cwd=str(Path(__file__).resolve().parent.parent),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="measure app startup time per APP_ROLE")
+    parser.add_argument('--roles', nargs='+', default=['api', 'worker', 'all'], choices=['api', 'worker', 'all'])
+    parser.add_argument('--repeat', type=int, default=3)
+    opt = parser.parse_args()
+
+    for role in opt.roles:
+        runs = [measure(role) for _ in range(opt.repeat)]
+        seconds = [run['seconds'] for run in runs]
+        print(f"[INFO] role={role} import_median={statistics.median(seconds):.3f}s "
+              f"min={min(seconds):.3f}s max_rss={max(run['max_rss_mb'] for run in runs):.0f}MB "
+              f"heavy_modules={runs[-1]['heavy_modules']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import logging
+import wave
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# HuBERT 特征提取使用的采样率
+FEATURE_SAMPLE_RATE = 16000
+
+
+def read_wav(wav_path):
+    """
+    读取 PCM WAV 文件为 float32 单声道数据
+
+    :param wav_path: WAV 文件路径
+    :return: (samples, sample_rate)，samples 取值范围 [-1, 1]
+    """
+    with wave.open(str(wav_path), 'rb') as wav_file:
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        sample_rate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        ints = (bytes_[:, 0].astype(np.int32)
+                | (bytes_[:, 1].astype(np.int32) << 8)
+                | (bytes_[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"不支持的WAV采样位宽: {sample_width * 8}bit")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def write_wav(wav_path, samples, sample_rate):
+    """
+    将 float 数据写为 16bit PCM 单声道 WAV 文件
+
+    :param wav_path: 输出路径
+    :param samples: float 数据，取值范围 [-1, 1]
+    :param sample_rate: 采样率
+    """
+    pcm = np.clip(samples, -1.0, 1.0)
+    pcm = (pcm * 32767.0).astype('<i2')
+    with wave.open(str(wav_path), 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(int(sample_rate))
+        wav_file.writeframes(pcm.tobytes())
+
+
+def apply_gain(samples, volume=1.0):
+    """
+    调整音量，与 ffmpeg volume 滤镜一致使用线性倍数
+
+    :param samples: float 数据
+    :param volume: 音量倍数
+    :return: 调整后的数据（已做削波）
+    """
+    if volume == 1.0:
+        return samples
+    return np.clip(samples * float(volume), -1.0, 1.0)
+
+
+def time_stretch(samples, speed, sample_rate, frame_ms=40, tolerance_ms=10):
+    """
+    使用 WSOLA 算法变速不变调，替代 ffmpeg atempo
+
+    :param samples: float 数据
+    :param speed: 速度倍数，大于1加快，小于1放慢
+    :param sample_rate: 采样率
+    :param frame_ms: 分析帧长（毫秒）
+    :param tolerance_ms: 相似度搜索范围（毫秒）
+    :return: 变速后的数据
+    """
+    if speed is None or speed <= 0:
+        raise ValueError(f"无效的语速: {speed}")
+    if abs(speed - 1.0) < 1e-3 or len(samples) == 0:
+        return samples
+
+    frame_len = max(int(sample_rate * frame_ms / 1000), 32)
+    hop_out = frame_len // 2
+    hop_in = hop_out * speed
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    window = np.hanning(frame_len).astype(np.float32)
+
+    output_len = int(len(samples) / speed)
+    frame_count = output_len // hop_out + 1
+
+    # 两端补零，保证搜索窗口不越界
+    padded = np.pad(samples, (tolerance, frame_len + 2 * tolerance + int(hop_in) + hop_out))
+    output = np.zeros(frame_count * hop_out + frame_len, dtype=np.float32)
+    norm = np.zeros_like(output)
+
+    prev_pos = tolerance
+    for k in range(frame_count):
+        nominal = int(k * hop_in) + tolerance
+        if k == 0:
+            best_pos = nominal
+        else:
+            # 上一帧的自然延续作为目标，在名义位置附近寻找最相似的片段
+            target = padded[prev_pos + hop_out: prev_pos + hop_out + frame_len]
+            search_start = nominal - tolerance
+            region = padded[search_start: nominal + tolerance + frame_len]
+            corr = np.correlate(region, target, mode='valid')
+            best_pos = search_start + int(np.argmax(corr))
+
+        segment = padded[best_pos: best_pos + frame_len]
+        out_start = k * hop_out
+        output[out_start: out_start + frame_len] += segment * window
+        norm[out_start: out_start + frame_len] += window
+        prev_pos = best_pos
+
+    norm[norm < 1e-3] = 1.0
+    return (output / norm)[:output_len]
+
+
+def resample(samples, orig_sr, target_sr, num_taps=101):
+    """
+    重采样（降采样前先做加窗 sinc 低通滤波，防止混叠）
+
+    :param samples: float 数据
+    :param orig_sr: 原采样率
+    :param target_sr: 目标采样率
+    :param num_taps: 低通滤波器阶数
+    :return: 重采样后的数据
+    """
+    if orig_sr == target_sr or len(samples) == 0:
+        return samples
+
+    if target_sr < orig_sr:
+        cutoff = 0.5 * target_sr / orig_sr
+        taps = np.arange(num_taps) - (num_taps - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(num_taps)
+        kernel /= kernel.sum()
+        samples = np.convolve(samples, kernel.astype(np.float32), mode='same')
+
+    duration = len(samples) / orig_sr
+    target_len = int(round(duration * target_sr))
+    src_times = np.arange(len(samples)) / orig_sr
+    dst_times = np.arange(target_len) / target_sr
+    return np.interp(dst_times, src_times, samples).astype(np.float32)
+
+
+def postprocess_speech(input_path, output_path, feature_output_path=None, volume=1.0, speed=1.0):
+    """
+    在内存中完成 TTS 音频的音量、语速调整，一次性输出成品音频和 16kHz 特征输入音频
+
+    替代 adjust_audio_volume_and_speed 的 ffmpeg 子进程
+
+    :param input_path: TTS 生成的 WAV 文件路径
+    :param output_path: 调整后的音频输出路径（保持原采样率）
+    :param feature_output_path: 16kHz 特征提取音频输出路径，为None则不输出
+    :param volume: 音量调整倍数
+    :param speed: 速度调整倍数
+    :return: (output_path, feature_output_path)
+    """
+    try:
+        samples, sample_rate = read_wav(input_path)
+        samples = time_stretch(samples, speed, sample_rate)
+        samples = apply_gain(samples, volume)
+        write_wav(output_path, samples, sample_rate)
+
+        if feature_output_path is not None:
+            feature_samples = resample(samples, sample_rate, FEATURE_SAMPLE_RATE)
+            write_wav(feature_output_path, feature_samples, FEATURE_SAMPLE_RATE)
+
+        logger.info(f"音频后处理完成: {output_path}, 特征音频: {feature_output_path}, 时长 {len(samples) / sample_rate:.2f} 秒")
+        return Path(output_path), Path(feature_output_path) if feature_output_path else None
+    except Exception as e:
+        logger.error(f"音频后处理失败: {str(e)}")
+        raise
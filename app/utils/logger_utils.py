@@ -1,43 +1,169 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 
+from app.services.progress_service import current_job_id, current_stage
+
+_listener = None
+_exception_formatter = logging.Formatter()
+
+
+class ContextFilter(logging.Filter):
+    """在产生日志的线程中附加当前任务ID和阶段（写入队列后再取就变成了监听线程的上下文）"""
+
+    def filter(self, record):
+        record.job_id = current_job_id.get()
+        record.stage = current_stage.get()
+        return True
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    写入队列前只合并消息参数，异常堆栈单独保存在 exc_text 中，由监听线程的格式化器决定输出方式
+
+    默认的 QueueHandler.prepare 会先格式化整条记录并清空 exc_info/exc_text，堆栈被并入 message，JSON 日志中就没有 exc_info 字段
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        # 堆栈对象不随记录入队，避免引用的帧在日志写出前无法释放
+        if record.exc_info:
+            record.exc_text = record.exc_text or _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，包含任务ID和阶段，便于按任务检索"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if getattr(record, 'job_id', None):
+            data['job_id'] = record.job_id
+        if getattr(record, 'stage', None):
+            data['stage'] = record.stage
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = record.stack_info
+        return json.dumps(data, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """控制台文本格式，有任务ID时追加在模块名之后"""
+
+    def format(self, record):
+        job_id = getattr(record, 'job_id', None)
+        record.job = f" [{job_id}{'/' + record.stage if getattr(record, 'stage', None) else ''}]" if job_id else ''
+        return super().format(record)
+
+
+def parse_levels(levels: str) -> dict:
+    """
+    解析按模块设置的日志级别
+
+    :param levels: 形如 "app.services.ultralight_service=DEBUG,urllib3=WARNING"
+    :return: {模块名: 级别}
+    """
+    result = {}
+    for item in levels.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            result[name.strip()] = level.strip().upper()
+    return result
+
+
 def setup_logger():
+    """
+    配置异步日志：业务线程只把日志放入队列，由 QueueListener 线程统一写控制台和文件
+
+    - 文件按天轮转（跨天运行的进程也会切换文件），保留 LOG_BACKUP_DAYS 天
+    - 文件默认输出JSON（LOG_FORMAT=text 时为文本），每条记录带任务ID和阶段
+    - 根级别由 LOG_LEVEL 设置，LOG_LEVELS 可按模块覆盖
+    """
+    global _listener
+    from app.config import get_settings
+
+    settings = get_settings()
     # 创建日志目录
-    log_dir = "data/logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # 获取当前日期作为文件名
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    log_file = os.path.join(log_dir, f"app_{current_date}.log")
-    
-    # 设置日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    log_dir = settings.data_dir / 'logs'
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    text_formatter = TextFormatter(
+        '%(asctime)s - %(name)s%(job)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
-    # 创建 FileHandler，使用追加模式
-    file_handler = logging.FileHandler(
-        filename=log_file,
-        encoding='utf-8',
-        mode='a'  # 追加模式
+
+    # 每天零点轮转，历史文件为 app.log.YYYY-MM-DD
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        filename=str(log_dir / 'app.log'),
+        when='midnight',
+        backupCount=settings.log_backup_days,
+        encoding='utf-8'
     )
-    file_handler.setFormatter(formatter)
-    
+    file_handler.setFormatter(JsonFormatter() if settings.log_format == 'json' else text_formatter)
+
     # 创建 StreamHandler 用于控制台输出
     stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    
+    stream_handler.setFormatter(text_formatter)
+
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(stop_logger)
+    _listener = logging.handlers.QueueListener(queue.SimpleQueue(), stream_handler, file_handler,
+                                               respect_handler_level=True)
+    queue_handler = ContextQueueHandler(_listener.queue)
+    queue_handler.addFilter(ContextFilter())
+
     # 配置根日志记录器
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-    
+    root_logger.setLevel(settings.log_level)
+
     # 清除可能存在的旧处理器
     root_logger.handlers.clear()
-    
-    # 添加处理器
-    root_logger.addHandler(stream_handler)
-    root_logger.addHandler(file_handler)
-    
\ No newline at end of file
+    root_logger.addHandler(queue_handler)
+
+    for name, level in parse_levels(settings.log_levels).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener.start()
+
+
+def stop_logger():
+    """停止日志监听线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def subprocess_env(env: dict = None) -> dict:
+    """
+    外部模型子进程的环境变量：tqdm 进度条最少间隔 TQDM_MININTERVAL 秒刷新一次，
+    避免逐条刷新的进度输出占满标准输出（细粒度进度通过进度文件上报）
+
+    :param env: 额外的环境变量
+    :return: 子进程环境变量
+    """
+    result = os.environ.copy()
+    result.setdefault('TQDM_MININTERVAL', '30')
+    if env:
+        result.update(env)
+    return result
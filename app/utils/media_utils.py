@@ -8,7 +8,8 @@ import traceback
 import logging
 import zipfile
 from pathlib import Path
-import requests
+
+from app.config import get_settings
 
 
 logger = logging.getLogger(__name__)
@@ -46,14 +47,17 @@ def get_image_dimensions(image_path):
         raise
 
 # 下载单个媒体 
-def download_media(media_url, save_directory, keep_name=False, file_name=None):
+def download_media(media_url, save_directory, keep_name=False, file_name=None, use_cache=False):
     """
     media_url: 媒体链接
     save_directory: 保存目录
     keep_name: 是否保留原文件名
     file_name: 指定的文件名
+    use_cache: 是否使用公共素材下载缓存
     return: 具体文件访问链接
     """
+    from app.services.download_service import DownloadService
+
     if not os.path.exists(save_directory):
         os.makedirs(save_directory)
 
@@ -66,15 +70,12 @@ def download_media(media_url, save_directory, keep_name=False, file_name=None):
         
     save_path = os.path.join(save_directory, file_name)
 
-    response = requests.get(media_url, headers=HEADERS, stream=True)
-    if response.status_code == 200:
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
+    try:
+        DownloadService.get_instance().download(media_url, save_path, use_cache=use_cache)
         logger.debug(f"Media downloaded successfully: {save_path}")
         return save_path
-    else:
-        logger.error(f"Failed to download media: {response.status_code}")
+    except Exception as e:
+        logger.error(f"Failed to download media: {str(e)}")
         return None
 
 def handle_media_url(media_url, save_directory, keep_name=False, file_name=None):
@@ -141,6 +142,68 @@ def adjust_audio_volume_and_speed(input_path, output_path, volume=1.0, speed=1.0
 
 
 
+def package_hls(video_path, output_dir=None, segment_seconds=2):
+    """
+    将MP4无转码封装为 fMP4 分片的 HLS 点播流
+
+    分片边界取决于关键帧，编码时需按 segment_seconds 强制插入关键帧
+
+    :param video_path: 输入MP4路径
+    :param output_dir: 输出目录，默认为视频同级的 <文件名>_hls 目录
+    :param segment_seconds: 分片时长（秒）
+    :return: 播放列表路径
+    """
+    video_path = Path(video_path)
+    output_dir = Path(output_dir) if output_dir else video_path.with_name(f"{video_path.stem}_hls")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    playlist_path = output_dir / 'index.m3u8'
+    try:
+        command = [
+            'ffmpeg',
+            '-i', str(video_path),
+            '-c', 'copy',
+            '-f', 'hls',
+            '-hls_time', str(segment_seconds),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_type', 'fmp4',
+            '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', str(output_dir / 'segment_%04d.m4s'),
+            '-y',
+            str(playlist_path)
+        ]
+        subprocess.run(command, capture_output=True, text=True, check=True)
+        logger.info(f"HLS封装成功: {playlist_path}")
+        return playlist_path
+    except subprocess.CalledProcessError as e:
+        logger.error(f"HLS封装失败: {e.stderr}")
+        raise
+
+
+def trim_media(media_path, max_seconds):
+    """
+    原地截取媒体文件的前 max_seconds 秒（流复制，不重新编码）
+
+    :param media_path: 媒体文件路径
+    :param max_seconds: 保留时长（秒）
+    """
+    media_path = Path(media_path)
+    temp_path = media_path.with_name(f"trimmed_{media_path.name}")
+    try:
+        command = [
+            'ffmpeg',
+            '-i', str(media_path),
+            '-t', str(max_seconds),
+            '-c', 'copy',
+            '-y',
+            str(temp_path)
+        ]
+        subprocess.run(command, capture_output=True, text=True, check=True)
+        os.replace(temp_path, media_path)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"截取媒体失败: {e.stderr}")
+        raise
+
+
 def calculate_target_dimensions(video_layout, resolution):
     """
     根据视频布局和分辨率计算目标宽高
@@ -217,6 +280,47 @@ def extract_video_frame(video_path, frame_number=1, output_path=None):
         logger.error(f"提取视频帧时发生未知错误: {str(e)}")
         raise
 
+def cover_paths(video_path, thumbnail_widths=None):
+    """
+    视频对应的封面和缩略图路径
+
+    :param video_path: 视频文件路径
+    :param thumbnail_widths: 缩略图宽度列表，为None时使用配置 VIDEO_THUMBNAIL_WIDTHS（逗号分隔，默认不生成）
+    :return: (封面路径, {宽度: WebP缩略图路径})
+    """
+    if thumbnail_widths is None:
+        thumbnail_widths = get_settings().video_thumbnail_widths
+    video_path = Path(video_path)
+    cover_path = video_path.with_name(f"{video_path.stem}_frame_1.png")
+    thumbnails = {width: video_path.with_name(f"{video_path.stem}_thumb_{width}.webp") for width in thumbnail_widths}
+    return cover_path, thumbnails
+
+
+def cover_outputs(source_label, video_path, thumbnail_widths=None):
+    """
+    在成片的滤镜图中追加封面和缩略图输出，与视频编码共用同一次解码，取第1帧(与 extract_video_frame 默认一致)
+
+    :param source_label: 滤镜图中供封面使用的视频标签（不含方括号），需为单独 split 出的分支
+    :param video_path: 成片路径，封面和缩略图保存在同一目录
+    :param thumbnail_widths: 缩略图宽度列表，见 cover_paths
+    :return: (追加的滤镜片段, ffmpeg输出参数, 封面路径, {宽度: 缩略图路径})
+    """
+    cover_path, thumbnails = cover_paths(video_path, thumbnail_widths)
+    labels = ['cover_out'] + [f'thumb_{width}' for width in thumbnails]
+    filter_part = f";[{source_label}]select=eq(n\\,1)"
+    if thumbnails:
+        filter_part += f",split={len(labels)}" + ''.join(f'[{label}]' for label in labels)
+        for width in thumbnails:
+            filter_part += f";[thumb_{width}]scale={width}:-2[thumb_{width}_out]"
+    else:
+        filter_part += '[cover_out]'
+
+    output_args = ['-map', '[cover_out]', '-frames:v', '1', str(cover_path)]
+    for width, thumbnail_path in thumbnails.items():
+        output_args += ['-map', f'[thumb_{width}_out]', '-frames:v', '1', '-c:v', 'libwebp', '-quality', '80', str(thumbnail_path)]
+    return filter_part, output_args, cover_path, thumbnails
+
+
 def delete_file(file_path):
     try:
         if os.path.exists(file_path):
@@ -244,27 +348,13 @@ def delete_directory(directory_path):
 # 将本地路径转化为线上路径
 def convert_path_to_url(file_path):
     """
-    根据 channel 配置将本地路径转换为 URL
-    
+    根据 PROJECT_ROOT / LOCAL_HOST 配置将本地路径转换为 URL
+
     :param file_path: 本地文件路径
     :return: 转换后的路径
     """
     try:
-        from dotenv import load_dotenv
-        import os
-        load_dotenv()
-            
-        project_root = os.getenv('PROJECT_ROOT')
-        host = os.getenv('LOCAL_HOST')
-
-        # 将 project_root 替换为 host
-        if not file_path or not project_root or not host:
-            return file_path
-
-        url = file_path.replace(project_root, host)
-        url = url.replace('\\', '/')
-        return url
-        
+        return get_settings().path_mapper.to_url(file_path)
     except Exception as e:
         logger.error(f"path -> url 转换失败: {str(e)}")
         return file_path
@@ -273,56 +363,35 @@ def convert_path_to_url(file_path):
 # 将线上路径转化为本地路径
 def convert_url_to_path(file_url):
     """
-    根据 channel 配置将 URL 转换为 本地路径：区分win和linux
+    根据 PROJECT_ROOT / LOCAL_HOST 配置将 URL 转换为 本地路径
 
     :param file_url: 本地文件路径
     :return: 转换后的路径
     """
     try:
-        from dotenv import load_dotenv
-        import os
-        load_dotenv()
-
-        project_root = os.getenv('PROJECT_ROOT')
-        host = os.getenv('LOCAL_HOST')
-
-        # 将 project_root 替换为 host
-        if not file_url or not project_root or not host:
-            return file_url
-
-        path = file_url.replace(host, project_root)
-        return path
-
+        return get_settings().path_mapper.to_path(file_url)
     except Exception as e:
         logger.error(f"url -> path 转换失败: {str(e)}")
         return file_url
 
-def download_and_extract(url, download_dir, extract_dir):
+def download_and_extract(url, download_dir, extract_dir, target_dir=None):
     """
-    将url文件下载到download_dir,并解压到extract_dir
+    下载url对应的ZIP文件并解压到extract_dir
+
+    压缩包保存在公共下载缓存中，download_dir 仅为兼容旧调用保留；
+    同一 target_dir 并发调用时只会下载、解压一次
 
     :param url: 下载文件的URL
-    :param download_dir: 下载文件的保存目录
+    :param download_dir: 下载文件的保存目录（已不再使用）
     :param extract_dir: 解压缩文件的目标目录
+    :param target_dir: 解压后应存在的目录，已存在则跳过
     """
-    # 确保下载目录存在
-    download_dir = Path(download_dir)
-    download_dir.mkdir(parents=True, exist_ok=True)
+    from app.services.download_service import DownloadService
 
-    # 下载文件
     logger.info(f"开始下载文件: {url}")
-    downloaded_file = download_media(url, str(download_dir), keep_name=True)
-
-    if not downloaded_file:
-        logger.error(f"下载失败: {url}")
-        return
-
-    # 解压缩文件
     try:
-        with zipfile.ZipFile(downloaded_file, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-        logger.info(f"成功解压缩文件到: {extract_dir}")
+        DownloadService.get_instance().ensure_extracted(url, extract_dir, target_dir)
     except zipfile.BadZipFile:
-        logger.error(f"文件不是有效的ZIP文件: {downloaded_file}")
-    finally:
-        delete_directory(download_dir)
+        logger.error(f"文件不是有效的ZIP文件: {url}")
+    except Exception as e:
+        logger.error(f"下载失败: {url}, {str(e)}")
@@ -0,0 +1,129 @@
+import base64
+import logging
+import threading
+from datetime import datetime
+
+from cachetools import TTLCache
+from sqlalchemy import DateTime, String, and_, or_, text, type_coerce
+
+from app.config import get_settings
+from app.database import fts_tables
+
+logger = logging.getLogger(__name__)
+
+# 列表总数缓存：相同筛选条件在有效期内复用 COUNT 结果
+_count_cache = TTLCache(maxsize=1024, ttl=get_settings().list_count_cache_ttl)
+_count_cache_lock = threading.Lock()
+
+
+def encode_cursor(sort_value, row_id):
+    """
+    生成游标：排序字段值和id
+
+    :param sort_value: 排序字段的值（时间字段为数据库中存储的原始字符串，或 id）
+    :param row_id: 记录id
+    :return: URL安全的游标字符串
+    """
+    raw = f"{sort_value.isoformat(sep=' ') if isinstance(sort_value, datetime) else sort_value}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标
+
+    :param cursor: encode_cursor 生成的游标
+    :return: (排序字段值, 记录id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        sort_value, row_id = raw.rsplit('|', 1)
+        return _parse_value(sort_value), _parse_value(row_id)
+    except Exception:
+        raise ValueError(f"无效的游标: {cursor}")
+
+
+def _parse_value(value):
+    # 时间值保持字符串，按列中存储的原始格式比较
+    return int(value) if value.isdigit() else value
+
+
+def cached_count(query):
+    """
+    查询总数，按 SQL 和参数缓存 LIST_COUNT_CACHE_TTL 秒
+
+    :param query: 未排序、未分页的查询
+    :return: 总数
+    """
+    compiled = query.statement.compile()
+    key = (str(compiled), tuple(sorted((name, str(value)) for name, value in compiled.params.items())))
+    with _count_cache_lock:
+        total = _count_cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        with _count_cache_lock:
+            _count_cache[key] = total
+    return total
+
+
+def search_filter(query, model, column_name, keyword):
+    """
+    名称/标题模糊搜索：表已建立 FTS5(trigram) 索引且关键词不少于3个字符时使用全文索引，否则退回 LIKE
+
+    :param query: 查询
+    :param model: 模型类
+    :param column_name: 搜索的列名
+    :param keyword: 关键词
+    :return: 追加筛选条件后的查询
+    """
+    table_name = model.__tablename__
+    if table_name in fts_tables and len(keyword) >= 3:
+        match = '"' + keyword.replace('"', '""') + '"'
+        rowids = text(f"SELECT rowid FROM {table_name}_fts WHERE {table_name}_fts MATCH :fts_keyword").bindparams(fts_keyword=match)
+        return query.filter(model.id.in_(rowids))
+    return query.filter(getattr(model, column_name).like(f"%{keyword}%"))
+
+
+def paginate(query, sort_column, id_column, page=1, page_size=10, cursor=None, with_total=True, descending=True):
+    """
+    按 (排序字段, id) 排序分页，传入游标时使用 keyset 分页，否则使用页码
+
+    游标分页只扫描索引中游标之后的记录，深页不再随 OFFSET 变慢
+
+    SQLite 中的时间按文本存储，格式不统一（CURRENT_TIMESTAMP 默认值精确到秒，ORM 写入的带微秒），
+    游标记录并比较列中的原始字符串，与 ORDER BY 的文本顺序一致，同一秒内的多条记录也能逐页翻完
+
+    :param query: 已添加筛选条件的查询
+    :param sort_column: 排序字段，如 ShortVideo.created_at
+    :param id_column: id字段
+    :param page: 页码（未传游标时使用）
+    :param page_size: 每页记录数
+    :param cursor: 上一页返回的 next_cursor
+    :param with_total: 是否返回总数（带缓存）
+    :param descending: 是否倒序
+    :return: (记录列表, 总数或None, 下一页游标或None)
+    """
+    total = cached_count(query) if with_total else None
+    if descending:
+        ordered = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        ordered = query.order_by(sort_column.asc(), id_column.asc())
+    # 时间字段按存储的原始值比较，不经过 DateTime 的格式转换，仍可使用索引
+    if isinstance(sort_column.type, DateTime):
+        sort_column = type_coerce(sort_column, String)
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if descending:
+            ordered = ordered.filter(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id)))
+        else:
+            ordered = ordered.filter(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id)))
+    else:
+        ordered = ordered.offset((max(page, 1) - 1) * page_size)
+
+    rows = ordered.add_columns(sort_column.label('_cursor_value')).limit(page_size + 1).all()
+    items = [row[0] for row in rows]
+    next_cursor = None
+    if len(rows) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(rows[page_size - 1][1], getattr(items[-1], id_column.key))
+    return items, total, next_cursor
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from urllib.parse import quote
+
+from fastapi.staticfiles import StaticFiles
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 256 * 1024
+
+# 播放列表会被重新生成，不缓存；其余生成文件路径唯一，可长期缓存
+NO_CACHE_SUFFIXES = {'.m3u8'}
+
+
+def file_etag(stat_result):
+    """
+    根据修改时间和大小计算ETag
+
+    生成文件写入临时文件后原子替换，修改时间和大小相同即内容相同，按强校验ETag返回，If-Range 才能命中
+    """
+    return '"' + hashlib.md5(f"{stat_result.st_mtime}-{stat_result.st_size}".encode()).hexdigest() + '"'
+
+
+def cache_control_for(path, max_age):
+    """根据文件类型返回 Cache-Control"""
+    if os.path.splitext(str(path))[1].lower() in NO_CACHE_SUFFIXES or max_age <= 0:
+        return 'no-cache'
+    return f'public, max-age={max_age}'
+
+
+def parse_range(range_header, file_size):
+    """
+    解析单段 Range 请求头
+
+    :param range_header: Range 请求头
+    :param file_size: 文件大小
+    :return: (start, end)，end 包含在内；无法满足时返回 None
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else file_size - 1
+    else:
+        # bytes=-N 表示最后N个字节
+        start = max(file_size - int(match.group(2)), 0)
+        end = file_size - 1
+    end = min(end, file_size - 1)
+    if start > end or start >= file_size:
+        return None
+    return start, end
+
+
+def iter_file_range(path, start, end):
+    """按块读取文件的 [start, end] 区间"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def range_file_response(request: Request, path, stat_result=None, media_type=None, filename=None, max_age=0):
+    """
+    返回支持 Range、ETag/If-None-Match 和 Cache-Control 的文件响应
+
+    :param request: 请求
+    :param path: 文件路径
+    :param stat_result: 文件 stat 结果，为None时自动获取
+    :param media_type: 响应类型
+    :param filename: 下载文件名，传入时以附件形式返回
+    :param max_age: 缓存时间（秒）
+    :return: Response
+    """
+    stat_result = stat_result or os.stat(path)
+    etag = file_etag(stat_result)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': formatdate(stat_result.st_mtime, usegmt=True),
+        'Cache-Control': cache_control_for(path, max_age),
+    }
+
+    # If-None-Match 使用弱比较，忽略 W/ 前缀
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+
+    media_type = media_type or mimetypes.guess_type(str(path))[0] or 'text/plain'
+    if filename:
+        headers['Content-Disposition'] = f"attachment; filename*=utf-8''{quote(filename)}"
+    # HEAD 请求只返回响应头
+    head_only = request.method == 'HEAD'
+
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and (not if_range or if_range == etag):
+        file_range = parse_range(range_header, stat_result.st_size)
+        if file_range is None:
+            return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{stat_result.st_size}'})
+        start, end = file_range
+        headers.update({
+            'Content-Range': f'bytes {start}-{end}/{stat_result.st_size}',
+            'Content-Length': str(end - start + 1),
+        })
+        if head_only:
+            return Response(status_code=206, media_type=media_type, headers=headers)
+        return StreamingResponse(iter_file_range(path, start, end), status_code=206,
+                                 media_type=media_type, headers=headers)
+
+    if head_only:
+        return Response(media_type=media_type, headers={**headers, 'Content-Length': str(stat_result.st_size)})
+    response = FileResponse(path, stat_result=stat_result, media_type=media_type, headers=headers)
+    # FileResponse 会按自身规则写入 ETag，这里统一为上面用于比较的值
+    response.headers['etag'] = etag
+    return response
+
+
+class MediaStaticFiles(StaticFiles):
+    """
+    在 StaticFiles 基础上增加 Range 分段请求和 Cache-Control，
+    便于播放器边下边播以及 CDN 缓存生成的视频、封面和 HLS 分片
+    """
+
+    def __init__(self, *args, max_age: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        return range_file_response(Request(scope), full_path, stat_result=stat_result, max_age=self.max_age)
@@ -184,7 +184,16 @@ def decode_n_tokens(
         device=cur_token.device,
     )
 
+    # Periodically write "generated 0" so the caller can report progress
+    # (the total is unknown: decoding stops early at im_end)
+    progress_path = os.environ.get("FISH_SPEECH_PROGRESS_PATH")
+
     for i in tqdm(range(num_new_tokens)):
+        if progress_path and i % 32 == 0:
+            with open(progress_path + ".tmp", "w") as f:
+                f.write(f"{i} 0")
+            os.replace(progress_path + ".tmp", progress_path)
+
         # We need to get windowed repeat penalty
         win_size = 16
         if i < win_size:
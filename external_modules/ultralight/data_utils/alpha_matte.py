@@ -0,0 +1,129 @@
+import os
+import sys
+import argparse
+import subprocess
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_utils.avatar_pack import AvatarFrames, ALPHA_PACK_FILE, ALPHA_INDEX_FILE, has_alpha
+
+"""
+绿幕抠像：每个数字人只在训练时为全部帧计算一次alpha，与帧容器一起保存
+渲染时直接读取alpha合成，不再对每个成片重新执行ffmpeg chromakey
+
+python data_utils/alpha_matte.py <avatar_dir>
+python data_utils/alpha_matte.py <avatar_dir> --export_video no_green.webm --export_cover no_green.png --fps 25
+"""
+
+BORDER = 8                # 用于判断绿幕和估计背景色的边框宽度
+GREEN_RATIO = 0.6         # 边框中绿色像素占比超过该值时认为是绿幕
+KEY_TOLERANCE = (18, 40)  # CbCr与背景色距离低于下限为全透明，高于上限为不透明
+
+
+def border_pixels(img):
+    return np.concatenate([img[:BORDER].reshape(-1, 3), img[-BORDER:].reshape(-1, 3),
+                           img[:, :BORDER].reshape(-1, 3), img[:, -BORDER:].reshape(-1, 3)])
+
+
+def detect_key_color(img):
+    """
+    根据边框像素判断是否为绿幕，是则返回背景色的 (Cr, Cb)，否则返回None
+    """
+    pixels = border_pixels(img).astype(np.int32)
+    b, g, r = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+    green = (g > r + 30) & (g > b + 30)
+    if green.mean() < GREEN_RATIO:
+        return None
+    ycrcb = cv2.cvtColor(pixels[green].astype(np.uint8).reshape(-1, 1, 3), cv2.COLOR_BGR2YCrCb).reshape(-1, 3)
+    return np.median(ycrcb[:, 1:], axis=0).astype(np.float32)
+
+
+def compute_alpha(img, key_color, tolerance=KEY_TOLERANCE):
+    """
+    按色度(CbCr)到背景色的距离计算alpha，与亮度无关，对绿幕上的阴影不敏感
+    """
+    ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb).astype(np.float32)
+    distance = np.linalg.norm(ycrcb[:, :, 1:] - key_color, axis=2)
+    low, high = tolerance
+    alpha = np.clip((distance - low) / (high - low), 0, 1)
+    # 去掉孤立噪点，边缘轻微羽化
+    alpha = cv2.morphologyEx(alpha, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    alpha = cv2.GaussianBlur(alpha, (3, 3), 0)
+    return (alpha * 255).astype(np.uint8)
+
+
+def despill(img):
+    """抑制边缘的绿色溢出：绿色通道不超过红、蓝通道的较大值，肤色不受影响"""
+    b, g, r = cv2.split(img)
+    return cv2.merge([b, np.minimum(g, np.maximum(r, b)), r])
+
+
+def build_alpha_pack(dataset_dir):
+    """
+    为数字人的全部帧计算alpha并打包为 alpha.pack + alpha_index.npy
+    return: 是否为绿幕数字人
+    """
+    if has_alpha(dataset_dir):
+        print(f"[INFO] {dataset_dir} alpha already exists")
+        return True
+    frames = AvatarFrames(dataset_dir)
+    key_color = detect_key_color(frames.read_image(0))
+    if key_color is None:
+        print(f"[INFO] {dataset_dir} is not a green screen avatar, skipped")
+        return False
+
+    pack_path = os.path.join(dataset_dir, ALPHA_PACK_FILE)
+    offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+    with open(pack_path + ".tmp", "wb") as pack_file:
+        for i in range(len(frames)):
+            data = cv2.imencode(".png", compute_alpha(frames.read_image(i), key_color))[1].tobytes()
+            pack_file.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    os.replace(pack_path + ".tmp", pack_path)
+    # 索引最后写入，存在即表示alpha完整
+    np.save(os.path.join(dataset_dir, ALPHA_INDEX_FILE + ".tmp.npy"), offsets)
+    os.replace(os.path.join(dataset_dir, ALPHA_INDEX_FILE + ".tmp.npy"), os.path.join(dataset_dir, ALPHA_INDEX_FILE))
+    print(f"[INFO] alpha of {len(frames)} frames saved to {pack_path}, key color(CrCb)={key_color.tolist()}")
+    return True
+
+
+def export_no_green(dataset_dir, video_path=None, cover_path=None, fps=25):
+    """
+    导出去除绿幕后的透明视频(VP9 yuva420p)和第一帧透明PNG，供前端预览
+    """
+    frames = AvatarFrames(dataset_dir)
+    if not frames.has_alpha:
+        raise ValueError(f"{dataset_dir} has no alpha, run build_alpha_pack first")
+    height, width = frames.read_image(0).shape[:2]
+    if cover_path:
+        cv2.imwrite(cover_path, np.dstack([despill(frames.read_image(0)), frames.read_alpha(0)]))
+        print(f"[INFO] cover saved to {cover_path}")
+    if video_path:
+        temp_path = f"{video_path}.{os.getpid()}.tmp{os.path.splitext(video_path)[1]}"
+        command = [
+            "ffmpeg", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgra", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0",
+            "-c:v", "libvpx-vp9", "-pix_fmt", "yuva420p", "-crf", "30", "-b:v", "0", "-row-mt", "1",
+            temp_path,
+        ]
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        for i in range(len(frames)):
+            process.stdin.write(np.dstack([despill(frames.read_image(i)), frames.read_alpha(i)]).tobytes())
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"encode no green video failed: {dataset_dir}")
+        os.replace(temp_path, video_path)
+        print(f"[INFO] no green video saved to {video_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compute per-frame alpha for green screen avatars")
+    parser.add_argument('dataset_dir', type=str, help="avatar dataset dir")
+    parser.add_argument('--export_video', type=str, default="", help="export transparent webm")
+    parser.add_argument('--export_cover', type=str, default="", help="export transparent png of the first frame")
+    parser.add_argument('--fps', type=int, default=25)
+    opt = parser.parse_args()
+
+    if build_alpha_pack(opt.dataset_dir) and (opt.export_video or opt.export_cover):
+        export_no_green(opt.dataset_dir, opt.export_video or None, opt.export_cover or None, opt.fps)
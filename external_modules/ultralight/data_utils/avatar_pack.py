@@ -0,0 +1,162 @@
+import os
+import shutil
+import argparse
+import mmap
+import cv2
+import numpy as np
+
+# 打包后的文件：所有帧JPEG依次拼接 + 偏移索引 + 全部关键点
+PACK_FILE = "frames.pack"
+INDEX_FILE = "frames_index.npy"
+LANDMARKS_FILE = "landmarks.npy"
+# 绿幕数字人的逐帧alpha：PNG灰度图依次拼接 + 偏移索引，由 alpha_matte.py 生成
+ALPHA_PACK_FILE = "alpha.pack"
+ALPHA_INDEX_FILE = "alpha_index.npy"
+
+
+def is_packed(dataset_dir):
+    # 索引文件最后写入，存在即表示打包完整
+    return os.path.exists(os.path.join(dataset_dir, INDEX_FILE))
+
+
+def has_alpha(dataset_dir):
+    return os.path.exists(os.path.join(dataset_dir, ALPHA_INDEX_FILE))
+
+
+def read_lms_file(lms_path):
+    lms_list = []
+    with open(lms_path, "r") as f:
+        lines = f.read().splitlines()
+        for line in lines:
+            arr = line.split(" ")
+            arr = np.array(arr, dtype=np.float32)
+            lms_list.append(arr)
+    return np.array(lms_list, dtype=np.float32)
+
+
+def pack_avatar(dataset_dir, remove_source=False):
+    """
+    将 full_body_img/*.jpg 和 landmarks/*.lms 打包为单个帧容器和关键点数组
+    remove_source: 打包完成后删除原始的小文件
+    """
+    img_dir = os.path.join(dataset_dir, "full_body_img")
+    lms_dir = os.path.join(dataset_dir, "landmarks")
+    if is_packed(dataset_dir):
+        print(f"[INFO] {dataset_dir} already packed")
+        return
+    frame_count = len([name for name in os.listdir(img_dir) if name.endswith(".jpg")])
+
+    pack_path = os.path.join(dataset_dir, PACK_FILE)
+    offsets = np.zeros(frame_count + 1, dtype=np.int64)
+    landmarks = []
+    with open(pack_path + ".tmp", "wb") as pack_file:
+        for i in range(frame_count):
+            with open(os.path.join(img_dir, str(i) + ".jpg"), "rb") as img_file:
+                data = img_file.read()
+            pack_file.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+            landmarks.append(read_lms_file(os.path.join(lms_dir, str(i) + ".lms")))
+
+    np.save(os.path.join(dataset_dir, LANDMARKS_FILE + ".tmp.npy"), np.stack(landmarks))
+    os.replace(os.path.join(dataset_dir, LANDMARKS_FILE + ".tmp.npy"), os.path.join(dataset_dir, LANDMARKS_FILE))
+    os.replace(pack_path + ".tmp", pack_path)
+    np.save(os.path.join(dataset_dir, INDEX_FILE + ".tmp.npy"), offsets)
+    os.replace(os.path.join(dataset_dir, INDEX_FILE + ".tmp.npy"), os.path.join(dataset_dir, INDEX_FILE))
+    print(f"[INFO] packed {frame_count} frames into {pack_path}")
+
+    if remove_source:
+        shutil.rmtree(img_dir)
+        shutil.rmtree(lms_dir)
+
+
+class AvatarFrames:
+    """
+    数字人训练帧的随机读取，优先使用打包格式，未打包时回退到原始目录
+    """
+
+    def __init__(self, dataset_dir):
+        self.dataset_dir = dataset_dir
+        self.packed = is_packed(dataset_dir)
+        self._pack = None
+        self._alpha_pack = None
+        self.has_alpha = has_alpha(dataset_dir)
+        if self.has_alpha:
+            self.alpha_offsets = np.load(os.path.join(dataset_dir, ALPHA_INDEX_FILE))
+        if self.packed:
+            self.offsets = np.load(os.path.join(dataset_dir, INDEX_FILE))
+            self.landmarks = np.load(os.path.join(dataset_dir, LANDMARKS_FILE)).astype(np.int32)
+            self.frame_count = len(self.offsets) - 1
+        else:
+            self.img_dir = os.path.join(dataset_dir, "full_body_img")
+            self.lms_dir = os.path.join(dataset_dir, "landmarks")
+            self.frame_count = len(os.listdir(self.img_dir))
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getstate__(self):
+        # DataLoader 多进程时不传递 mmap 句柄，由子进程重新打开
+        state = self.__dict__.copy()
+        state["_pack"] = None
+        state["_alpha_pack"] = None
+        return state
+
+    def _open_pack(self):
+        if self._pack is None:
+            with open(os.path.join(self.dataset_dir, PACK_FILE), "rb") as f:
+                self._pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._pack
+
+    def read_image(self, index):
+        if not self.packed:
+            return cv2.imread(os.path.join(self.img_dir, str(index) + ".jpg"))
+        pack = self._open_pack()
+        data = np.frombuffer(pack[self.offsets[index]:self.offsets[index + 1]], dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def read_alpha(self, index):
+        """读取第index帧的alpha(单通道uint8)，没有alpha时返回None"""
+        if not self.has_alpha:
+            return None
+        if self._alpha_pack is None:
+            with open(os.path.join(self.dataset_dir, ALPHA_PACK_FILE), "rb") as f:
+                self._alpha_pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = np.frombuffer(self._alpha_pack[self.alpha_offsets[index]:self.alpha_offsets[index + 1]], dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
+    def read_landmarks(self, index):
+        if not self.packed:
+            return read_lms_file(os.path.join(self.lms_dir, str(index) + ".lms")).astype(np.int32)
+        return self.landmarks[index]
+
+    def mouth_union_box(self, width, height):
+        """
+        所有帧嘴部裁剪框(由 lms[1]、lms[31]、lms[52] 计算)的并集，坐标对齐到偶数
+        return: (x, y, w, h)
+        """
+        if self.packed:
+            landmarks = self.landmarks
+        else:
+            landmarks = np.stack([self.read_landmarks(i) for i in range(self.frame_count)])
+        xmin = landmarks[:, 1, 0]
+        ymin = landmarks[:, 52, 1]
+        xmax = landmarks[:, 31, 0]
+        ymax = ymin + (xmax - xmin)
+        x0 = max(int(xmin.min()) // 2 * 2, 0)
+        y0 = max(int(ymin.min()) // 2 * 2, 0)
+        x1 = min(-(-int(xmax.max()) // 2) * 2, width // 2 * 2)
+        y1 = min(-(-int(ymax.max()) // 2) * 2, height // 2 * 2)
+        return x0, y0, x1 - x0, y1 - y0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pack avatar frames and landmarks")
+    parser.add_argument('dataset_dirs', type=str, nargs='+', help="avatar dataset dirs")
+    parser.add_argument('--remove_source', action='store_true', help="remove full_body_img/ and landmarks/ after packing")
+    opt = parser.parse_args()
+
+    for dataset_dir in opt.dataset_dirs:
+        if not os.path.isdir(os.path.join(dataset_dir, "full_body_img")) and not is_packed(dataset_dir):
+            print(f"[WARN] {dataset_dir} has no frames, skipped")
+            continue
+        pack_avatar(dataset_dir, opt.remove_source)
@@ -89,8 +89,12 @@ if __name__ == '__main__':
     
     wav_name = args.wav
     speech, sr = sf.read(wav_name)
-    speech_16k = librosa.resample(speech, orig_sr=sr, target_sr=16000)
-    print("SR: {} to {}".format(sr, 16000))
+    if sr == 16000:
+        # 后端已输出16kHz特征音频，无需再次重采样
+        speech_16k = speech
+    else:
+        speech_16k = librosa.resample(speech, orig_sr=sr, target_sr=16000)
+        print("SR: {} to {}".format(sr, 16000))
     
     hubert_hidden = get_hubert_from_16k_speech(speech_16k)
     hubert_hidden = make_even_first_dim(hubert_hidden).reshape(-1, 2, 1024)
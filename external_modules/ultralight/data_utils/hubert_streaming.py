@@ -0,0 +1,94 @@
+import numpy as np
+import torch
+from transformers import Wav2Vec2Processor, HubertModel
+
+# 与 hubert.py 离线提取保持一致的参数
+SAMPLE_RATE = 16000
+KERNEL = 400           # HuBERT 卷积前端等效为 kernel=400、stride=320 的一维卷积
+STRIDE = 320           # 每 20ms 一帧 hubert 特征（50Hz），两帧合成一个视频帧（25fps）
+HIDDEN_SIZE = 1024
+MODEL_NAME = "facebook/hubert-large-ls960-ft"
+
+
+class HubertStreamingFeatures:
+    """
+    流式提取hubert音频特征，每40ms音频输出一帧 [2, 1024] 特征（25fps），与 --asr hubert 训练的模型配套
+
+    HuBERT 的 transformer 需要上下文，无法逐帧增量计算，这里按滑动窗口近似离线结果：
+    每积累 step_frames 帧新特征，对 [已输出位置 - left_context_frames, 当前音频末尾] 重新编码，
+    只输出右侧已有 right_context_frames 帧上下文的特征。卷积前端按 320 样本对齐窗口起点，
+    窗口内的帧与整段提取的帧一一对应；归一化按窗口计算，离线提取按整段音频计算
+    """
+
+    def __init__(self, device="cuda:0", left_context_frames=100, right_context_frames=10, step_frames=10):
+        self.device = device
+        self.processor = Wav2Vec2Processor.from_pretrained(MODEL_NAME)
+        self.model = HubertModel.from_pretrained(MODEL_NAME).to(device).eval()
+        self.left_context_frames = left_context_frames
+        self.right_context_frames = right_context_frames
+        self.step_frames = step_frames
+        self.reset()
+
+    def reset(self):
+        self.samples = np.zeros(0, dtype=np.float32)
+        self.samples_start = 0     # self.samples 第一个样本对应的 hubert 帧号 * STRIDE
+        self.num_samples = 0       # 已接收的样本总数
+        self.num_outputs = 0       # 已输出的 hubert 帧数（50Hz）
+        self.pending = np.zeros((0, HIDDEN_SIZE), dtype=np.float32)   # 尚未凑成视频帧的 hubert 帧
+        self.finished = False
+
+    def _available_frames(self):
+        # 与离线提取的帧数一致：(样本数 - (kernel - stride)) // stride
+        return max(0, (self.num_samples - (KERNEL - STRIDE)) // STRIDE)
+
+    @torch.no_grad()
+    def _encode(self, stop):
+        """编码 [num_outputs, stop) 的 hubert 帧"""
+        window_start = max(0, self.num_outputs - self.left_context_frames)
+        speech = self.samples[window_start * STRIDE - self.samples_start:]
+        input_values = self.processor(speech, return_tensors="pt", sampling_rate=SAMPLE_RATE).input_values
+        hidden = self.model(input_values.to(self.device)).last_hidden_state[0].cpu().numpy()
+        if hidden.shape[0] < stop - window_start:
+            hidden = np.concatenate([hidden, np.zeros((stop - window_start - hidden.shape[0], HIDDEN_SIZE), dtype=np.float32)])
+        outputs = hidden[self.num_outputs - window_start:stop - window_start]
+        self.num_outputs = stop
+        # 丢弃之后的窗口不再需要的样本
+        keep_from = max(0, self.num_outputs - self.left_context_frames) * STRIDE
+        if keep_from > self.samples_start:
+            self.samples = self.samples[keep_from - self.samples_start:]
+            self.samples_start = keep_from
+        return outputs
+
+    def _to_video_frames(self, outputs, final=False):
+        # 相邻两帧 hubert 特征合成一个视频帧，结束时与 make_even_first_dim 一样丢弃落单的一帧
+        self.pending = np.concatenate([self.pending, outputs.astype(np.float32)])
+        count = len(self.pending) // 2
+        frames = self.pending[:count * 2].reshape(-1, 2, HIDDEN_SIZE)
+        self.pending = np.zeros((0, HIDDEN_SIZE), dtype=np.float32) if final else self.pending[count * 2:]
+        return frames
+
+    def accept(self, pcm):
+        """
+        输入一段16kHz单声道音频
+
+        pcm: int16 数组或bytes
+        return: 新产生的特征 [N, 2, 1024]
+        """
+        if isinstance(pcm, (bytes, bytearray)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        # 与 soundfile 读取的浮点音频取值范围一致
+        self.samples = np.concatenate([self.samples, pcm.astype(np.float32) / 32768.0])
+        self.num_samples += len(pcm)
+        stable = self._available_frames() - self.right_context_frames
+        if stable - self.num_outputs < self.step_frames:
+            return np.zeros((0, 2, HIDDEN_SIZE), dtype=np.float32)
+        return self._to_video_frames(self._encode(stable))
+
+    def finish(self):
+        """音频结束，输出剩余特征"""
+        if self.finished:
+            return np.zeros((0, 2, HIDDEN_SIZE), dtype=np.float32)
+        self.finished = True
+        total = self._available_frames()
+        outputs = self._encode(total) if total > self.num_outputs else np.zeros((0, HIDDEN_SIZE), dtype=np.float32)
+        return self._to_video_frames(outputs, final=True)
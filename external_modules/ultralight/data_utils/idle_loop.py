@@ -0,0 +1,80 @@
+import os
+import sys
+import argparse
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_utils.avatar_pack import AvatarFrames
+from data_utils.alpha_matte import despill
+from render_utils import PingPongIndex
+
+
+def idle_loop_path(dataset_dir, fps):
+    return os.path.join(dataset_dir, f"idle_loop_{fps}.mp4")
+
+
+def idle_alpha_path(dataset_dir, fps):
+    return os.path.join(dataset_dir, f"idle_alpha_{fps}.mp4")
+
+
+def open_encoder(width, height, fps, crf, pix_fmt, output_path):
+    command = [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0",
+        "-c:v", "libx264", "-preset", "slow", "-crf", str(crf), "-pix_fmt", "yuv420p",
+        output_path,
+    ]
+    return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+def build_idle_loop(dataset_dir, fps=25, crf=16):
+    """
+    按推理时的来回播放顺序把数字人原始帧预编码为一个完整周期的待机循环视频
+    渲染时只需生成嘴部补丁，再叠加到循环播放的待机视频上
+    绿幕数字人同时按相同顺序编码alpha循环视频(亮度即alpha)，成片合成时经 alphamerge 透明叠加
+    """
+    output_path = idle_loop_path(dataset_dir, fps)
+    alpha_path = idle_alpha_path(dataset_dir, fps)
+    frames = AvatarFrames(dataset_dir)
+    if os.path.exists(output_path) and (not frames.has_alpha or os.path.exists(alpha_path)):
+        print(f"[INFO] {output_path} already exists")
+        return output_path
+
+    len_img = len(frames) - 1
+    height, width = frames.read_image(0).shape[:2]
+    # 来回播放的周期为 2 * len_img 帧
+    period = max(2 * len_img, 1)
+    frame_index = PingPongIndex(len_img)
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp.mp4"
+    process = open_encoder(width, height, fps, crf, "bgr24", temp_path)
+    if frames.has_alpha:
+        # alpha边缘对画质更敏感，使用更低的crf
+        temp_alpha_path = f"{alpha_path}.{os.getpid()}.tmp.mp4"
+        alpha_process = open_encoder(width, height, fps, max(crf - 4, 0), "gray", temp_alpha_path)
+    for _ in range(period):
+        index = frame_index.next()
+        img = frames.read_image(index)
+        if frames.has_alpha:
+            img = despill(img)
+            alpha_process.stdin.write(frames.read_alpha(index).tobytes())
+        process.stdin.write(img.tobytes())
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"encode idle loop failed: {dataset_dir}")
+    if frames.has_alpha:
+        alpha_process.stdin.close()
+        if alpha_process.wait() != 0:
+            raise RuntimeError(f"encode idle alpha failed: {dataset_dir}")
+        os.replace(temp_alpha_path, alpha_path)
+    os.replace(temp_path, output_path)
+    print(f"[INFO] idle loop with {period} frames saved to {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pre-encode avatar idle loop")
+    parser.add_argument('dataset_dir', type=str, help="avatar dataset dir")
+    parser.add_argument('--fps', type=int, default=25)
+    opt = parser.parse_args()
+    build_idle_loop(opt.dataset_dir, opt.fps)
@@ -0,0 +1,76 @@
+import numpy as np
+import soundfile as sf
+
+
+def frame_energy_db(speech, sr, fps, num_frames):
+    # 按视频帧切分音频，计算每帧的 RMS 能量(dBFS)
+    if speech.ndim == 2:
+        speech = speech.mean(axis=1)
+    samples_per_frame = sr / fps
+    energies = np.full(num_frames, -100.0, dtype=np.float32)
+    for i in range(num_frames):
+        start = int(i * samples_per_frame)
+        end = int((i + 1) * samples_per_frame)
+        chunk = speech[start:end]
+        if len(chunk) == 0:
+            continue
+        rms = np.sqrt(np.mean(np.square(chunk, dtype=np.float64)))
+        energies[i] = 20 * np.log10(max(rms, 1e-5))
+    return energies
+
+
+def detect_speech_frames(wav_path, fps, num_frames, threshold_db=-45.0, relative_db=35.0,
+                         hangover=2, min_silence_frames=6):
+    """
+    基于能量的VAD，返回每个视频帧是否为语音的布尔数组
+    threshold_db: 绝对能量阈值
+    relative_db: 相对最大能量的动态范围，两者取较大值作为阈值
+    hangover: 语音段前后各扩展的帧数，避免嘴型提前/滞后被截断
+    min_silence_frames: 小于该长度的停顿仍视为语音，避免嘴型频繁切换
+    """
+    speech, sr = sf.read(wav_path)
+    energies = frame_energy_db(speech, sr, fps, num_frames)
+    threshold = max(threshold_db, float(energies.max()) - relative_db)
+    mask = energies > threshold
+
+    # 填充短停顿
+    silence_start = None
+    for i in range(num_frames + 1):
+        is_silent = i < num_frames and not mask[i]
+        if is_silent and silence_start is None:
+            silence_start = i
+        elif not is_silent and silence_start is not None:
+            if silence_start > 0 and i < num_frames and i - silence_start < min_silence_frames:
+                mask[silence_start:i] = True
+            silence_start = None
+
+    # 前后扩展
+    if hangover > 0:
+        padded = mask.copy()
+        for offset in range(1, hangover + 1):
+            padded[offset:] |= mask[:-offset]
+            padded[:-offset] |= mask[offset:]
+        mask = padded
+    return mask
+
+
+def speech_blend_weights(mask, blend_frames=3):
+    """
+    根据语音帧掩码计算每帧推理结果的混合权重
+    语音帧为1，距离语音帧blend_frames以内的静音帧线性衰减，其余为0(不需要推理)
+    """
+    num_frames = len(mask)
+    weights = mask.astype(np.float32)
+    if blend_frames <= 0 or num_frames == 0:
+        return weights
+    speech_idx = np.flatnonzero(mask)
+    if len(speech_idx) == 0:
+        return weights
+    # 每帧到最近语音帧的距离
+    positions = np.arange(num_frames)
+    insert = np.searchsorted(speech_idx, positions)
+    left = speech_idx[np.clip(insert - 1, 0, len(speech_idx) - 1)]
+    right = speech_idx[np.clip(insert, 0, len(speech_idx) - 1)]
+    distance = np.minimum(np.abs(positions - left), np.abs(right - positions))
+    ramp = 1.0 - distance / (blend_frames + 1)
+    return np.clip(np.maximum(weights, ramp), 0.0, 1.0).astype(np.float32)
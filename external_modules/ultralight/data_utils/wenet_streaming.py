@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import torch
+import torchaudio.compliance.kaldi as kaldi
+import onnxruntime as ort
+
+# 与 wenet_infer.py 离线提取保持一致的参数
+SAMPLE_RATE = 16000
+NUM_MEL_BINS = 80
+FRAME_LENGTH_MS = 25
+FRAME_SHIFT_MS = 10
+FRAME_LENGTH = SAMPLE_RATE * FRAME_LENGTH_MS // 1000   # 400
+FRAME_SHIFT = SAMPLE_RATE * FRAME_SHIFT_MS // 1000     # 160
+FRAMES_STRIDE = 67     # 每次送入encoder的fbank帧数
+CHUNK_STEP = 5         # 相邻窗口间隔的fbank帧数，对应20fps
+PAD_FRONT = 32 * FRAME_SHIFT
+PAD_BACK = 35 * FRAME_SHIFT
+
+DEFAULT_ENCODER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "encoder.onnx")
+
+
+class WenetStreamingFeatures:
+    """
+    流式提取wenet音频特征，每50ms音频输出一帧 [16, 512] 特征（20fps）
+
+    fbank按帧增量计算，只处理新到达的样本；67帧的滑动窗口在队列中复用，
+    每个窗口的encoder调用与离线 wenet_infer.py 一致（offset固定、cache置零），
+    保证与训练时的特征分布相同，流式与离线结果逐帧一致
+    """
+
+    def __init__(self, encoder_path=DEFAULT_ENCODER, threads=1):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(encoder_path, sess_options=options)
+        self.offset = np.ones((1, ), dtype=np.int64) * 100
+        self.att_cache = np.zeros([3, 8, 16, 128], dtype=np.float32)
+        self.cnn_cache = np.zeros([3, 1, 512, 14], dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        # 待计算fbank的样本，起点始终对齐到下一帧fbank
+        self.samples = np.zeros(PAD_FRONT, dtype=np.float32)
+        self.fbank = np.zeros((0, NUM_MEL_BINS), dtype=np.float32)
+        self.fbank_start = 0       # self.fbank 第一行对应的fbank帧号
+        self.num_fbank = 0         # 已计算的fbank总帧数
+        self.num_outputs = 0       # 已输出的特征帧数
+        self.finished = False
+
+    def _compute_fbank(self):
+        # snip_edges: 帧数 = 1 + (N - 400) // 160，fbank的每帧运算互相独立，分段计算结果与整段相同
+        if len(self.samples) < FRAME_LENGTH:
+            return
+        count = 1 + (len(self.samples) - FRAME_LENGTH) // FRAME_SHIFT
+        used = (count - 1) * FRAME_SHIFT + FRAME_LENGTH
+        waveform = torch.from_numpy(self.samples[:used]).unsqueeze(0)
+        feat = kaldi.fbank(waveform,
+                           num_mel_bins=NUM_MEL_BINS,
+                           frame_length=FRAME_LENGTH_MS,
+                           frame_shift=FRAME_SHIFT_MS,
+                           dither=0.0,
+                           energy_floor=0.0,
+                           sample_frequency=SAMPLE_RATE).numpy()
+        self.fbank = np.concatenate([self.fbank, feat], axis=0)
+        self.num_fbank += count
+        self.samples = self.samples[count * FRAME_SHIFT:]
+
+    def _encode(self, start):
+        feat = self.fbank[start - self.fbank_start:start - self.fbank_start + FRAMES_STRIDE]
+        if feat.shape[0] < FRAMES_STRIDE:
+            feat = np.concatenate([feat, np.zeros((FRAMES_STRIDE - feat.shape[0], NUM_MEL_BINS), dtype=np.float32)], axis=0)
+        chunk_feat = feat[None, None].astype(np.float32)
+        inputs = {'chunk': chunk_feat, 'offset': self.offset, 'att_cache': self.att_cache, 'cnn_cache': self.cnn_cache}
+        return self.session.run(None, inputs)[0][0]
+
+    def _drain(self, final=False):
+        outputs = []
+        while True:
+            start = self.num_outputs * CHUNK_STEP
+            if final:
+                # 与离线提取的循环条件一致：上一个窗口的结束位置未超过总帧数时继续
+                if self.num_outputs > 0 and start - CHUNK_STEP + FRAMES_STRIDE >= self.num_fbank:
+                    break
+            elif start + FRAMES_STRIDE > self.num_fbank:
+                break
+            outputs.append(self._encode(start))
+            self.num_outputs += 1
+        # 丢弃之后不再使用的fbank帧
+        keep_from = self.num_outputs * CHUNK_STEP
+        if keep_from > self.fbank_start:
+            self.fbank = self.fbank[keep_from - self.fbank_start:]
+            self.fbank_start = keep_from
+        if not outputs:
+            return np.zeros((0, 16, 512), dtype=np.float32)
+        return np.stack(outputs).astype(np.float32)
+
+    def accept(self, pcm):
+        """
+        输入一段16kHz单声道音频
+
+        pcm: int16 数组或bytes
+        return: 新产生的特征 [N, 16, 512]
+        """
+        if isinstance(pcm, (bytes, bytearray)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        self.samples = np.concatenate([self.samples, pcm.astype(np.float32)])
+        self._compute_fbank()
+        return self._drain()
+
+    def finish(self):
+        """音频结束，补齐尾部静音并输出剩余特征"""
+        if self.finished:
+            return np.zeros((0, 16, 512), dtype=np.float32)
+        self.finished = True
+        self.samples = np.concatenate([self.samples, np.zeros(PAD_BACK, dtype=np.float32)])
+        self._compute_fbank()
+        return self._drain(final=True)
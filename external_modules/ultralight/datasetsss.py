@@ -1,4 +1,3 @@
-import os
 import cv2
 import torch
 import random
@@ -7,21 +6,15 @@ import random
 
 from torch.utils.data import Dataset
 from torch.utils.data import DataLoader
+from data_utils.avatar_pack import AvatarFrames
 
 class MyDataset(Dataset):
     
     def __init__(self, img_dir, mode):
     
-        self.img_path_list = []
-        self.lms_path_list = []
         self.mode = mode
         
-        for i in range(len(os.listdir(img_dir+"/full_body_img/"))):
-
-            img_path = os.path.join(img_dir+"/full_body_img/", str(i)+".jpg")
-            lms_path = os.path.join(img_dir+"/landmarks/", str(i)+".lms")
-            self.img_path_list.append(img_path)
-            self.lms_path_list.append(lms_path)
+        self.frames = AvatarFrames(img_dir)
         
         if self.mode == "wenet":
             self.audio_feats = np.load(img_dir+"/aud_wenet.npy")
@@ -31,7 +24,7 @@ class MyDataset(Dataset):
         self.audio_feats = self.audio_feats.astype(np.float32)
         print(img_dir)
         print(self.audio_feats.shape)
-        print(len(self.img_path_list))
+        print(len(self.frames))
         
     def __len__(self):
         # return len(self.img_path_list)-1
@@ -70,16 +63,8 @@ class MyDataset(Dataset):
             auds = torch.cat([torch.zeros(pad_left, *auds.shape[1:], device=auds.device, dtype=auds.dtype), auds], dim=0)
         return auds
     
-    def process_img(self, img, lms_path, img_ex, lms_path_ex):
+    def process_img(self, img, lms, img_ex, lms_ex):
 
-        lms_list = []
-        with open(lms_path, "r") as f:
-            lines = f.read().splitlines()
-            for line in lines:
-                arr = line.split(" ")
-                arr = np.array(arr, dtype=np.float32)
-                lms_list.append(arr)
-        lms = np.array(lms_list, dtype=np.int32)
         xmin = lms[1][0]
         ymin = lms[52][1]
         
@@ -93,14 +78,7 @@ class MyDataset(Dataset):
         img_real_ori = img_real.copy()
         img_masked = cv2.rectangle(img_real,(5,5,150,145),(0,0,0),-1)
         
-        lms_list = []
-        with open(lms_path_ex, "r") as f:
-            lines = f.read().splitlines()
-            for line in lines:
-                arr = line.split(" ")
-                arr = np.array(arr, dtype=np.float32)
-                lms_list.append(arr)
-        lms = np.array(lms_list, dtype=np.int32)
+        lms = lms_ex
         xmin = lms[1][0]
         ymin = lms[52][1]
         
@@ -123,14 +101,14 @@ class MyDataset(Dataset):
         return img_concat_T, img_real_T
 
     def __getitem__(self, idx):
-        img = cv2.imread(self.img_path_list[idx])
-        lms_path = self.lms_path_list[idx]
+        img = self.frames.read_image(idx)
+        lms = self.frames.read_landmarks(idx)
         
         ex_int = random.randint(0, self.__len__()-1)
-        img_ex = cv2.imread(self.img_path_list[ex_int])
-        lms_path_ex = self.lms_path_list[ex_int]
+        img_ex = self.frames.read_image(ex_int)
+        lms_ex = self.frames.read_landmarks(ex_int)
         
-        img_concat_T, img_real_T = self.process_img(img, lms_path, img_ex, lms_path_ex)
+        img_concat_T, img_real_T = self.process_img(img, lms, img_ex, lms_ex)
         audio_feat = self.get_audio_features(self.audio_feats, idx) 
         
         if self.mode == "wenet":
@@ -1,4 +1,5 @@
 import argparse
+import json
 import os
 import cv2
 import torch
@@ -8,6 +9,8 @@ from torch import optim
 from tqdm import tqdm
 from torch.utils.data import DataLoader
 from unet import Model
+from data_utils.avatar_pack import AvatarFrames
+from render_utils import ASR_FPS, PROGRESS_INTERVAL, PingPongIndex, get_audio_features, render_mouth, write_progress
 # from unet2 import Model
 # from unet_att import Model
 
@@ -20,6 +23,14 @@ parser.add_argument('--dataset', type=str, default="")
 parser.add_argument('--audio_feat', type=str, default="")
 parser.add_argument('--save_path', type=str, default="")     # end with .mp4 please
 parser.add_argument('--checkpoint', type=str, default="")
+parser.add_argument('--audio_wav', type=str, default="")     # 驱动音频，开启vad时用于检测静音
+parser.add_argument('--vad', action='store_true', help="静音帧跳过UNet推理，直接使用原始帧")
+parser.add_argument('--blend_frames', type=int, default=3)   # 语音边界的过渡帧数
+parser.add_argument('--start_frame', type=int, default=0)    # 分片渲染：起始帧(包含)
+parser.add_argument('--end_frame', type=int, default=-1)     # 分片渲染：结束帧(不包含)，-1表示到结尾
+parser.add_argument('--threads', type=int, default=0)        # torch线程数，0表示使用默认值
+parser.add_argument('--progress_path', type=str, default="")  # 定期写入 "已渲染帧数 总帧数"，供服务端上报进度
+parser.add_argument('--patch_only', action='store_true', help="只输出嘴部联合区域的补丁视频，与预渲染的待机循环叠加合成")
 args = parser.parse_args()
 
 checkpoint = args.checkpoint
@@ -28,98 +39,58 @@ dataset_dir = args.dataset
 audio_feat_path = args.audio_feat
 mode = args.asr
 
-def get_audio_features(features, index):
-    left = index - 8
-    right = index + 8
-    pad_left = 0
-    pad_right = 0
-    if left < 0:
-        pad_left = -left
-        left = 0
-    if right > features.shape[0]:
-        pad_right = right - features.shape[0]
-        right = features.shape[0]
-    auds = torch.from_numpy(features[left:right])
-    if pad_left > 0:
-        auds = torch.cat([torch.zeros_like(auds[:pad_left]), auds], dim=0)
-    if pad_right > 0:
-        auds = torch.cat([auds, torch.zeros_like(auds[:pad_right])], dim=0) # [8, 16]
-    return auds
-
 audio_feats = np.load(audio_feat_path)
-img_dir = os.path.join(dataset_dir, "full_body_img/")
-lms_dir = os.path.join(dataset_dir, "landmarks/")
-len_img = len(os.listdir(img_dir)) - 1
-exm_img = cv2.imread(img_dir+"0.jpg")
+frames = AvatarFrames(dataset_dir)
+len_img = len(frames) - 1
+exm_img = frames.read_image(0)
 h, w = exm_img.shape[:2]
 
-if mode=="hubert":
-    video_writer = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc('M','J','P', 'G'), 25, (w, h))
-if mode=="wenet":
-    video_writer = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc('M','J','P', 'G'), 20, (w, h))
-step_stride = 0
-img_idx = 0
+fps = ASR_FPS[mode]
+if args.patch_only:
+    # 补丁区域为所有帧嘴部裁剪框的并集，位置固定，写入同名json供合成时使用
+    box_x, box_y, box_w, box_h = frames.mouth_union_box(w, h)
+    with open(os.path.splitext(save_path)[0] + ".json", "w") as f:
+        json.dump({"x": box_x, "y": box_y, "w": box_w, "h": box_h}, f)
+    output_size = (box_w, box_h)
+else:
+    box_x, box_y, box_w, box_h = 0, 0, w, h
+    output_size = (w, h)
+video_writer = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc('M','J','P', 'G'), fps, output_size)
+frame_index = PingPongIndex(len_img)
+
+# 每帧推理结果的混合权重，0表示静音帧，不做推理
+if args.vad and args.audio_wav:
+    from data_utils.vad import detect_speech_frames, speech_blend_weights
+    speech_mask = detect_speech_frames(args.audio_wav, fps, audio_feats.shape[0])
+    blend_weights = speech_blend_weights(speech_mask, args.blend_frames)
+    print(f"vad: {int((blend_weights > 0).sum())}/{len(blend_weights)} frames need inference")
+else:
+    blend_weights = np.ones(audio_feats.shape[0], dtype=np.float32)
 
-net = Model(6, mode).cuda()
-net.load_state_dict(torch.load(checkpoint))
+if args.threads > 0:
+    torch.set_num_threads(args.threads)
+device = "cuda" if torch.cuda.is_available() else "cpu"
+net = Model(6, mode).to(device)
+net.load_state_dict(torch.load(checkpoint, map_location=device))
 net.eval()
-for i in range(audio_feats.shape[0]):
-    if img_idx>len_img - 1:
-        step_stride = -1
-    if img_idx<1:
-        step_stride = 1
-    img_idx += step_stride
-    img_path = img_dir + str(img_idx)+'.jpg'
-    lms_path = lms_dir + str(img_idx)+'.lms'
-    
-    img = cv2.imread(img_path)
-    lms_list = []
-    with open(lms_path, "r") as f:
-        lines = f.read().splitlines()
-        for line in lines:
-            arr = line.split(" ")
-            arr = np.array(arr, dtype=np.float32)
-            lms_list.append(arr)
-    lms = np.array(lms_list, dtype=np.int32)
-    xmin = lms[1][0]
-    ymin = lms[52][1]
 
-    xmax = lms[31][0]
-    width = xmax - xmin
-    ymax = ymin + width
-    crop_img = img[ymin:ymax, xmin:xmax]
-    h, w = crop_img.shape[:2]
-    crop_img = cv2.resize(crop_img, (168, 168), cv2.INTER_AREA)
-    crop_img_ori = crop_img.copy()
-    img_real_ex = crop_img[4:164, 4:164].copy()
-    img_real_ex_ori = img_real_ex.copy()
-    img_masked = cv2.rectangle(img_real_ex_ori,(5,5,150,145),(0,0,0),-1)
-    
-    img_masked = img_masked.transpose(2,0,1).astype(np.float32)
-    img_real_ex = img_real_ex.transpose(2,0,1).astype(np.float32)
-    
-    img_real_ex_T = torch.from_numpy(img_real_ex / 255.0)
-    img_masked_T = torch.from_numpy(img_masked / 255.0)
-    img_concat_T = torch.cat([img_real_ex_T, img_masked_T], axis=0)[None]
-    
-    audio_feat = get_audio_features(audio_feats, i)
-    if mode=="hubert":
-        audio_feat = audio_feat.reshape(32,32,32)
-    if mode=="wenet":
-        audio_feat = audio_feat.reshape(256,16,32)
-    audio_feat = audio_feat[None]
-    audio_feat = audio_feat.cuda()
-    img_concat_T = img_concat_T.cuda()
+start_frame = args.start_frame
+end_frame = audio_feats.shape[0] if args.end_frame < 0 else min(args.end_frame, audio_feats.shape[0])
+for i in range(end_frame):
+    # 来回播放的帧序号只依赖i，分片时从头推进到start_frame以保证各分片衔接一致
+    img_idx = frame_index.next()
+    if i < start_frame:
+        continue
     
-    with torch.no_grad():
-        pred = net(img_concat_T, audio_feat)[0]
-        
-    pred = pred.cpu().numpy().transpose(1,2,0)*255
-    pred = np.array(pred, dtype=np.uint8)
-    crop_img_ori[4:164, 4:164] = pred
-    crop_img_ori = cv2.resize(crop_img_ori, (w, h))
-    img[ymin:ymax, xmin:xmax] = crop_img_ori
-    video_writer.write(img)
+    img = frames.read_image(img_idx)
+    weight = blend_weights[i]
+    if weight > 0:
+        lms = frames.read_landmarks(img_idx)
+        audio_feat = get_audio_features(audio_feats, i)
+        render_mouth(net, img, lms, audio_feat, mode, device, weight)
+    video_writer.write(img[box_y:box_y + box_h, box_x:box_x + box_w])
+    if args.progress_path and ((i + 1 - start_frame) % PROGRESS_INTERVAL == 0 or i + 1 == end_frame):
+        write_progress(args.progress_path, i + 1 - start_frame, end_frame - start_frame)
 video_writer.release()
 
 # ffmpeg -i test_video.mp4 -i test_audio.pcm -c:v libx264 -c:a aac result_test.mp4
\ No newline at end of file
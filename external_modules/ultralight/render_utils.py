@@ -0,0 +1,103 @@
+import os
+import cv2
+import torch
+import numpy as np
+
+# 各特征提取器对应的视频帧率
+ASR_FPS = {"hubert": 25, "wenet": 20}
+# 每渲染多少帧写一次进度文件
+PROGRESS_INTERVAL = 25
+
+
+def write_progress(path, done, total):
+    # 先写临时文件再替换，读取方不会读到写了一半的内容
+    with open(path + ".tmp", "w") as f:
+        f.write(f"{done} {total}")
+    os.replace(path + ".tmp", path)
+
+
+def get_audio_features(features, index):
+    left = index - 8
+    right = index + 8
+    pad_left = 0
+    pad_right = 0
+    if left < 0:
+        pad_left = -left
+        left = 0
+    if right > features.shape[0]:
+        pad_right = right - features.shape[0]
+        right = features.shape[0]
+    auds = torch.from_numpy(features[left:right])
+    if pad_left > 0:
+        auds = torch.cat([torch.zeros_like(auds[:pad_left]), auds], dim=0)
+    if pad_right > 0:
+        auds = torch.cat([auds, torch.zeros_like(auds[:pad_right])], dim=0) # [8, 16]
+    return auds
+
+
+class PingPongIndex:
+    """
+    数字人底图帧序号，在 [0, len_img] 之间来回播放
+    """
+
+    def __init__(self, len_img):
+        self.len_img = len_img
+        self.step_stride = 0
+        self.img_idx = 0
+
+    def next(self):
+        if self.img_idx > self.len_img - 1:
+            self.step_stride = -1
+        if self.img_idx < 1:
+            self.step_stride = 1
+        self.img_idx += self.step_stride
+        return self.img_idx
+
+
+def render_mouth(net, img, lms, audio_feat, mode, device, weight=1.0):
+    """
+    用UNet生成嘴部区域并贴回原图（原地修改img）
+
+    audio_feat: get_audio_features 返回的特征窗口
+    weight: 推理结果与原图的混合权重，1表示完全使用推理结果
+    """
+    xmin = lms[1][0]
+    ymin = lms[52][1]
+
+    xmax = lms[31][0]
+    width = xmax - xmin
+    ymax = ymin + width
+    crop_img = img[ymin:ymax, xmin:xmax]
+    h, w = crop_img.shape[:2]
+    crop_img = cv2.resize(crop_img, (168, 168), cv2.INTER_AREA)
+    crop_img_ori = crop_img.copy()
+    img_real_ex = crop_img[4:164, 4:164].copy()
+    img_real_ex_ori = img_real_ex.copy()
+    img_masked = cv2.rectangle(img_real_ex_ori,(5,5,150,145),(0,0,0),-1)
+
+    img_masked = img_masked.transpose(2,0,1).astype(np.float32)
+    img_real_ex = img_real_ex.transpose(2,0,1).astype(np.float32)
+
+    img_real_ex_T = torch.from_numpy(img_real_ex / 255.0)
+    img_masked_T = torch.from_numpy(img_masked / 255.0)
+    img_concat_T = torch.cat([img_real_ex_T, img_masked_T], axis=0)[None]
+
+    if mode=="hubert":
+        audio_feat = audio_feat.reshape(32,32,32)
+    if mode=="wenet":
+        audio_feat = audio_feat.reshape(256,16,32)
+    audio_feat = audio_feat[None]
+    audio_feat = audio_feat.to(device)
+    img_concat_T = img_concat_T.to(device)
+
+    with torch.no_grad():
+        pred = net(img_concat_T, audio_feat)[0]
+
+    pred = pred.cpu().numpy().transpose(1,2,0)*255
+    pred = np.array(pred, dtype=np.uint8)
+    if weight < 1:
+        pred = cv2.addWeighted(pred, float(weight), crop_img_ori[4:164, 4:164], float(1 - weight), 0)
+    crop_img_ori[4:164, 4:164] = pred
+    crop_img_ori = cv2.resize(crop_img_ori, (w, h))
+    img[ymin:ymax, xmin:xmax] = crop_img_ori
+    return img
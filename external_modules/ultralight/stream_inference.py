@@ -0,0 +1,234 @@
+import argparse
+import collections
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+import soundfile as sf
+import torch
+from unet import Model
+from data_utils.avatar_pack import AvatarFrames
+from data_utils.wenet_streaming import SAMPLE_RATE, DEFAULT_ENCODER
+from render_utils import ASR_FPS, PingPongIndex, get_audio_features, render_mouth
+
+"""
+实时流式数字人：按块读取PCM音频，流式提取音频特征，逐帧渲染并推送到推流/文件/管道
+
+--asr 需与模型训练时一致：hubert（25fps，训练流程默认）使用滑动窗口提取，wenet（20fps）使用流式encoder
+
+python stream_inference.py --dataset <avatar_dir> --checkpoint <avatar_dir>/checkpoint/best.pth \
+    --audio_wav test.wav --realtime --output rtmp://127.0.0.1/live/test
+cat test.pcm | python stream_inference.py --dataset <avatar_dir> --checkpoint <ckpt> --pcm_stdin --output - > out.ts
+"""
+
+parser = argparse.ArgumentParser(description='Stream inference',
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('--dataset', type=str, default="")
+parser.add_argument('--checkpoint', type=str, default="")
+parser.add_argument('--asr', type=str, default="hubert", choices=["hubert", "wenet"])   # 训练模型时使用的特征
+parser.add_argument('--encoder_onnx', type=str, default=DEFAULT_ENCODER)                 # wenet 流式encoder
+parser.add_argument('--hubert_right_context', type=int, default=10)  # hubert 输出前等待的右侧上下文帧数（20ms/帧）
+parser.add_argument('--audio_wav', type=str, default="")         # 16kHz单声道wav，按块模拟流式输入
+parser.add_argument('--pcm_stdin', action='store_true', help="从标准输入读取16kHz单声道s16le PCM")
+parser.add_argument('--realtime', action='store_true', help="按实际时长节奏读取audio_wav")
+parser.add_argument('--chunk_ms', type=int, default=100)         # 每次读取的音频时长
+parser.add_argument('--output', type=str, default="")            # rtmp://... / 文件路径 / - 表示标准输出(mpegts)
+parser.add_argument('--latency_budget_ms', type=float, default=0)  # 单帧渲染预算，0表示1/fps
+parser.add_argument('--max_lag_frames', type=int, default=10)    # 落后超过该帧数时跳过UNet直接输出原始帧
+parser.add_argument('--threads', type=int, default=0)            # torch线程数
+parser.add_argument('--metrics_path', type=str, default="")      # 结束时写入延迟统计
+parser.add_argument('--metrics_window_s', type=int, default=60)  # 延迟分位数按最近多少秒的帧统计
+args = parser.parse_args()
+
+mode = args.asr
+fps = ASR_FPS[mode]
+samples_per_frame = SAMPLE_RATE // fps
+frame_budget = (args.latency_budget_ms or 1000.0 / fps) / 1000.0
+
+
+def log(message):
+    # 标准输出可能作为视频管道，日志统一写到标准错误
+    print(message, file=sys.stderr, flush=True)
+
+
+def open_sink(output, width, height):
+    """
+    启动ffmpeg接收原始视频帧(stdin)和PCM音频(pipe:3)并编码推送
+    """
+    audio_read, audio_write = os.pipe()
+    if output.startswith(("rtmp://", "rtmps://")):
+        container = ["-f", "flv"]
+    elif output == "-":
+        container = ["-f", "mpegts"]
+        output = "pipe:1"
+    else:
+        container = []
+    command = [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0",
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", f"pipe:{audio_read}",
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "zerolatency", "-pix_fmt", "yuv420p",
+        "-g", str(fps * 2), "-c:a", "aac", "-ar", "44100",
+        *container, output,
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, pass_fds=(audio_read,))
+    os.close(audio_read)
+    return process, os.fdopen(audio_write, "wb")
+
+
+def pipe_writer(pipe, items):
+    # 视频与音频分别由独立线程写入，避免ffmpeg读取一路时另一路写满阻塞
+    while True:
+        data = items.get()
+        if data is None:
+            break
+        pipe.write(data)
+    pipe.close()
+
+
+def audio_chunks():
+    chunk_samples = SAMPLE_RATE * args.chunk_ms // 1000
+    if args.pcm_stdin:
+        while True:
+            data = sys.stdin.buffer.read(chunk_samples * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+        return
+    speech, sr = sf.read(args.audio_wav, dtype="int16")
+    if speech.ndim == 2:
+        speech = speech[:, 0]
+    if sr != SAMPLE_RATE:
+        raise ValueError(f"audio must be {SAMPLE_RATE}Hz, got {sr}")
+    started = time.time()
+    for index, start in enumerate(range(0, len(speech), chunk_samples)):
+        if args.realtime:
+            delay = started + index * args.chunk_ms / 1000.0 - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        yield speech[start:start + chunk_samples]
+
+
+def percentile(values, q):
+    return float(np.percentile(list(values), q)) if values else 0.0
+
+
+if args.threads > 0:
+    torch.set_num_threads(args.threads)
+device = "cuda" if torch.cuda.is_available() else "cpu"
+net = Model(6, mode).to(device)
+net.load_state_dict(torch.load(args.checkpoint, map_location=device))
+net.eval()
+
+frames = AvatarFrames(args.dataset)
+frame_index = PingPongIndex(len(frames) - 1)
+height, width = frames.read_image(0).shape[:2]
+if mode == "hubert":
+    from data_utils.hubert_streaming import HubertStreamingFeatures
+    features = HubertStreamingFeatures(device, right_context_frames=args.hubert_right_context)
+    feature_shape = (2, 1024)
+else:
+    from data_utils.wenet_streaming import WenetStreamingFeatures
+    features = WenetStreamingFeatures(args.encoder_onnx)
+    feature_shape = (16, 512)
+
+sink, audio_pipe = open_sink(args.output, width, height)
+video_items, audio_items = queue.Queue(maxsize=fps), queue.Queue(maxsize=fps * 10)
+writers = [threading.Thread(target=pipe_writer, args=(sink.stdin, video_items), daemon=True),
+           threading.Thread(target=pipe_writer, args=(audio_pipe, audio_items), daemon=True)]
+for writer in writers:
+    writer.start()
+
+feats = np.zeros((0, *feature_shape), dtype=np.float32)
+feats_offset = 0         # feats 第一行对应的帧号
+pending_audio = np.zeros(0, dtype=np.int16)
+arrival_times = collections.deque()   # 尚未渲染的帧对应音频到达的时间，按帧顺序
+arrived_frames = 0
+received_samples = 0
+rendered = 0
+# 长时间推流时只保留最近的耗时样本，内存不随时长增长
+metrics_window = max(1, args.metrics_window_s) * fps
+metrics = {"render_ms": collections.deque(maxlen=metrics_window), "latency_ms": collections.deque(maxlen=metrics_window),
+           "skipped_frames": 0, "over_budget_frames": 0}
+stream_start = time.time()
+
+
+def emit_ready_frames(final=False):
+    """特征窗口需要当前帧之后8帧的特征，满足条件的帧逐帧渲染输出"""
+    global rendered, pending_audio, feats, feats_offset
+    while rendered < feats_offset + len(feats) and (final or rendered + 8 <= feats_offset + len(feats)):
+        render_start = time.time()
+        img_idx = frame_index.next()
+        img = frames.read_image(img_idx)
+        lag = feats_offset + len(feats) - 8 - rendered
+        if lag > args.max_lag_frames:
+            # 渲染跟不上实时，跳过UNet保证输出不断流
+            metrics["skipped_frames"] += 1
+        else:
+            render_mouth(net, img, frames.read_landmarks(img_idx), get_audio_features(feats, rendered - feats_offset), mode, device)
+        render_time = time.time() - render_start
+        if render_time > frame_budget:
+            metrics["over_budget_frames"] += 1
+
+        audio = pending_audio[:samples_per_frame]
+        pending_audio = pending_audio[samples_per_frame:]
+        if len(audio) < samples_per_frame:
+            audio = np.concatenate([audio, np.zeros(samples_per_frame - len(audio), dtype=np.int16)])
+        audio_items.put(audio.tobytes())
+        video_items.put(img.tobytes())
+
+        metrics["render_ms"].append(render_time * 1000)
+        if arrival_times:
+            metrics["latency_ms"].append((time.time() - arrival_times.popleft()) * 1000)
+        rendered += 1
+        # 只保留后续帧特征窗口需要的前8帧
+        if rendered - 8 - feats_offset > fps:
+            feats = feats[rendered - 8 - feats_offset:]
+            feats_offset = rendered - 8
+        if rendered % (fps * 5) == 0:
+            log(f"[stream] frames={rendered} render_p95={percentile(list(metrics['render_ms'])[-fps * 5:], 95):.1f}ms "
+                f"latency_p95={percentile(list(metrics['latency_ms'])[-fps * 5:], 95):.1f}ms skipped={metrics['skipped_frames']}")
+
+
+try:
+    for chunk in audio_chunks():
+        now = time.time()
+        pending_audio = np.concatenate([pending_audio, chunk])
+        # 记录每个视频帧的音频何时到达，用于计算端到端延迟
+        received_samples += len(chunk)
+        while arrived_frames < received_samples // samples_per_frame:
+            arrival_times.append(now)
+            arrived_frames += 1
+        feats = np.concatenate([feats, features.accept(chunk)])
+        emit_ready_frames()
+    feats = np.concatenate([feats, features.finish()])
+    emit_ready_frames(final=True)
+finally:
+    video_items.put(None)
+    audio_items.put(None)
+    for writer in writers:
+        writer.join()
+    sink.wait()
+
+summary = {
+    "frames": rendered,
+    "fps": fps,
+    "duration_s": time.time() - stream_start,
+    "frame_budget_ms": frame_budget * 1000,
+    "metrics_window_s": args.metrics_window_s,
+    "render_ms_p50": percentile(metrics["render_ms"], 50),
+    "render_ms_p95": percentile(metrics["render_ms"], 95),
+    "latency_ms_p50": percentile(metrics["latency_ms"], 50),
+    "latency_ms_p95": percentile(metrics["latency_ms"], 95),
+    "skipped_frames": metrics["skipped_frames"],
+    "over_budget_frames": metrics["over_budget_frames"],
+}
+log(f"[stream] done: {json.dumps(summary)}")
+if args.metrics_path:
+    with open(args.metrics_path, "w") as f:
+        json.dump(summary, f, indent=2)
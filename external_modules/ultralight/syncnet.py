@@ -8,21 +8,14 @@ import numpy as np
 from torch import optim
 import random
 import argparse
+from data_utils.avatar_pack import AvatarFrames
 
 
 
 class Dataset(object):
     def __init__(self, dataset_dir, mode):
         
-        self.img_path_list = []
-        self.lms_path_list = []
-        
-        for i in range(len(os.listdir(dataset_dir+"/full_body_img/"))):
-
-            img_path = os.path.join(dataset_dir+"/full_body_img/", str(i)+".jpg")
-            lms_path = os.path.join(dataset_dir+"/landmarks/", str(i)+".lms")
-            self.img_path_list.append(img_path)
-            self.lms_path_list.append(lms_path)
+        self.frames = AvatarFrames(dataset_dir)
                 
         if mode=="wenet":
             audio_feats_path = dataset_dir+"/aud_wenet.npy"
@@ -55,16 +48,8 @@ class Dataset(object):
             auds = torch.cat([auds, torch.zeros_like(auds[:pad_right])], dim=0) # [8, 16]
         return auds
     
-    def process_img(self, img, lms_path, img_ex, lms_path_ex):
+    def process_img(self, img, lms, img_ex, lms_ex):
 
-        lms_list = []
-        with open(lms_path, "r") as f:
-            lines = f.read().splitlines()
-            for line in lines:
-                arr = line.split(" ")
-                arr = np.array(arr, dtype=np.float32)
-                lms_list.append(arr)
-        lms = np.array(lms_list, dtype=np.int32)
         xmin = lms[1][0]
         ymin = lms[52][1]
         
@@ -82,14 +67,14 @@ class Dataset(object):
         return img_real_T
 
     def __getitem__(self, idx):
-        img = cv2.imread(self.img_path_list[idx])
-        lms_path = self.lms_path_list[idx]
+        img = self.frames.read_image(idx)
+        lms = self.frames.read_landmarks(idx)
         
         ex_int = random.randint(0, self.__len__()-1)
-        img_ex = cv2.imread(self.img_path_list[ex_int])
-        lms_path_ex = self.lms_path_list[ex_int]
+        img_ex = self.frames.read_image(ex_int)
+        lms_ex = self.frames.read_landmarks(ex_int)
         
-        img_real_T = self.process_img(img, lms_path, img_ex, lms_path_ex)
+        img_real_T = self.process_img(img, lms, img_ex, lms_ex)
         audio_feat = self.get_audio_features(self.audio_feats, idx) # 
         # print(audio_feat.shape)
         if self.mode=="wenet":
@@ -0,0 +1,21 @@
+from app.config import PathUrlMapper
+
+
+def test_to_url_rewrites_only_leading_project_root():
+    mapper = PathUrlMapper('/srv/app', 'http://h:8000')
+    assert mapper.to_url('/srv/app/data/x.mp4') == 'http://h:8000/data/x.mp4'
+    assert mapper.to_url('/mnt/bak/srv/app/data/x.mp4') == '/mnt/bak/srv/app/data/x.mp4'
+    assert mapper.to_url('/srv/application/x.mp4') == '/srv/application/x.mp4'
+
+
+def test_to_path_rewrites_only_leading_host():
+    mapper = PathUrlMapper('/srv/app', 'http://h:8000')
+    assert mapper.to_path('http://h:8000/data/x.mp4') == '/srv/app/data/x.mp4'
+    assert mapper.to_path('https://cdn/x?u=http://h:8000/a') == 'https://cdn/x?u=http://h:8000/a'
+    assert mapper.is_local_url('http://h:8000/data/x.mp4')
+    assert not mapper.is_local_url('https://cdn/x?u=http://h:8000/a')
+
+
+def test_windows_root_matches_mixed_separators():
+    mapper = PathUrlMapper('E:\\work\\app', 'http://h:8000')
+    assert mapper.to_url('E:\\work\\app/data\\x.mp4') == 'http://h:8000/data/x.mp4'
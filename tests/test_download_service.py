@@ -0,0 +1,105 @@
+import dataclasses
+import threading
+
+import pytest
+
+from app.config import Settings
+from app.services.download_service import DownloadService
+
+CONTENT = b'0123456789' * 100
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        for index in range(0, len(self.body), chunk_size):
+            yield self.body[index:index + chunk_size]
+
+
+class FakeSession:
+    """按 Range 返回 CONTENT 的片段，越界时与真实服务器一样返回 416"""
+
+    def __init__(self):
+        self.requests = []
+
+    def head(self, url, **kwargs):
+        return FakeResponse(200, headers={'Content-Length': str(len(CONTENT)), 'Accept-Ranges': 'bytes'})
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        if not headers or 'Range' not in headers:
+            return FakeResponse(200, CONTENT)
+        first, last = headers['Range'][len('bytes='):].split('-')
+        if int(first) >= len(CONTENT):
+            return FakeResponse(416, headers={'Content-Range': f'bytes */{len(CONTENT)}'})
+        return FakeResponse(206, CONTENT[int(first):int(last) + 1 if last else None])
+
+
+@pytest.fixture
+def service(tmp_path):
+    settings = dataclasses.replace(Settings.from_env(), project_root=tmp_path, download_parallel_threshold=10 ** 9)
+    service = DownloadService(settings)
+    service.session = FakeSession()
+    return service
+
+
+def test_complete_part_file_is_not_requested_again(service, tmp_path):
+    save_path = tmp_path / 'voice.wav'
+    save_path.with_name('voice.wav.part').write_bytes(CONTENT)
+
+    service.download('http://h/voice.wav', save_path)
+
+    assert save_path.read_bytes() == CONTENT
+    assert service.session.requests == []
+
+
+def test_416_on_resume_counts_as_complete(service, tmp_path):
+    part_path = tmp_path / 'voice.wav.part'
+    part_path.write_bytes(CONTENT)
+
+    service._fetch_range('http://h/voice.wav', part_path)
+
+    assert part_path.read_bytes() == CONTENT
+    assert service.session.requests == [{'Range': f'bytes={len(CONTENT)}-'}]
+
+
+def test_partial_file_resumes(service, tmp_path):
+    save_path = tmp_path / 'voice.wav'
+    save_path.with_name('voice.wav.part').write_bytes(CONTENT[:300])
+
+    service.download('http://h/voice.wav', save_path)
+
+    assert save_path.read_bytes() == CONTENT
+    assert service.session.requests == [{'Range': 'bytes=300-'}]
+
+
+def test_single_flight_locks_are_released(service, tmp_path):
+    threads = [threading.Thread(target=service.fetch, args=(f'http://h/{index % 3}.wav',)) for index in range(9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service._locks == {}
+
+
+def test_modified_cache_file_is_verified_and_downloaded_again(service):
+    url = 'http://h/voice.wav'
+    cached_path = service.fetch(url)
+    assert service.fetch(url) == cached_path
+    assert len(service.session.requests) == 1
+
+    cached_path.write_bytes(b'x' * len(CONTENT))
+
+    assert service.fetch(url).read_bytes() == CONTENT
+    assert len(service.session.requests) == 2
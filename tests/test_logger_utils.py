@@ -0,0 +1,43 @@
+import json
+import logging
+import queue
+
+from app.utils.logger_utils import ContextFilter, ContextQueueHandler, JsonFormatter, TextFormatter
+
+
+def _queued_record(log):
+    records = queue.SimpleQueue()
+    handler = ContextQueueHandler(records)
+    handler.addFilter(ContextFilter())
+    logger = logging.getLogger('tests.logger_utils')
+    logger.propagate = False
+    logger.handlers = [handler]
+    try:
+        log(logger)
+    finally:
+        logger.handlers = []
+    return records.get_nowait()
+
+
+def test_json_keeps_traceback_out_of_message():
+    def log(logger):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception('失败: %s', 'job')
+
+    data = json.loads(JsonFormatter().format(_queued_record(log)))
+    assert data['message'] == '失败: job'
+    assert 'ValueError: boom' in data['exc_info']
+
+
+def test_text_appends_traceback_once():
+    def log(logger):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception('失败')
+
+    text = TextFormatter('%(name)s%(job)s - %(message)s').format(_queued_record(log))
+    assert text.startswith('tests.logger_utils - 失败\n')
+    assert text.count('ValueError: boom') == 1
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, create_engine, func, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.utils.pagination_utils import paginate
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'pagination_items'
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def walk(session, page_size, descending=True):
+    query = session.query(Item)
+    ids, cursor = [], None
+    for _ in range(100):
+        items, _, cursor = paginate(query, Item.created_at, Item.id, page_size=page_size,
+                                    cursor=cursor, with_total=False, descending=descending)
+        ids.extend(item.id for item in items)
+        if not cursor:
+            return ids
+    pytest.fail(f"游标分页没有结束，已返回: {ids}")
+
+
+@pytest.mark.parametrize('descending', [True, False])
+def test_keyset_walks_rows_sharing_second_precision_timestamp(session, descending):
+    # 与 backend_schema.sql 的初始数据相同：精确到秒的文本时间
+    for row_id in range(1, 6):
+        session.execute(text("INSERT INTO pagination_items (id, created_at) VALUES (:id, '2024-12-12 12:12:12')"),
+                        {'id': row_id})
+    session.commit()
+
+    expected = [5, 4, 3, 2, 1] if descending else [1, 2, 3, 4, 5]
+    assert walk(session, 2, descending) == expected
+
+
+def test_keyset_walks_server_default_timestamps(session):
+    for _ in range(5):
+        session.add(Item())
+    session.commit()
+
+    assert walk(session, 2) == [5, 4, 3, 2, 1]
+
+
+def test_keyset_walks_mixed_storage_formats(session):
+    # 服务器默认值（精确到秒）与 ORM 写入的时间（带微秒）混合
+    session.execute(text("INSERT INTO pagination_items (id, created_at) VALUES (1, '2024-12-12 12:12:12')"))
+    session.execute(text("INSERT INTO pagination_items (id, created_at) VALUES (2, '2024-12-12 12:12:12')"))
+    session.add_all([Item(id=3, created_at=datetime(2024, 12, 12, 12, 12, 12)),
+                     Item(id=4, created_at=datetime(2024, 12, 12, 12, 12, 12, 500000)),
+                     Item(id=5, created_at=datetime(2024, 12, 12, 12, 12, 13))])
+    session.commit()
+
+    full = [item.id for item in paginate(session.query(Item), Item.created_at, Item.id,
+                                         page_size=10, with_total=False)[0]]
+    assert len(full) == 5
+    for page_size in (1, 2, 3):
+        assert walk(session, page_size) == full
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip('fastapi')
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.utils.static_utils import range_file_response
+
+CONTENT = b'0123456789' * 100
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(CONTENT)
+
+    def endpoint(request):
+        return range_file_response(request, path, max_age=60)
+
+    return TestClient(Starlette(routes=[Route('/video.mp4', endpoint, methods=['GET', 'HEAD'])]))
+
+
+def test_range_get_returns_slice(client):
+    response = client.get('/video.mp4', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers['content-range'] == f'bytes 10-19/{len(CONTENT)}'
+
+
+def test_head_returns_headers_only(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(CONTENT)
+
+    def head(headers):
+        scope = {'type': 'http', 'method': 'HEAD', 'path': '/video.mp4',
+                 'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()]}
+        return range_file_response(Request(scope), path)
+
+    response = head({'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.body == b''
+    assert response.headers['content-length'] == '10'
+
+    response = head({})
+    assert response.status_code == 200
+    assert response.body == b''
+    assert response.headers['content-length'] == str(len(CONTENT))
+
+
+def test_etag_is_strong_and_matches_weak_if_none_match(client):
+    etag = client.head('/video.mp4').headers['etag']
+    assert not etag.startswith('W/')
+    assert client.get('/video.mp4', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    response = client.get('/video.mp4', headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert response.status_code == 206